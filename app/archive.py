@@ -0,0 +1,122 @@
+import os
+import sys
+from datetime import datetime, timedelta
+from sqlalchemy import delete, func, insert, select, union_all, update
+from app.models import SessionLocal, LiveSession, Order, ArchivedOrder
+
+#-----------Order archive ----------#
+# Sessions that ended more than ARCHIVE_AFTER_DAYS ago have their orders
+# moved from `orders` to `archived_orders`, one session per transaction, so
+# the hot table (and its indexes) only holds recent lives. The rollups
+# (SummaryRollup / ProductRollup / OrderBucket) already count those orders
+# and are left as they are. Reads that span history go through
+# all_orders(); a single session is read from whichever table holds it.
+# Archived orders are read-only; restore_session() moves a session back.
+
+ARCHIVE_AFTER_DAYS = int(os.getenv("ARCHIVE_AFTER_DAYS", "30"))
+
+ORDER_COLUMNS = [column.name for column in ArchivedOrder.__table__.columns]
+
+
+def session_orders_table(archived_at):
+    # the model holding a session's orders, from LiveSession.archived_at
+    return ArchivedOrder if archived_at else Order
+
+
+def all_orders(user_id: int, session_id=None, created_from=None, created_before=None):
+    # live + archived orders of a user as one subquery with Order's column
+    # names; the filters are applied inside each half so both use indexes
+    def rows(model):
+        query = select(*(getattr(model, name).label(name) for name in ORDER_COLUMNS))
+        query = query.where(model.user_id == user_id)
+        if session_id is not None:
+            query = query.where(model.session_id == session_id)
+        if created_from is not None:
+            query = query.where(model.created_at >= created_from)
+        if created_before is not None:
+            query = query.where(model.created_at < created_before)
+        return query
+
+    return union_all(rows(Order), rows(ArchivedOrder)).subquery("all_orders")
+
+
+def _move(db, source, target, session_id: int) -> int:
+    columns = [getattr(source, name) for name in ORDER_COLUMNS]
+    db.execute(
+        insert(target).from_select(ORDER_COLUMNS, select(*columns).where(source.session_id == session_id))
+    )
+    return db.execute(
+        delete(source).where(source.session_id == session_id).execution_options(synchronize_session=False)
+    ).rowcount
+
+
+def archive_session(db, session_id: int) -> int:
+    # caller commits; returns the number of orders moved
+    moved = _move(db, Order, ArchivedOrder, session_id)
+    db.execute(update(LiveSession).where(LiveSession.id == session_id).values(archived_at=datetime.utcnow()))
+    return moved
+
+
+def restore_session(db, session_id: int) -> int:
+    moved = _move(db, ArchivedOrder, Order, session_id)
+    db.execute(update(LiveSession).where(LiveSession.id == session_id).values(archived_at=None))
+    return moved
+
+
+def archive_ended(days: int = ARCHIVE_AFTER_DAYS, user_id=None):
+    # returns (sessions archived, orders moved)
+    from app.templating import bump
+
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    db = SessionLocal()
+    try:
+        query = select(LiveSession.id, LiveSession.user_id).where(
+            LiveSession.ended_at < cutoff, LiveSession.archived_at.is_(None)
+        )
+        if user_id is not None:
+            query = query.where(LiveSession.user_id == user_id)
+        sessions = db.execute(query.order_by(LiveSession.id)).all()
+        moved = 0
+        for session_id, owner_id in sessions:
+            moved += archive_session(db, session_id)
+            db.commit()
+            # cached checkouts carry the archived flag
+            bump(owner_id, "orders")
+        return len(sessions), moved
+    finally:
+        db.close()
+
+
+def archive_status():
+    db = SessionLocal()
+    try:
+        return {
+            "orders": db.scalar(select(func.count()).select_from(Order)),
+            "archived_orders": db.scalar(select(func.count()).select_from(ArchivedOrder)),
+            "archived_sessions": db.scalar(
+                select(func.count()).select_from(LiveSession).where(LiveSession.archived_at.isnot(None))
+            ),
+        }
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    # python -m app.archive run [days] | restore <session id> | status
+    if sys.argv[1:2] == ["run"]:
+        days = int(sys.argv[2]) if len(sys.argv) > 2 else ARCHIVE_AFTER_DAYS
+        sessions, orders = archive_ended(days)
+        print(f"archived {orders} order(s) from {sessions} session(s) ended over {days} day(s) ago")
+    elif sys.argv[1:2] == ["restore"] and len(sys.argv) == 3:
+        db = SessionLocal()
+        try:
+            moved = restore_session(db, int(sys.argv[2]))
+            db.commit()
+        finally:
+            db.close()
+        print(f"restored {moved} order(s)")
+    elif sys.argv[1:] == ["status"]:
+        for name, count in archive_status().items():
+            print(f"{name:<18} {count}")
+    else:
+        print("usage: python -m app.archive run [days] | restore <session id> | status")
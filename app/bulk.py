@@ -0,0 +1,290 @@
+from collections import defaultdict
+from sqlalchemy import update
+from app.models import Order, Product
+from app.stock import reserve_stock, release_stock
+from app.rollups import apply_delta, status_delta, units_delta, bucket_key, bucket_delta
+from app.events import order_payload
+from app.customers import resolve_customers
+
+#-----------Bulk orders / batch status ----------#
+# A whole batch is validated up front and written in one transaction with a
+# single stock UPDATE per product (and one status UPDATE per old->new pair),
+# instead of one session + query + commit per order.
+
+MAX_BATCH = 2000
+STATUSES = ("PENDING", "PAID", "CANCELLED")
+
+
+def as_int(value):
+    # ints as they come from JSON, or numeric strings ("12"); None otherwise
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, int):
+        return value
+    if isinstance(value, str) and value.strip().lstrip("-").isdigit():
+        return int(value)
+    return None
+
+
+def check_order(r: dict):
+    # type-check one JSON line in place: sets r["error"] or coerces the
+    # numeric fields, so a bad line is reported instead of failing the batch
+    if "error" in r:
+        return
+    if not isinstance(r.get("customer_name", ""), str):
+        r["error"] = "customer_name must be text"
+    elif as_int(r.get("product_id")) is None:
+        r["error"] = "product_id must be a number"
+    elif "qty" in r and as_int(r["qty"]) is None:
+        r["error"] = "qty must be a number"
+    else:
+        r["product_id"] = as_int(r["product_id"])
+        if "qty" in r:
+            r["qty"] = as_int(r["qty"])
+
+
+def parse_order_lines(text: str, products) -> list:
+    # "customer, product, qty" per line; product is an id or the exact name
+    # (any case) and qty defaults to 1. Blank lines are skipped.
+    by_name = {p.name.strip().lower(): p.id for p in products}
+    items = []
+    for number, raw in enumerate(text.splitlines(), 1):
+        line = raw.strip()
+        if not line:
+            continue
+        parts = [part.strip() for part in line.split(",")]
+        item = {"line": number, "text": line}
+        if len(parts) not in (2, 3) or not parts[0] or not parts[1]:
+            item["error"] = "expected: customer, product, qty"
+        else:
+            item["customer_name"] = parts[0]
+            product = parts[1]
+            item["product_id"] = int(product) if product.isdigit() else by_name.get(product.lower())
+            try:
+                item["qty"] = int(parts[2]) if len(parts) == 3 else 1
+            except ValueError:
+                item["error"] = "qty must be a number"
+            if item["product_id"] is None:
+                item["error"] = "unknown product"
+        items.append(item)
+    return items
+
+
+def apply_orders(db, user_id: int, session_id: int, items: list):
+    # items: [{"customer_name", "product_id", "qty"}, ...] (parse errors may
+    # already be set). Returns (per-line results, feed events); the caller
+    # commits.
+    results = [{"line": number, **item} for number, item in enumerate(items, 1)]
+    for r in results:
+        check_order(r)
+    product_ids = {r["product_id"] for r in results if "error" not in r and r.get("product_id")}
+    products = {
+        p.id: p
+        for p in db.query(Product).filter(Product.user_id == user_id, Product.id.in_(product_ids))
+    } if product_ids else {}
+
+    # allocate stock line by line, in the order the buyers commented
+    left = {pid: p.stock for pid, p in products.items()}
+    wanted = defaultdict(list)
+    for r in results:
+        if "error" in r:
+            continue
+        customer = (r.get("customer_name") or "").strip()
+        qty = r.get("qty")
+        product = products.get(r.get("product_id"))
+        if not customer:
+            r["error"] = "customer name is required"
+        elif not isinstance(qty, int) or qty <= 0:
+            r["error"] = "qty must be at least 1"
+        elif product is None:
+            r["error"] = "unknown product"
+        elif left[product.id] < qty:
+            r["error"] = "out of stock"
+        else:
+            r["customer_name"] = customer
+            left[product.id] -= qty
+            wanted[product.id].append(r)
+
+    customer_ids = resolve_customers(
+        db, user_id, [r["customer_name"] for lines in wanted.values() for r in lines]
+    )
+
+    # one conditional stock UPDATE per product
+    events = []
+    orders = []
+    units = {}
+    for product_id, lines in wanted.items():
+        total = sum(r["qty"] for r in lines)
+        reserved = reserve_stock(db, user_id, product_id, total)
+        if not reserved:
+            # stock moved under us (a concurrent order); nothing taken
+            for r in lines:
+                r["error"] = "stock changed, try again"
+            continue
+        units[product_id] = total
+        events.append({"type": "stock", "product_id": product_id, "stock": reserved.stock})
+        for r in lines:
+            order = Order(
+                customer_name=r["customer_name"],
+                customer_id=customer_ids.get(r["customer_name"]),
+                session_id=session_id,
+                product_id=product_id,
+                qty=r["qty"],
+                status="PENDING",
+                user_id=user_id,
+            )
+            orders.append((r, order, reserved.name))
+    db.add_all([order for _, order, _ in orders])
+    db.flush()
+
+    order_events = []
+    buckets = defaultdict(lambda: defaultdict(int))
+    for r, order, product_name in orders:
+        r["order_id"] = order.id
+        order_events.append({"type": "order", "order": order_payload(order, product_name)})
+        bucket = buckets[bucket_key(session_id, order.created_at, order.product_id)]
+        bucket["orders"] += 1
+        bucket["units"] += order.qty
+    if orders:
+        apply_delta(db, user_id, total=len(orders), statuses={"PENDING": len(orders)}, units=units, buckets=buckets)
+
+    for r in results:
+        r["ok"] = "error" not in r
+    return results, order_events + events
+
+
+def apply_status_changes(db, user_id: int, changes: list):
+    # changes: [{"order_id", "status"}, ...]. Returns (results, events);
+    # the caller commits.
+    results = [dict(change) for change in changes]
+    for r in results:
+        if as_int(r.get("order_id")) is None:
+            r["error"] = "order_id must be a number"
+        else:
+            r["order_id"] = as_int(r["order_id"])
+    order_ids = {r["order_id"] for r in results if "error" not in r}
+    orders = {
+        o.id: o
+        for o in db.query(Order).filter(Order.user_id == user_id, Order.id.in_(order_ids))
+    } if order_ids else {}
+
+    # last change for an order wins; group by (old, new) status
+    targets = {}
+    for r in results:
+        if "error" in r:
+            continue
+        order = orders.get(r["order_id"])
+        if order is None:
+            r["error"] = "unknown order"
+        elif r.get("status") not in STATUSES:
+            r["error"] = "invalid status"
+        else:
+            targets[order.id] = r
+    groups = defaultdict(list)
+    for order_id, r in targets.items():
+        order = orders[order_id]
+        if order.status == r["status"]:
+            r["changed"] = False
+        else:
+            groups[(order.status, r["status"])].append(order)
+
+    products = {}
+    product_ids = {o.product_id for group in groups.values() for o in group}
+    if product_ids:
+        products = {
+            p.id: p
+            for p in db.query(Product.id, Product.price, Product.stock)
+            .filter(Product.user_id == user_id, Product.id.in_(product_ids))
+        }
+    prices = {product_id: p.price for product_id, p in products.items()}
+
+    # orders leaving CANCELLED sell their units again: allocate line by line,
+    # then one conditional stock UPDATE per product
+    left = {product_id: p.stock for product_id, p in products.items()}
+    reserved = defaultdict(int)
+    for (old_status, _), group in groups.items():
+        if old_status != "CANCELLED":
+            continue
+        for order in list(group):
+            if left.get(order.product_id, 0) < order.qty:
+                targets[order.id]["error"] = "out of stock"
+                group.remove(order)
+            else:
+                left[order.product_id] -= order.qty
+                reserved[order.product_id] += order.qty
+    stock = {}
+    for product_id in list(reserved):
+        taken = reserve_stock(db, user_id, product_id, reserved[product_id])
+        if taken:
+            stock[product_id] = taken.stock
+            continue
+        # stock moved under us (a concurrent order); nothing taken
+        del reserved[product_id]
+        for (old_status, _), group in groups.items():
+            if old_status != "CANCELLED":
+                continue
+            for order in [o for o in group if o.product_id == product_id]:
+                targets[order.id]["error"] = "stock changed, try again"
+                group.remove(order)
+
+    events = []
+    released = defaultdict(int)
+    restocked = defaultdict(int)
+    statuses = defaultdict(int)
+    units = defaultdict(int)
+    buckets = defaultdict(lambda: defaultdict(int))
+    revenue = 0.0
+    for (old_status, new_status), group in groups.items():
+        if not group:
+            continue
+        current = Order.status.is_(None) if old_status is None else Order.status == old_status
+        changed = set(db.execute(
+            update(Order)
+            .where(Order.user_id == user_id, Order.id.in_([o.id for o in group]), current)
+            .values(status=new_status)
+            .returning(Order.id)
+            .execution_options(synchronize_session=False)
+        ).scalars())
+        for order in group:
+            r = targets[order.id]
+            if order.id not in changed:
+                r["error"] = "order changed, try again"
+                continue
+            r["changed"] = True
+            events.append({"type": "status", "order_id": order.id, "status": new_status})
+            for status, count in status_delta(old_status, new_status).items():
+                statuses[status] += count
+            units[order.product_id] += units_delta(order.qty, old_status, new_status)
+            price = prices.get(order.product_id, 0)
+            order_revenue = 0
+            if old_status == "PAID":
+                order_revenue = -order.qty * price
+            elif new_status == "PAID":
+                order_revenue = order.qty * price
+            revenue += order_revenue
+            # the change lands in the order's own (session, day) bucket
+            bucket = buckets[bucket_key(order.session_id, order.created_at, order.product_id)]
+            for column, amount in bucket_delta(order.qty, old_status, new_status, order_revenue).items():
+                bucket[column] += amount
+            if new_status == "CANCELLED":
+                released[order.product_id] += order.qty
+            elif old_status == "CANCELLED":
+                restocked[order.product_id] += order.qty
+
+    # units reserved for orders that changed under us go back too
+    for product_id, qty in reserved.items():
+        released[product_id] += qty - restocked[product_id]
+
+    # one stock UPDATE per product for all cancellations
+    for product_id, qty in released.items():
+        if qty:
+            left = release_stock(db, user_id, product_id, qty)
+            if left is not None:
+                stock[product_id] = left
+    for product_id, left in stock.items():
+        events.append({"type": "stock", "product_id": product_id, "stock": left})
+    apply_delta(db, user_id, statuses=statuses, revenue=revenue, units=units, buckets=buckets)
+
+    for r in results:
+        r["ok"] = "error" not in r
+    return results, events
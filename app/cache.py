@@ -0,0 +1,96 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+#-----------Shared cache ----------#
+# Small key/value cache for hot per-user state (e.g. the active live
+# session). CACHE_BACKEND picks where it lives:
+#   memory - a dict in this process (fine for a single worker)
+#   sqlite - a local SQLite file every worker on the box shares, so an
+#            invalidation in one worker is seen by all of them
+# Values must be JSON serialisable.
+
+
+class MemoryCache:
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            value, expires = item
+            if expires is not None and expires < time.time():
+                del self._data[key]
+                return None
+            return value
+
+    def set(self, key: str, value, ttl: float = None):
+        expires = time.time() + ttl if ttl else None
+        with self._lock:
+            self._data[key] = (value, expires)
+
+    def delete(self, key: str):
+        with self._lock:
+            self._data.pop(key, None)
+
+
+class SqliteCache:
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+
+    def _conn(self):
+        # the file and table are created on first use, not at import
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                " key TEXT PRIMARY KEY, value TEXT NOT NULL, expires REAL)"
+            )
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str):
+        row = self._conn().execute(
+            "SELECT value, expires FROM cache WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        value, expires = row
+        if expires is not None and expires < time.time():
+            self.delete(key)
+            return None
+        return json.loads(value)
+
+    def set(self, key: str, value, ttl: float = None):
+        expires = time.time() + ttl if ttl else None
+        self._conn().execute(
+            "INSERT OR REPLACE INTO cache (key, value, expires) VALUES (?, ?, ?)",
+            (key, json.dumps(value), expires),
+        )
+
+    def delete(self, key: str):
+        self._conn().execute("DELETE FROM cache WHERE key = ?", (key,))
+
+
+STATE_DB_PATH = os.getenv("STATE_DB_PATH", "./livesell_state.db")
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory")
+
+
+def make_cache(backend: str = CACHE_BACKEND):
+    if backend == "memory":
+        return MemoryCache()
+    if backend == "sqlite":
+        return SqliteCache(STATE_DB_PATH)
+    raise RuntimeError(f"Unknown CACHE_BACKEND {backend!r}, use 'memory' or 'sqlite'")
+
+
+cache = make_cache()
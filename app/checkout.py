@@ -0,0 +1,142 @@
+import csv
+import io
+from sqlalchemy import case, func, select
+from app.models import LiveSession, Product, Customer
+from app.archive import session_orders_table
+from app.templating import cached_fragment
+
+#-----------Session checkout ----------#
+# End-of-live invoices: a session's orders totalled per buyer and product in
+# one GROUP BY on ids (one row per customer x product x status, not per
+# order), then folded into per-customer invoices here with the names and
+# prices looked up by id. The result is cached until the
+# user's orders or inventory (prices) change, so reopening or exporting a
+# 10k-order session doesn't run the aggregate again.
+# Amounts use the current product price, like /summary.
+
+STATUSES = ("PENDING", "PAID", "CANCELLED")
+
+
+def build_checkout(db, user_id: int, session_id: int):
+    session = (
+        db.query(
+            LiveSession.id, LiveSession.title, LiveSession.started_at, LiveSession.ended_at,
+            LiveSession.archived_at,
+        )
+        .filter(LiveSession.id == session_id, LiveSession.user_id == user_id)
+        .first()
+    )
+    if session is None:
+        return None
+
+    # orders from before the customer directory fall back to the typed name
+    orders_table = session_orders_table(session.archived_at)
+    unlinked_name = case((orders_table.customer_id.is_(None), orders_table.customer_name), else_=None)
+    rows = db.execute(
+        select(
+            orders_table.customer_id, unlinked_name, orders_table.product_id, orders_table.status,
+            func.sum(orders_table.qty), func.count(),
+        )
+        .where(orders_table.user_id == user_id, orders_table.session_id == session_id)
+        .group_by(orders_table.customer_id, unlinked_name, orders_table.product_id, orders_table.status)
+    ).all()
+
+    # names and prices for the ids in the result
+    customer_ids = {row[0] for row in rows if row[0] is not None}
+    product_ids = {row[2] for row in rows}
+    customer_names = dict(db.execute(
+        select(Customer.id, Customer.name).where(Customer.id.in_(customer_ids))
+    ).all()) if customer_ids else {}
+    products = {
+        product_id: (name, float(price or 0))
+        for product_id, name, price in db.execute(
+            select(Product.id, Product.name, Product.price).where(Product.id.in_(product_ids))
+        )
+    } if product_ids else {}
+
+    # (customer key) -> product id -> qty per status
+    buyers = {}
+    orders = {}
+    for customer_id, typed_name, product_id, status, qty, count in rows:
+        key = customer_id if customer_id is not None else typed_name
+        by_status = buyers.setdefault(key, {}).setdefault(product_id, dict.fromkeys(STATUSES, 0))
+        by_status[status if status in STATUSES else "PENDING"] += qty
+        orders[key] = orders.get(key, 0) + count
+
+    totals = {"customers": len(buyers), "orders": 0, "qty": 0, "total": 0.0, "paid": 0.0, "pending": 0.0, "cancelled_qty": 0}
+    invoices = []
+    for key, items in buyers.items():
+        invoice = {
+            "customer_id": key if isinstance(key, int) else None,
+            "name": customer_names.get(key, "") if isinstance(key, int) else key,
+            "orders": orders[key],
+            "items": [],
+            "qty": 0, "total": 0.0, "paid": 0.0, "pending": 0.0, "cancelled_qty": 0,
+        }
+        for product_id, qty in items.items():
+            name, price = products.get(product_id, ("(deleted product)", 0.0))
+            item = {
+                "product_id": product_id,
+                "product": name,
+                "price": price,
+                "qty": qty["PAID"] + qty["PENDING"],
+                "paid_qty": qty["PAID"],
+                "pending_qty": qty["PENDING"],
+                "cancelled_qty": qty["CANCELLED"],
+                "paid": qty["PAID"] * price,
+                "pending": qty["PENDING"] * price,
+            }
+            item["total"] = item["paid"] + item["pending"]
+            invoice["items"].append(item)
+            for field in ("qty", "total", "paid", "pending", "cancelled_qty"):
+                invoice[field] += item[field]
+        invoice["items"].sort(key=lambda i: i["product"].casefold())
+        for field in ("orders", "qty", "total", "paid", "pending", "cancelled_qty"):
+            totals[field] += invoice[field]
+        invoices.append(invoice)
+    invoices.sort(key=lambda c: (c["name"] or "").casefold())
+
+    return {
+        "session": {
+            "id": session.id,
+            "title": session.title,
+            "started_at": session.started_at.isoformat() if session.started_at else None,
+            "ended_at": session.ended_at.isoformat() if session.ended_at else None,
+            "archived": session.archived_at is not None,
+        },
+        "customers": invoices,
+        "totals": totals,
+    }
+
+
+def session_checkout(db, user_id: int, session_id: int):
+    # cached; treat the result as read-only
+    return cached_fragment(
+        "checkout", user_id, ("orders", "inventory"), session_id,
+        lambda: build_checkout(db, user_id, session_id),
+    )
+
+
+CSV_HEADER = [
+    "customer", "product", "unit_price", "qty", "paid_qty", "pending_qty",
+    "cancelled_qty", "paid", "pending", "total",
+]
+
+
+def checkout_csv(checkout) -> str:
+    # one line per customer and product, then the customer's total line
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow(CSV_HEADER)
+    for invoice in checkout["customers"]:
+        for item in invoice["items"]:
+            writer.writerow([
+                invoice["name"], item["product"], f"{item['price']:.2f}", item["qty"],
+                item["paid_qty"], item["pending_qty"], item["cancelled_qty"],
+                f"{item['paid']:.2f}", f"{item['pending']:.2f}", f"{item['total']:.2f}",
+            ])
+        writer.writerow([
+            invoice["name"], "TOTAL", "", invoice["qty"], "", "", invoice["cancelled_qty"],
+            f"{invoice['paid']:.2f}", f"{invoice['pending']:.2f}", f"{invoice['total']:.2f}",
+        ])
+    return output.getvalue()
@@ -0,0 +1,265 @@
+import re
+import sys
+import time
+import unicodedata
+from sqlalchemy import insert, inspect, text
+from app.models import SessionLocal, Customer, Order
+
+#-----------Customer directory ----------#
+# Every order is linked to a Customer, found by a normalized form of the
+# typed name ("  María  Cruz" and "maria cruz" are the same buyer). The live
+# order form autocompletes against it:
+#   1. prefix match, a range scan on ix_customers_user_normalized
+#   2. substring match ("cruz" finds "maria cruz")
+#   3. fuzzy match on shared trigrams, for typos ("mraia" finds "maria")
+# On SQLite 2 and 3 use an FTS5 trigram index (customers_fts, kept in sync
+# by triggers); elsewhere 2 is a LIKE scan and 3 is skipped.
+
+SEARCH_LIMIT = 8
+FTS_TABLE = "customers_fts"
+FTS_VOCAB = "customers_fts_vocab"
+# trigrams in more names than this are too common to say anything in a fuzzy
+# match (and would make it rank most of the table)
+FUZZY_MAX_DOCS = 2000
+# trigram counts only steer which terms to use, so each process keeps them
+# for a while instead of asking fts5vocab on every keystroke
+TRIGRAM_STATS_TTL = 300
+
+_trigram_docs = {}  # trigram -> (names containing it, fetched at)
+
+_fts_enabled = {}  # engine url -> bool
+
+
+def normalize_name(name: str) -> str:
+    # strip accents, case and punctuation, collapse whitespace
+    decomposed = unicodedata.normalize("NFKD", name or "")
+    plain = "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+    return " ".join(re.sub(r"[^\w]+", " ", plain.casefold()).split())
+
+
+def setup_search(engine) -> bool:
+    # create the FTS5 trigram index + triggers (SQLite >= 3.34 with FTS5)
+    if engine.dialect.name != "sqlite":
+        _fts_enabled[str(engine.url)] = False
+        return False
+    created = not inspect(engine).has_table(FTS_TABLE)
+    try:
+        with engine.begin() as conn:
+            conn.exec_driver_sql(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+                " normalized_name, content='customers', content_rowid='id', tokenize='trigram')"
+            )
+            conn.exec_driver_sql(
+                f"CREATE TRIGGER IF NOT EXISTS customers_fts_ai AFTER INSERT ON customers BEGIN"
+                f" INSERT INTO {FTS_TABLE}(rowid, normalized_name) VALUES (new.id, new.normalized_name); END"
+            )
+            conn.exec_driver_sql(
+                f"CREATE TRIGGER IF NOT EXISTS customers_fts_ad AFTER DELETE ON customers BEGIN"
+                f" INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, normalized_name)"
+                f" VALUES ('delete', old.id, old.normalized_name); END"
+            )
+            conn.exec_driver_sql(
+                f"CREATE TRIGGER IF NOT EXISTS customers_fts_au AFTER UPDATE ON customers BEGIN"
+                f" INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, normalized_name)"
+                f" VALUES ('delete', old.id, old.normalized_name);"
+                f" INSERT INTO {FTS_TABLE}(rowid, normalized_name) VALUES (new.id, new.normalized_name); END"
+            )
+            conn.exec_driver_sql(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_VOCAB} USING fts5vocab({FTS_TABLE}, 'row')"
+            )
+            if created:
+                # index customers that existed before the FTS table
+                conn.exec_driver_sql(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+    except Exception:
+        # no FTS5 / trigram tokenizer in this SQLite build
+        _fts_enabled[str(engine.url)] = False
+        return False
+    _fts_enabled[str(engine.url)] = True
+    return True
+
+
+def _fts(db) -> bool:
+    bind = db.get_bind()
+    key = str(bind.url)
+    if key not in _fts_enabled:
+        _fts_enabled[key] = bind.dialect.name == "sqlite" and inspect(bind).has_table(FTS_TABLE)
+    return _fts_enabled[key]
+
+
+def _insert_missing(db):
+    # INSERT that skips names another request added a moment ago
+    dialect = db.get_bind().dialect.name
+    if dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    elif dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    else:
+        return insert(Customer)
+    return dialect_insert(Customer).on_conflict_do_nothing(index_elements=["user_id", "normalized_name"])
+
+
+def resolve_customers(db, user_id: int, names) -> dict:
+    # typed name -> customer id, creating customers that don't exist yet;
+    # names that normalize to nothing are left out. The caller commits.
+    wanted = {}
+    for name in names:
+        key = normalize_name(name)
+        if key:
+            wanted.setdefault(key, " ".join(name.split()))
+    if not wanted:
+        return {}
+
+    def lookup(keys):
+        return dict(
+            db.query(Customer.normalized_name, Customer.id)
+            .filter(Customer.user_id == user_id, Customer.normalized_name.in_(keys))
+        )
+
+    ids = lookup(list(wanted))
+    missing = [key for key in wanted if key not in ids]
+    if missing:
+        db.execute(
+            _insert_missing(db),
+            [{"user_id": user_id, "name": wanted[key], "normalized_name": key} for key in missing],
+        )
+        ids.update(lookup(missing))
+    return {name: ids[normalize_name(name)] for name in names if normalize_name(name) in ids}
+
+
+def customer_id_for(db, user_id: int, name: str):
+    return resolve_customers(db, user_id, [name]).get(name)
+
+
+def _fts_phrase(term: str) -> str:
+    return '"' + term.replace('"', '""') + '"'
+
+
+def _like_pattern(term: str) -> str:
+    escaped = term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+def _trigram_counts(db, trigrams) -> dict:
+    # how many names contain each trigram (one lookup per term: fts5vocab
+    # only uses its index for `term = ?`)
+    now = time.monotonic()
+    stale = [t for t in trigrams if now - _trigram_docs.get(t, (0, -TRIGRAM_STATS_TTL))[1] >= TRIGRAM_STATS_TTL]
+    if stale:
+        fresh = {term: count for term, count in db.execute(
+            text(" UNION ALL ".join(
+                f"SELECT term, doc FROM {FTS_VOCAB} WHERE term = :t{i}" for i in range(len(stale))
+            )),
+            {f"t{i}": trigram for i, trigram in enumerate(stale)},
+        )}
+        if len(_trigram_docs) > 100_000:
+            _trigram_docs.clear()
+        for trigram in stale:
+            _trigram_docs[trigram] = (fresh.get(trigram, 0), now)
+    return {t: _trigram_docs[t][0] for t in trigrams}
+
+
+def search_customers(db, user_id: int, query: str, limit: int = SEARCH_LIMIT) -> list:
+    # [(id, name), ...] best matches first
+    term = normalize_name(query)
+    if not term:
+        return []
+    found = {}
+
+    # 1. prefix: range scan on (user_id, normalized_name)
+    for customer_id, name in (
+        db.query(Customer.id, Customer.name)
+        .filter(
+            Customer.user_id == user_id,
+            Customer.normalized_name >= term,
+            Customer.normalized_name < term + "\U0010ffff",
+        )
+        .order_by(Customer.normalized_name)
+        .limit(limit)
+    ):
+        found[customer_id] = name
+    if len(found) >= limit or len(term) < 3:
+        return list(found.items())
+
+    if not _fts(db):
+        # 2. substring, scanning the user's customers
+        rows = db.execute(text(
+            "SELECT id, name FROM customers"
+            " WHERE user_id = :user_id AND normalized_name LIKE :pattern ESCAPE '\\' LIMIT :limit"
+        ), {"user_id": user_id, "pattern": _like_pattern(term), "limit": limit})
+        for customer_id, name in rows:
+            found.setdefault(customer_id, name)
+        return list(found.items())[:limit]
+
+    trigrams = sorted({term[i:i + 3] for i in range(len(term) - 2)})
+    docs = _trigram_counts(db, trigrams)
+    by_rarity = sorted(trigrams, key=docs.get)
+    # CROSS JOIN keeps the FTS index as the outer loop; left to itself
+    # SQLite walks every customer of the user and probes FTS for each
+    fts_query = (
+        f"SELECT c.id, c.name FROM {FTS_TABLE} f CROSS JOIN customers c ON c.id = f.rowid"
+        f" WHERE f.{FTS_TABLE} MATCH :match AND c.user_id = :user_id"
+    )
+
+    # 2. substring: names holding the rarest trigrams, then the real check
+    rows = db.execute(
+        text(fts_query + " AND c.normalized_name LIKE :pattern ESCAPE '\\' LIMIT :limit"),
+        {
+            "match": " AND ".join(_fts_phrase(t) for t in by_rarity[:3]),
+            "user_id": user_id,
+            "pattern": _like_pattern(term),
+            "limit": limit,
+        },
+    )
+    for customer_id, name in rows:
+        found.setdefault(customer_id, name)
+
+    # 3. fuzzy: the query's less common trigrams, ranked by how many match
+    usable = [t for t in by_rarity if docs[t] <= FUZZY_MAX_DOCS]
+    if len(found) < limit and len(term) >= 4 and usable:
+        rows = db.execute(
+            text(fts_query + " ORDER BY f.rank LIMIT :limit"),
+            {"match": " OR ".join(_fts_phrase(t) for t in usable), "user_id": user_id, "limit": limit * 2},
+        )
+        for customer_id, name in rows:
+            found.setdefault(customer_id, name)
+    return list(found.items())[:limit]
+
+
+def backfill_customers(batch: int = 1000) -> int:
+    # link orders saved before customers existed; safe to run again
+    db = SessionLocal()
+    linked = 0
+    try:
+        pairs = (
+            db.query(Order.user_id, Order.customer_name)
+            .filter(Order.customer_id.is_(None))
+            .distinct()
+            .all()
+        )
+        for start in range(0, len(pairs), batch):
+            by_user = {}
+            for user_id, name in pairs[start:start + batch]:
+                by_user.setdefault(user_id, []).append(name)
+            for user_id, names in by_user.items():
+                ids = resolve_customers(db, user_id, names)
+                if not ids:
+                    continue
+                linked += db.execute(text(
+                    "UPDATE orders SET customer_id = :customer_id"
+                    " WHERE user_id = :user_id AND customer_name = :name AND customer_id IS NULL"
+                ), [
+                    {"customer_id": customer_id, "user_id": user_id, "name": name}
+                    for name, customer_id in ids.items()
+                ]).rowcount
+            db.commit()
+    finally:
+        db.close()
+    return linked
+
+
+if __name__ == "__main__":
+    # python -m app.customers backfill
+    if sys.argv[1:] == ["backfill"]:
+        print(f"linked {backfill_customers()} order(s) to customers")
+    else:
+        print("usage: python -m app.customers backfill")
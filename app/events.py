@@ -0,0 +1,173 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+
+#-----------Live order feed ----------#
+# In-process pub/sub hub. Every open live page subscribes with its own
+# bounded queue, and add_order / update_status publish small deltas
+# (new order, status change, new stock) to all pages of that seller.
+
+class OrderFeed:
+    def __init__(self, max_queue: int = 256):
+        self.max_queue = max_queue
+        self._subscribers = defaultdict(dict)
+        self._lock = threading.Lock()
+
+    def subscribe(self, user_id: int) -> asyncio.Queue:
+        # must be called from the event loop that will read the queue
+        queue = asyncio.Queue(maxsize=self.max_queue)
+        with self._lock:
+            self._subscribers[user_id][queue] = asyncio.get_running_loop()
+        return queue
+
+    def unsubscribe(self, user_id: int, queue: asyncio.Queue):
+        with self._lock:
+            subscribers = self._subscribers.get(user_id)
+            if subscribers is None:
+                return
+            subscribers.pop(queue, None)
+            if not subscribers:
+                del self._subscribers[user_id]
+
+    def subscriber_count(self, user_id: int) -> int:
+        with self._lock:
+            return len(self._subscribers.get(user_id, ()))
+
+    def publish(self, user_id: int, event: dict):
+        # safe to call from handlers and from worker threads alike
+        self.deliver(user_id, json.dumps(event))
+
+    def publish_many(self, user_id: int, events: list):
+        for event in events:
+            self.publish(user_id, event)
+
+    def deliver(self, user_id: int, payload: str):
+        # hand an already-encoded event to this process's open pages
+        with self._lock:
+            subscribers = list(self._subscribers.get(user_id, {}).items())
+        if not subscribers:
+            return
+        for queue, loop in subscribers:
+            try:
+                loop.call_soon_threadsafe(_offer, queue, payload)
+            except RuntimeError:
+                # loop already closed, the stream is going away
+                pass
+
+
+def _offer(queue: asyncio.Queue, payload: str):
+    try:
+        queue.put_nowait(payload)
+    except asyncio.QueueFull:
+        # slow page: drop what it missed and tell it to reload once
+        while not queue.empty():
+            queue.get_nowait()
+        queue.put_nowait(json.dumps({"type": "resync"}))
+
+
+class SharedOrderFeed(OrderFeed):
+    # Cross-worker variant: publish() appends to a table in the local state
+    # file, and a poller thread in each worker delivers new rows to that
+    # worker's pages. Rows are kept for a minute, long enough for any
+    # worker to pick them up.
+    def __init__(self, path: str, poll_interval: float = 0.05, max_queue: int = 256):
+        super().__init__(max_queue)
+        self.path = path
+        self.poll_interval = poll_interval
+        self._local = threading.local()
+        self._poller = None
+        self._published = 0
+
+    def _conn(self):
+        # the file and table are created on first use, not at import
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS feed_events ("
+                " id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER NOT NULL,"
+                " payload TEXT NOT NULL, created REAL NOT NULL)"
+            )
+            self._local.conn = conn
+        return conn
+
+    def subscribe(self, user_id: int) -> asyncio.Queue:
+        with self._lock:
+            if self._poller is None:
+                self._poller = threading.Thread(target=self._poll, name="feed-poller", daemon=True)
+                self._poller.start()
+        return super().subscribe(user_id)
+
+    def publish(self, user_id: int, event: dict):
+        self.publish_many(user_id, [event])
+
+    def publish_many(self, user_id: int, events: list):
+        # a whole batch is one transaction (one fsync), not one per event;
+        # this blocks on the file, so call it off the event loop
+        if not events:
+            return
+        conn = self._conn()
+        now = time.time()
+        conn.execute("BEGIN")
+        try:
+            conn.executemany(
+                "INSERT INTO feed_events (user_id, payload, created) VALUES (?, ?, ?)",
+                [(user_id, json.dumps(event), now) for event in events],
+            )
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+        before, self._published = self._published, self._published + len(events)
+        if before // 500 != self._published // 500:
+            conn.execute("DELETE FROM feed_events WHERE created < ?", (now - 60,))
+
+    def _poll(self):
+        conn = self._conn()
+        last_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM feed_events").fetchone()[0]
+        while True:
+            time.sleep(self.poll_interval)
+            try:
+                rows = conn.execute(
+                    "SELECT id, user_id, payload FROM feed_events WHERE id > ? ORDER BY id",
+                    (last_id,),
+                ).fetchall()
+            except sqlite3.OperationalError:
+                continue  # busy; try again next tick
+            for event_id, user_id, payload in rows:
+                last_id = event_id
+                self.deliver(user_id, payload)
+
+
+def make_feed(backend: str):
+    if backend == "memory":
+        return OrderFeed()
+    if backend == "sqlite":
+        from app.cache import STATE_DB_PATH
+        return SharedOrderFeed(STATE_DB_PATH)
+    raise RuntimeError(f"Unknown FEED_BACKEND {backend!r}, use 'memory' or 'sqlite'")
+
+
+def order_payload(order, product_name: str) -> dict:
+    # shape of an order row, shared by the feed and the JSON listings
+    return {
+        "id": order.id,
+        "customer_name": order.customer_name,
+        "product_name": product_name,
+        "qty": order.qty,
+        "status": order.status,
+    }
+
+
+def format_sse(payload: str) -> str:
+    return f"data: {payload}\n\n"
+
+
+# FEED_BACKEND=sqlite is needed as soon as more than one worker serves /live
+order_feed = make_feed(os.getenv("FEED_BACKEND", "memory"))
@@ -0,0 +1,236 @@
+import asyncio
+import json
+import logging
+import os
+import re
+import sys
+import time
+from collections import defaultdict
+from fastapi.concurrency import run_in_threadpool
+from app.models import SessionLocal, Product, User
+from app.live_sessions import get_or_create_active_session
+from app.bulk import MAX_BATCH, apply_orders
+from app.events import order_feed
+from app.metrics import INGEST_COMMENTS, INGEST_BATCH_SECONDS
+from app.templating import bump, cached_fragment
+
+#-----------Comment ingestion ----------#
+# Turns live chat comments like "mine A12 x2" into orders without anyone
+# retyping them. Comments (from the webhook or a replayed log) go into one
+# bounded asyncio queue; a single consumer takes whatever is waiting, up to
+# INGEST_BATCH, and writes each seller's claims with bulk.apply_orders (the
+# bulk endpoint's stock path: one conditional UPDATE per product, first
+# comment first served) in one transaction. When the queue is full the
+# webhook answers 429 and a replay waits, instead of buffering without
+# bound.
+
+INGEST_QUEUE_SIZE = int(os.getenv("INGEST_QUEUE_SIZE", "10000"))
+INGEST_BATCH = min(int(os.getenv("INGEST_BATCH", "500")), MAX_BATCH)
+
+logger = logging.getLogger("livesell.ingest")
+
+# "mine A12", "Mine #a12 x2", "mine 7 x 3"; qty defaults to 1
+CLAIM = re.compile(r"\bmine\s+#?([a-z0-9][\w-]*)(?:\s+x\s*(\d+))?\b", re.IGNORECASE)
+ATTACHED_QTY = re.compile(r"(.+?)x(\d+)", re.IGNORECASE)
+
+
+def normalize_code(code: str) -> str:
+    return (code or "").strip().upper()
+
+
+def code_index(db, user_id: int) -> dict:
+    # code -> product id for one seller; product ids work as codes too, for
+    # products without one. Rebuilt whenever the inventory changes.
+    def build():
+        index = {}
+        products = (
+            db.query(Product.id, Product.code)
+            .filter(Product.user_id == user_id)
+            .order_by(Product.id.desc())
+            .all()
+        )
+        for product_id, _ in products:
+            index[str(product_id)] = product_id
+        # a code shared by two products goes to the older one
+        for product_id, code in products:
+            if code:
+                index[normalize_code(code)] = product_id
+        return index
+
+    return cached_fragment("product_codes", user_id, ("inventory",), None, build)
+
+
+def parse_claims(text: str, codes: dict) -> list:
+    # [(code, product_id or None, qty)] for every "mine" in the comment
+    claims = []
+    for match in CLAIM.finditer(text or ""):
+        code, qty = normalize_code(match.group(1)), match.group(2)
+        if qty is None and code not in codes:
+            # "mine A12x2"
+            attached = ATTACHED_QTY.fullmatch(code)
+            if attached and attached.group(1) in codes:
+                code, qty = attached.group(1), attached.group(2)
+        claims.append((code, codes.get(code), int(qty) if qty else 1))
+    return claims
+
+
+def ingest_batch(user_id: int, comments: list) -> dict:
+    # comments: [{"name": buyer, "text": comment}, ...] in chat order.
+    # Runs in a worker thread; commits and publishes to the live pages.
+    counts = defaultdict(int)
+    db = SessionLocal()
+    try:
+        codes = code_index(db, user_id)
+        items = []
+        for comment in comments:
+            name = str(comment.get("name") or "").strip()
+            claims = parse_claims(str(comment.get("text") or ""), codes)
+            if not claims:
+                counts["ignored"] += 1
+            for code, product_id, qty in claims:
+                item = {"customer_name": name, "product_id": product_id, "qty": qty}
+                if product_id is None:
+                    item["error"] = f"unknown code {code}"
+                items.append(item)
+        events = []
+        if items:
+            active_session = get_or_create_active_session(db, user_id)
+            results, events = apply_orders(db, user_id, active_session.id, items)
+            db.commit()
+            for r in results:
+                counts["order" if r["ok"] else "rejected"] += 1
+            if events:
+                bump(user_id, "orders", "inventory")
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+    order_feed.publish_many(user_id, events)
+    for outcome, count in counts.items():
+        INGEST_COMMENTS.inc(outcome, amount=count)
+    return counts
+
+
+class CommentIngestor:
+    def __init__(self, max_queue: int = INGEST_QUEUE_SIZE, batch: int = INGEST_BATCH):
+        self.max_queue = max_queue
+        self.batch = batch
+        self.queue = None
+        self.totals = defaultdict(int)
+        self._task = None
+
+    def start(self):
+        # must be called from the event loop that will feed it
+        self.queue = asyncio.Queue(maxsize=self.max_queue)
+        self._task = asyncio.create_task(self._consume())
+
+    async def stop(self):
+        # finish what is queued, then stop the consumer
+        if self._task is None:
+            return
+        await self.queue.join()
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    @property
+    def running(self) -> bool:
+        # false until the app's lifespan has started the consumer
+        return self._task is not None
+
+    def offer(self, user_id: int, comments: list) -> int:
+        # queue as many as fit right now; returns how many were taken
+        taken = 0
+        for comment in comments:
+            try:
+                self.queue.put_nowait((user_id, comment))
+            except asyncio.QueueFull:
+                break
+            taken += 1
+        return taken
+
+    async def put(self, user_id: int, comment: dict):
+        # waits while the queue is full
+        await self.queue.put((user_id, comment))
+
+    async def _consume(self):
+        while True:
+            batch = [await self.queue.get()]
+            while len(batch) < self.batch and not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+
+            by_user = defaultdict(list)
+            for user_id, comment in batch:
+                by_user[user_id].append(comment)
+            start = time.perf_counter()
+            for user_id, comments in by_user.items():
+                try:
+                    counts = await run_in_threadpool(ingest_batch, user_id, comments)
+                except Exception:
+                    logger.exception("dropped %d comment(s) for user %s", len(comments), user_id)
+                    INGEST_COMMENTS.inc("failed", amount=len(comments))
+                    self.totals["failed"] += len(comments)
+                    continue
+                for outcome, count in counts.items():
+                    self.totals[outcome] += count
+            INGEST_BATCH_SECONDS.observe(time.perf_counter() - start)
+            for _ in batch:
+                self.queue.task_done()
+
+
+comment_ingestor = CommentIngestor()
+
+
+#-----------Replay ----------#
+
+def read_comment_log(path: str):
+    # JSON lines {"name": ..., "text": ...} or plain "name: text" lines
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith("{"):
+                yield json.loads(line)
+            else:
+                name, _, text = line.partition(":")
+                yield {"name": name.strip(), "text": text.strip()}
+
+
+async def replay(path: str, user_id: int, batch: int = INGEST_BATCH):
+    ingestor = CommentIngestor(batch=batch)
+    ingestor.start()
+    start = time.perf_counter()
+    count = 0
+    for comment in read_comment_log(path):
+        await ingestor.put(user_id, comment)
+        count += 1
+    await ingestor.stop()
+    elapsed = time.perf_counter() - start
+    return count, elapsed, dict(ingestor.totals)
+
+
+def print_replay(count: int, elapsed: float, totals: dict):
+    print(
+        f"{count} comments in {elapsed:.2f}s: {count / elapsed:,.0f} comments/s,"
+        f" {totals.get('order', 0) / elapsed:,.0f} orders/s"
+    )
+    print("  " + ", ".join(f"{outcome} {n}" for outcome, n in sorted(totals.items())))
+
+
+if __name__ == "__main__":
+    # python -m app.ingest replay <log> <seller email>
+    if sys.argv[1:2] == ["replay"] and len(sys.argv) == 4:
+        db = SessionLocal()
+        user_id = db.query(User.id).filter(User.email == sys.argv[3]).scalar()
+        db.close()
+        if user_id is None:
+            sys.exit(f"no user {sys.argv[3]!r}")
+        print_replay(*asyncio.run(replay(sys.argv[2], user_id)))
+    else:
+        print("usage: python -m app.ingest replay <log> <seller email>")
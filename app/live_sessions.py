@@ -0,0 +1,76 @@
+import uuid
+from collections import namedtuple
+from datetime import datetime
+from sqlalchemy import update
+from app.models import LiveSession
+from app.cache import cache
+
+#-----------Active live session ----------#
+# Every order goes into the seller's open LiveSession. Its id/title are
+# cached per user so the order-entry path doesn't look it up each time;
+# ending the session drops the cache entry (in every worker when the cache
+# backend is shared).
+#
+# A lookup that raced with an end (read the open session, then the end
+# committed and dropped the key, then the lookup cached what it read) must
+# not put the ended session back. So ending also moves the user's
+# generation on, every cached entry carries the generation that was current
+# before its lookup started, and an entry from an older generation is a miss.
+
+ActiveSession = namedtuple("ActiveSession", "id title")
+
+
+def _cache_key(user_id: int) -> str:
+    return f"live:active_session:{user_id}"
+
+
+def _generation_key(user_id: int) -> str:
+    return f"live:active_session_gen:{user_id}"
+
+
+def _generation(user_id: int) -> str:
+    return cache.get(_generation_key(user_id)) or "0"
+
+
+def cached_active_session(user_id: int):
+    # the active session if it is cached, without touching the database
+    cached = cache.get(_cache_key(user_id))
+    if not cached or len(cached) != 3 or cached[2] != _generation(user_id):
+        return None
+    return ActiveSession(*cached[:2])
+
+
+def get_or_create_active_session(db, user_id: int) -> ActiveSession:
+    cached = cached_active_session(user_id)
+    if cached:
+        return cached
+
+    generation = _generation(user_id)  # before the lookup, see above
+
+    session = (
+        db.query(LiveSession)
+        .filter(LiveSession.ended_at == None, LiveSession.user_id == user_id)
+        .order_by(LiveSession.id.desc())
+        .first()
+    )
+    if not session:
+        session = LiveSession(title="Live Session", user_id=user_id)
+        db.add(session)
+        db.commit()
+        db.refresh(session)
+
+    active = ActiveSession(session.id, session.title)
+    cache.set(_cache_key(user_id), [*active, generation])
+    return active
+
+
+def end_active_session(db, user_id: int):
+    # close every open session of the user in one statement, no lookup
+    db.execute(
+        update(LiveSession)
+        .where(LiveSession.user_id == user_id, LiveSession.ended_at == None)
+        .values(ended_at=datetime.utcnow())
+    )
+    db.commit()
+    cache.set(_generation_key(user_id), uuid.uuid4().hex)
+    cache.delete(_cache_key(user_id))
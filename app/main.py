@@ -1,65 +1,86 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request
-from fastapi.responses import HTMLResponse
-from fastapi.staticfiles import StaticFiles
-from fastapi.templating import Jinja2Templates
-from pathlib import Path
-from starlette.middleware.sessions import SessionMiddleware
+from fastapi.responses import HTMLResponse, PlainTextResponse
+from app import metrics
+from app.metrics import MetricsMiddleware
+from app.templating import templates
 from fastapi.responses import RedirectResponse
 #auth
 from app.routes import auth 
 #db
-from app.models import init_db
+from app.models import init_db_once
 from dotenv import load_dotenv
 import os
 #inventory
 from app.routes import inventory
 #live order
 from app.routes import live
+#uploads
+from app.uploads import CachedStaticFiles, UploadLimitMiddleware
 #summary
 from app.routes.summary import router as summary_router
+#checkout
+from app.routes import checkout
+#comment ingestion
+from app.ingest import comment_ingestor
+#server-side sessions
+from app.sessions import ServerSessionMiddleware, user_context
 
 load_dotenv()
 
-app = FastAPI()
-#db 
-init_db()
+
+# Startup work lives here rather than at import time, so importing the app
+# (every worker, every tool) has no side effects.
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    #db
+    init_db_once()
+    comment_ingestor.start()
+    yield
+    await comment_ingestor.stop()
+
+
+app = FastAPI(lifespan=lifespan)
 #summary
 app.include_router(summary_router)
 #live route
 app.include_router(live.router)
 #inventory
 app.include_router(inventory.router)
+#checkout
+app.include_router(checkout.router)
 # secret key
 secret = os.getenv("SECRET_KEY")
 if not secret:
     raise RuntimeError("SECRET_KEY missing: put it in .env")
-app.add_middleware(SessionMiddleware, secret_key=secret)
+# sessions live server-side, the cookie only holds a signed id
+app.add_middleware(ServerSessionMiddleware, secret_key=secret)
+# oversized uploads are refused before their body is read
+app.add_middleware(UploadLimitMiddleware)
+# metrics (outermost, so it times everything)
+app.add_middleware(MetricsMiddleware)
 
 # auth
 app.include_router(auth.router)
 
-# Template Engine
-BASE_DIR = Path(__file__).resolve().parent
-templates = Jinja2Templates(directory=str(BASE_DIR / "templates"))
-
 #Serve Static Files css/js
-app.mount("/static", StaticFiles(directory="app/static"), name="static")
+app.mount("/static", CachedStaticFiles(directory="app/static"), name="static")
 
 #test route
 @app.get("/",response_class=HTMLResponse)
-async def dashboard(request: Request):
-    if not request.session.get("user_id"):
+def dashboard(request: Request):
+    context = user_context(request)
+    if context is None:
         return RedirectResponse("/login", status_code=302)
     return templates.TemplateResponse(
         "dashboard.html",
-        {"request": request, "user": request.session.get("user_name")},
+        {"request": request, "user": context.name},
     )
 
+#Prometheus scrape endpoint (numbers are per worker process)
+@app.get("/metrics")
+async def metrics_endpoint():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
 
-print("\n=== ROUTES ===")
-for r in app.routes:
-    methods = getattr(r, "methods", None)
-    print(r.path, methods)
-print("==============\n")
 #async def read_root(request: Request):
     #return templates.TemplateResponse("dashboard.html",{"request":request})
@@ -0,0 +1,223 @@
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from sqlalchemy import event
+from app import querylog
+
+#-----------Metrics ----------#
+# Small Prometheus-style registry (counters + histograms) rendered in the
+# text exposition format on /metrics. Values are per worker process.
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200)
+SIZE_BUCKETS = (16e3, 64e3, 256e3, 1e6, 4e6, 16e6)
+
+_registry = []
+
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    body = ",".join(
+        '{}="{}"'.format(k, str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for k, v in pairs
+    )
+    return "{" + body + "}"
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels=()):
+        self.name, self.help, self.labels = name, help, tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def inc(self, *label_values, amount: float = 1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} counter"
+        with self._lock:
+            items = sorted(self._values.items())
+        for label_values, value in items:
+            yield f"{self.name}{_format_labels(self.labels, label_values)} {value}"
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labels=(), buckets=LATENCY_BUCKETS):
+        self.name, self.help, self.labels = name, help, tuple(labels)
+        self.buckets = tuple(buckets)
+        self._values = {}  # labels -> [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def observe(self, value: float, *label_values):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(label_values)
+            if series is None:
+                series = self._values[label_values] = [0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    def time(self, *label_values):
+        return _Timer(self, label_values)
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self._values.items())
+        for label_values, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), series[:-1]):
+                cumulative += count
+                yield f"{self.name}_bucket{_format_labels(self.labels, label_values, ('le', bound))} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.labels, label_values)} {series[-1]}"
+            yield f"{self.name}_count{_format_labels(self.labels, label_values)} {cumulative}"
+
+
+class _Timer:
+    def __init__(self, histogram, label_values):
+        self.histogram, self.label_values = histogram, label_values
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start, *self.label_values)
+
+
+def render() -> str:
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+REQUEST_SECONDS = Histogram(
+    "livesell_request_duration_seconds", "HTTP request latency by route.",
+    ("method", "route", "status"),
+)
+REQUEST_QUERIES = Histogram(
+    "livesell_request_db_queries", "SQL statements executed per request.",
+    ("route",), COUNT_BUCKETS,
+)
+REQUEST_DB_SECONDS = Histogram(
+    "livesell_request_db_seconds", "Time spent in SQL per request.", ("route",),
+)
+TEMPLATE_SECONDS = Histogram(
+    "livesell_template_render_seconds", "Jinja template render time.", ("template",),
+)
+PASSWORD_SECONDS = Histogram(
+    "livesell_password_seconds", "bcrypt hash/verify time.", ("op",),
+)
+UPLOAD_BYTES = Histogram(
+    "livesell_upload_bytes", "Size of accepted image uploads.", (), SIZE_BUCKETS,
+)
+DB_QUERIES = Counter("livesell_db_queries_total", "SQL statements executed.")
+WRITE_BATCH_SIZE = Histogram(
+    "livesell_write_batch_size", "Writes committed together by the group-commit queue.",
+    (), COUNT_BUCKETS,
+)
+INGEST_COMMENTS = Counter(
+    "livesell_ingest_comments_total", "Chat comments ingested, by outcome.", ("outcome",),
+)
+INGEST_BATCH_SECONDS = Histogram(
+    "livesell_ingest_batch_seconds", "Time to turn one batch of comments into orders.",
+)
+
+
+#-----------Per-request stats ----------#
+# The middleware puts a RequestStats in a ContextVar; the threadpool copies
+# the context, so SQL run by `def` handlers is counted for the right request.
+
+class RequestStats:
+    __slots__ = ("queries", "db_seconds", "route", "scope", "lazy_loads")
+
+    def __init__(self, scope=None):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.route = None
+        self.scope = scope
+        self.lazy_loads = {}  # "Model.relationship" -> lazy loads
+
+    def current_route(self):
+        # the router sets scope["route"] once it matched, so this also
+        # works while the request is still running
+        if self.route is None and self.scope is not None:
+            route = getattr(self.scope.get("route"), "path", None)
+            return route or self.scope.get("path", "unmatched")
+        return self.route or "unmatched"
+
+
+current_request = ContextVar("livesell_request_stats", default=None)
+
+
+def instrument_engine(engine):
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("livesell_query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["livesell_query_start"].pop()
+        DB_QUERIES.inc()
+        stats = current_request.get()
+        if stats is not None:
+            stats.queries += 1
+            stats.db_seconds += elapsed
+        querylog.record_query(statement, elapsed, stats)
+
+
+def instrument_templates(templates):
+    # time every render of templates loaded from this Jinja2Templates
+    base = templates.env.template_class
+
+    class TimedTemplate(base):
+        def render(self, *args, **kwargs):
+            with TEMPLATE_SECONDS.time(self.name or "<string>"):
+                return super().render(*args, **kwargs)
+
+    templates.env.template_class = TimedTemplate
+    return templates
+
+
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        stats = RequestStats(scope)
+        token = current_request.set(stats)
+        status = 500
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            current_request.reset(token)
+            route = scope.get("route")
+            route = getattr(route, "path", None) or "unmatched"
+            stats.route = route
+            REQUEST_SECONDS.observe(elapsed, scope["method"], route, status)
+            REQUEST_QUERIES.observe(stats.queries, route)
+            REQUEST_DB_SECONDS.observe(stats.db_seconds, route)
+        querylog.check_request(stats)
@@ -0,0 +1,66 @@
+from app.models import Order
+from app.stock import reserve_stock, release_stock, change_status
+from app.rollups import record_order, record_status
+from app.events import order_payload
+from app.customers import customer_id_for
+
+#-----------Single order writes ----------#
+# The write half of the order form and the status buttons. Neither commits:
+# the caller (writequeue.run_write) commits them on their own or together
+# with other writes. A refused write leaves nothing behind, so it can share a
+# transaction with writes that went through.
+
+
+def place_order(db, user_id: int, session_id: int, customer_name: str, product_id: int, qty: int):
+    # returns the feed events, or None when the stock check refused it
+    reserved = reserve_stock(db, user_id, product_id, qty)
+    if not reserved:
+        return None
+    order = Order(
+        customer_name=customer_name,
+        customer_id=customer_id_for(db, user_id, customer_name),
+        session_id=session_id,
+        product_id=product_id,
+        qty=qty,
+        status="PENDING",
+        user_id=user_id,
+    )
+    db.add(order)
+    db.flush()
+    record_order(db, user_id, product_id, qty, session_id, order.created_at)
+    return [
+        {"type": "order", "order": order_payload(order, reserved.name)},
+        {"type": "stock", "product_id": product_id, "stock": reserved.stock},
+    ]
+
+
+def set_order_status(db, user_id: int, order_id: int, status: str):
+    # returns the feed events, empty when nothing changed
+    order = (
+        db.query(Order)
+        .filter(Order.id == order_id, Order.user_id == user_id)
+        .first()
+    )
+    events = []
+    if order is None or order.status == status:
+        return events
+    reserved = None
+    if order.status == "CANCELLED":
+        # its units went back on cancel: take them again, or refuse
+        reserved = reserve_stock(db, user_id, order.product_id, order.qty)
+        if not reserved:
+            return events
+    if not change_status(db, user_id, order.id, order.status, status):
+        if reserved:
+            release_stock(db, user_id, order.product_id, order.qty)
+        return events
+    events.append({"type": "status", "order_id": order.id, "status": status})
+    # If cancelling → return stock
+    if status == "CANCELLED":
+        stock = release_stock(db, user_id, order.product_id, order.qty)
+        if stock is not None:
+            events.append({"type": "stock", "product_id": order.product_id, "stock": stock})
+    elif reserved:
+        events.append({"type": "stock", "product_id": order.product_id, "stock": reserved.stock})
+    record_status(db, user_id, order.product_id, order.qty, order.status, status, order.session_id, order.created_at)
+    return events
@@ -0,0 +1,16 @@
+#-----------Keyset pagination ----------#
+# Pages are cut with "WHERE id < :before ORDER BY id DESC LIMIT n" instead of
+# OFFSET, so every page is a short index range scan however deep it is.
+
+PAGE_SIZE = 50
+
+
+def keyset_page(query, column, before=None, limit: int = PAGE_SIZE):
+    # returns (rows, next cursor or None when this is the last page)
+    if before is not None:
+        query = query.filter(column < before)
+    rows = query.order_by(column.desc()).limit(limit + 1).all()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return rows, getattr(rows[-1], column.key)
+    return rows, None
@@ -0,0 +1,32 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from app.models import pwd_context
+from app.metrics import PASSWORD_SECONDS
+
+#-----------Password hashing pool ----------#
+# bcrypt burns 100ms+ of CPU per call. It runs on a small dedicated pool so
+# a burst of logins can neither block the event loop nor eat the threadpool
+# that serves /live; extra logins simply queue here.
+PASSWORD_WORKERS = int(os.getenv("PASSWORD_WORKERS", "2"))
+_executor = ThreadPoolExecutor(max_workers=PASSWORD_WORKERS, thread_name_prefix="bcrypt")
+
+
+def _hash(password: str) -> str:
+    with PASSWORD_SECONDS.time("hash"):
+        return pwd_context.hash(password)
+
+
+def _verify(password: str, password_hash: str) -> bool:
+    with PASSWORD_SECONDS.time("verify"):
+        return pwd_context.verify(password, password_hash)
+
+
+async def hash_password(password: str) -> str:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, _hash, password)
+
+
+async def verify_password(password: str, password_hash: str) -> bool:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, _verify, password, password_hash)
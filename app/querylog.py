@@ -0,0 +1,69 @@
+import logging
+import os
+from dotenv import load_dotenv
+from sqlalchemy import event
+
+#-----------Slow queries / N+1 detection ----------#
+# SLOW_QUERY_MS   log any statement slower than this, with its route (0 = off)
+# SQL_DEBUG       off    - nothing else (production)
+#                 log    - warn about N+1 lazy loads and query budget overruns
+#                 strict - raise instead, so a regression fails the tests
+# QUERY_BUDGET    max statements a single request may run
+# N_PLUS_ONE_THRESHOLD  same relationship lazy-loaded this often = N+1
+
+load_dotenv()  # imported (via app.metrics) before anything else loads .env
+logger = logging.getLogger("livesell.sql")
+
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "250"))
+SQL_DEBUG = os.getenv("SQL_DEBUG", "off")
+QUERY_BUDGET = int(os.getenv("QUERY_BUDGET", "30"))
+N_PLUS_ONE_THRESHOLD = int(os.getenv("N_PLUS_ONE_THRESHOLD", "3"))
+
+if SQL_DEBUG not in ("off", "log", "strict"):
+    raise RuntimeError(f"Unknown SQL_DEBUG {SQL_DEBUG!r}, use 'off', 'log' or 'strict'")
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+def record_query(statement: str, elapsed: float, stats):
+    if SLOW_QUERY_MS and elapsed * 1000 >= SLOW_QUERY_MS:
+        route = stats.current_route() if stats is not None else "-"
+        logger.warning(
+            "slow query %.1f ms on %s: %s",
+            elapsed * 1000, route, " ".join(statement.split())[:500],
+        )
+
+
+def instrument_sessions(session_factory):
+    # count lazy relationship loads per request
+    @event.listens_for(session_factory, "do_orm_execute")
+    def _count_lazy_loads(orm_execute_state):
+        if SQL_DEBUG == "off" or not orm_execute_state.is_relationship_load:
+            return
+        from app.metrics import current_request
+        stats = current_request.get()
+        if stats is None or orm_execute_state.lazy_loaded_from is None:
+            return
+        path = orm_execute_state.loader_strategy_path
+        key = str(path[-1]) if path else "relationship"
+        stats.lazy_loads[key] = stats.lazy_loads.get(key, 0) + 1
+
+
+def check_request(stats):
+    # called once the response is done
+    if SQL_DEBUG == "off":
+        return
+    problems = []
+    if stats.queries > QUERY_BUDGET:
+        problems.append(f"{stats.queries} queries (budget {QUERY_BUDGET})")
+    for key, count in stats.lazy_loads.items():
+        if count >= N_PLUS_ONE_THRESHOLD:
+            problems.append(f"N+1: {key} lazy-loaded {count} times")
+    if not problems:
+        return
+    message = f"{stats.current_route()}: " + "; ".join(problems)
+    if SQL_DEBUG == "strict":
+        raise QueryBudgetExceeded(message)
+    logger.warning(message)
@@ -0,0 +1,404 @@
+from datetime import date, timedelta
+from sqlalchemy import Date, case, cast, func, select, update, delete, insert
+from sqlalchemy.exc import IntegrityError
+from app.models import Product, LiveSession, SummaryRollup, ProductRollup, OrderBucket
+from app.archive import all_orders
+
+#-----------Summary rollups ----------#
+# Paid revenue is qty * the product's *current* price (same as the old live
+# query), so editing a price or deleting a product drops the rollup and the
+# next /summary rebuilds it with one grouped query.
+#
+# OrderBucket rows hold the same numbers per (session, day, product) for the
+# history endpoints; they are dropped and rebuilt together with the rest.
+
+STATUS_COLUMNS = {
+    "PENDING": SummaryRollup.pending_orders,
+    "PAID": SummaryRollup.paid_orders,
+    "CANCELLED": SummaryRollup.cancelled_orders,
+}
+
+
+def _price_of(product_id: int):
+    return func.coalesce(
+        select(Product.price).where(Product.id == product_id).scalar_subquery(), 0
+    )
+
+
+def _counts_as_sold(status) -> int:
+    # same rule as the old best seller query: status != 'CANCELLED'
+    return int(status is not None and status != "CANCELLED")
+
+
+BUCKET_COLUMNS = ("orders", "cancelled_orders", "units", "paid_units", "paid_revenue")
+
+
+def _bucket_upsert(db):
+    dialect = db.get_bind().dialect.name
+    if dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    elif dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    else:
+        return None
+    return dialect_insert(OrderBucket)
+
+
+def _apply_bucket(db, user_id: int, key, delta: dict):
+    # key: (session_id, day, product_id); delta: {column: +/-amount}
+    delta = {k: v for k, v in delta.items() if not isinstance(v, (int, float)) or v}
+    if not delta:
+        return
+    session_id, day, product_id = key
+    where = (
+        OrderBucket.user_id == user_id,
+        OrderBucket.session_id == session_id,
+        OrderBucket.day == day,
+        OrderBucket.product_id == product_id,
+    )
+    values = {"user_id": user_id, "session_id": session_id, "day": day, "product_id": product_id}
+    values.update({column: delta.get(column, 0) for column in BUCKET_COLUMNS})
+    upsert = _bucket_upsert(db)
+    if upsert is not None:
+        db.execute(
+            upsert.values(**values).on_conflict_do_update(
+                index_elements=["user_id", "session_id", "day", "product_id"],
+                set_={
+                    column: getattr(OrderBucket, column) + getattr(upsert.excluded, column)
+                    for column in delta
+                },
+            )
+        )
+        return
+    changed = db.execute(
+        update(OrderBucket).where(*where).values(
+            **{column: getattr(OrderBucket, column) + amount for column, amount in delta.items()}
+        )
+    ).rowcount
+    if not changed:
+        db.execute(insert(OrderBucket).values(**values))
+
+
+def bucket_key(session_id: int, created_at, product_id: int):
+    day = created_at.date() if created_at else date.today()
+    return (session_id, day, product_id)
+
+
+def bucket_delta(qty: int, old_status, new_status, revenue=0) -> dict:
+    # new orders: old_status None with orders=1 added by the caller
+    return {
+        "cancelled_orders": int(new_status == "CANCELLED") - int(old_status == "CANCELLED"),
+        "units": units_delta(qty, old_status, new_status),
+        "paid_units": qty * (int(new_status == "PAID") - int(old_status == "PAID")),
+        "paid_revenue": revenue,
+    }
+
+
+def apply_delta(db, user_id: int, total: int = 0, statuses=None, revenue=0, units=None, buckets=None):
+    # statuses: {status: +/-count}, units: {product_id: +/-qty},
+    # buckets: {bucket_key: {column: +/-amount}};
+    # revenue may be a number or a SQL expression
+    values = {}
+    if total:
+        values["total_orders"] = SummaryRollup.total_orders + total
+    for status, count in (statuses or {}).items():
+        if count and status in STATUS_COLUMNS:
+            column = STATUS_COLUMNS[status]
+            values[column.key] = column + count
+    if not isinstance(revenue, (int, float)) or revenue:
+        values["paid_revenue"] = SummaryRollup.paid_revenue + revenue
+    tracked = True
+    if values:
+        tracked = db.execute(
+            update(SummaryRollup)
+            .where(SummaryRollup.user_id == user_id)
+            .values(**values)
+        ).rowcount > 0
+    elif buckets:
+        tracked = db.get(SummaryRollup, user_id) is not None
+    for product_id, qty in (units or {}).items():
+        if qty:
+            db.execute(
+                update(ProductRollup)
+                .where(ProductRollup.product_id == product_id)
+                .values(units_sold=ProductRollup.units_sold + qty)
+            )
+    # while the rollup is dropped the buckets are too; the rebuild fills them
+    if tracked:
+        for key, delta in (buckets or {}).items():
+            _apply_bucket(db, user_id, key, delta)
+
+
+def status_delta(old_status, new_status) -> dict:
+    statuses = {}
+    if old_status in STATUS_COLUMNS:
+        statuses[old_status] = -1
+    if new_status in STATUS_COLUMNS:
+        statuses[new_status] = statuses.get(new_status, 0) + 1
+    return statuses
+
+
+def units_delta(qty: int, old_status, new_status) -> int:
+    return qty * (_counts_as_sold(new_status) - _counts_as_sold(old_status))
+
+
+def record_order(db, user_id: int, product_id: int, qty: int, session_id: int, created_at):
+    # new orders always start as PENDING
+    apply_delta(
+        db,
+        user_id,
+        total=1,
+        statuses={"PENDING": 1},
+        units={product_id: qty},
+        buckets={bucket_key(session_id, created_at, product_id): {"orders": 1, "units": qty}},
+    )
+
+
+def record_status(db, user_id: int, product_id: int, qty: int, old_status, new_status, session_id: int, created_at):
+    revenue = 0
+    if old_status == "PAID":
+        revenue = -qty * _price_of(product_id)
+    elif new_status == "PAID":
+        revenue = qty * _price_of(product_id)
+    apply_delta(
+        db,
+        user_id,
+        statuses=status_delta(old_status, new_status),
+        revenue=revenue,
+        units={product_id: units_delta(qty, old_status, new_status)},
+        buckets={
+            bucket_key(session_id, created_at, product_id): bucket_delta(qty, old_status, new_status, revenue)
+        },
+    )
+
+
+def track_product(db, user_id: int, product_id: int):
+    db.add(ProductRollup(product_id=product_id, user_id=user_id, units_sold=0))
+
+
+def invalidate(db, user_id: int):
+    db.execute(delete(SummaryRollup).where(SummaryRollup.user_id == user_id))
+    db.execute(delete(ProductRollup).where(ProductRollup.user_id == user_id))
+    db.execute(delete(OrderBucket).where(OrderBucket.user_id == user_id))
+
+
+def rebuild(db, user_id: int):
+    invalidate(db, user_id)
+
+    # one grouped pass over the user's orders for every counter at once
+    orders = all_orders(user_id)
+    rows = db.execute(
+        select(
+            orders.c.status,
+            func.count(orders.c.id),
+            func.sum(orders.c.qty * Product.price),
+        )
+        .outerjoin(Product, Product.id == orders.c.product_id)
+        .group_by(orders.c.status)
+    ).all()
+    rollup = SummaryRollup(
+        user_id=user_id,
+        total_orders=0,
+        pending_orders=0,
+        paid_orders=0,
+        cancelled_orders=0,
+        paid_revenue=0,
+    )
+    for status, count, revenue in rows:
+        rollup.total_orders += count
+        if status in STATUS_COLUMNS:
+            setattr(rollup, STATUS_COLUMNS[status].key, count)
+        if status == "PAID":
+            rollup.paid_revenue = revenue or 0
+    db.add(rollup)
+
+    units = dict(
+        db.execute(
+            select(orders.c.product_id, func.sum(orders.c.qty))
+            .where(orders.c.status != "CANCELLED")
+            .group_by(orders.c.product_id)
+        ).all()
+    )
+    product_ids = db.scalars(select(Product.id).where(Product.user_id == user_id)).all()
+    if product_ids:
+        db.execute(
+            insert(ProductRollup),
+            [
+                {"product_id": pid, "user_id": user_id, "units_sold": units.get(pid, 0)}
+                for pid in product_ids
+            ],
+        )
+    rebuild_buckets(db, user_id, orders)
+    db.flush()
+    return rollup
+
+
+def _order_day(db, created_at):
+    # SQLite keeps datetimes as text, CAST(... AS DATE) would not work there
+    if db.get_bind().dialect.name == "sqlite":
+        return func.date(created_at)
+    return cast(created_at, Date)
+
+
+def rebuild_buckets(db, user_id: int, orders):
+    # orders: the all_orders() subquery of the user
+    day = _order_day(db, orders.c.created_at)
+    status, qty = orders.c.status, orders.c.qty
+    sold = (status.isnot(None)) & (status != "CANCELLED")
+    rows = db.execute(
+        select(
+            orders.c.session_id,
+            day,
+            orders.c.product_id,
+            func.count(orders.c.id),
+            func.sum(_when(status == "CANCELLED", 1)),
+            func.sum(_when(sold, qty)),
+            func.sum(_when(status == "PAID", qty)),
+            func.sum(_when(status == "PAID", qty * func.coalesce(Product.price, 0))),
+        )
+        .outerjoin(Product, Product.id == orders.c.product_id)
+        .group_by(orders.c.session_id, day, orders.c.product_id)
+    ).all()
+    if rows:
+        db.execute(insert(OrderBucket), [
+            {
+                "user_id": user_id,
+                "session_id": session_id,
+                "day": date.fromisoformat(bucket_day) if isinstance(bucket_day, str) else bucket_day,
+                "product_id": product_id,
+                "orders": orders,
+                "cancelled_orders": cancelled or 0,
+                "units": units or 0,
+                "paid_units": paid_units or 0,
+                "paid_revenue": paid_revenue or 0,
+            }
+            for session_id, bucket_day, product_id, orders, cancelled, units, paid_units, paid_revenue in rows
+        ])
+
+
+def _when(condition, value):
+    return case((condition, value), else_=0)
+
+
+def load_summary(db, user_id: int):
+    rollup = db.get(SummaryRollup, user_id)
+    if rollup is None:
+        try:
+            rollup = rebuild(db, user_id)
+            db.commit()
+            db.refresh(rollup)
+        except IntegrityError:
+            # another request rebuilt it at the same time
+            db.rollback()
+            rollup = db.get(SummaryRollup, user_id)
+    return rollup
+
+
+def best_seller(db, user_id: int):
+    return db.execute(
+        select(Product.name, func.sum(ProductRollup.units_sold).label("total_qty"))
+        .join(Product, Product.id == ProductRollup.product_id)
+        .where(ProductRollup.user_id == user_id)
+        .group_by(Product.name)
+        .having(func.sum(ProductRollup.units_sold) > 0)
+        .order_by(func.sum(ProductRollup.units_sold).desc())
+        .limit(1)
+    ).first()
+
+
+#-----------History ----------#
+# Range queries for the /summary JSON endpoints, answered from OrderBucket
+# only. Weeks start on Monday; months are keyed "YYYY-MM".
+HISTORY_BUCKETS = ("day", "week", "month", "session")
+
+
+def _bucket_range(query, date_from=None, date_to=None):
+    if date_from is not None:
+        query = query.where(OrderBucket.day >= date_from)
+    if date_to is not None:
+        query = query.where(OrderBucket.day <= date_to)
+    return query
+
+
+def _fold_period(day, bucket: str) -> str:
+    if bucket == "week":
+        day = day - timedelta(days=day.weekday())
+    elif bucket == "month":
+        return day.strftime("%Y-%m")
+    return day.isoformat()
+
+
+def revenue_history(db, user_id: int, date_from=None, date_to=None, bucket: str = "day"):
+    totals = (
+        func.sum(OrderBucket.orders),
+        func.sum(OrderBucket.cancelled_orders),
+        func.sum(OrderBucket.units),
+        func.sum(OrderBucket.paid_units),
+        func.sum(OrderBucket.paid_revenue),
+    )
+    if bucket == "session":
+        query = (
+            select(OrderBucket.session_id, LiveSession.title, func.min(OrderBucket.day), *totals)
+            .join(LiveSession, LiveSession.id == OrderBucket.session_id)
+            .where(OrderBucket.user_id == user_id)
+            .group_by(OrderBucket.session_id, LiveSession.title)
+            .order_by(OrderBucket.session_id)
+        )
+        return [
+            {
+                "session_id": session_id,
+                "title": title,
+                "period": first_day.isoformat() if first_day else None,
+                **_history_row(row),
+            }
+            for session_id, title, first_day, *row in db.execute(_bucket_range(query, date_from, date_to))
+        ]
+
+    query = (
+        select(OrderBucket.day, *totals)
+        .where(OrderBucket.user_id == user_id)
+        .group_by(OrderBucket.day)
+        .order_by(OrderBucket.day)
+    )
+    periods = {}
+    for day, *row in db.execute(_bucket_range(query, date_from, date_to)):
+        period = periods.setdefault(_fold_period(day, bucket), dict.fromkeys(
+            ("orders", "cancelled_orders", "units", "paid_units", "paid_revenue"), 0
+        ))
+        for field, value in _history_row(row).items():
+            period[field] += value
+    return [{"period": period, **values} for period, values in periods.items()]
+
+
+def _history_row(row) -> dict:
+    orders, cancelled, units, paid_units, paid_revenue = row
+    return {
+        "orders": orders or 0,
+        "cancelled_orders": cancelled or 0,
+        "units": units or 0,
+        "paid_units": paid_units or 0,
+        "paid_revenue": float(paid_revenue or 0),
+    }
+
+
+def top_products(db, user_id: int, date_from=None, date_to=None, limit: int = 10, by: str = "units"):
+    units = func.sum(OrderBucket.units).label("units")
+    revenue = func.sum(OrderBucket.paid_revenue).label("paid_revenue")
+    query = (
+        select(OrderBucket.product_id, Product.name, units, func.sum(OrderBucket.paid_units), revenue)
+        .outerjoin(Product, Product.id == OrderBucket.product_id)
+        .where(OrderBucket.user_id == user_id)
+        .group_by(OrderBucket.product_id, Product.name)
+        .order_by((revenue if by == "revenue" else units).desc(), OrderBucket.product_id)
+        .limit(limit)
+    )
+    return [
+        {
+            "product_id": product_id,
+            "name": name if name is not None else "(deleted product)",
+            "units": units or 0,
+            "paid_units": paid_units or 0,
+            "paid_revenue": float(paid_revenue or 0),
+        }
+        for product_id, name, units, paid_units, paid_revenue in db.execute(_bucket_range(query, date_from, date_to))
+    ]
@@ -1,12 +1,27 @@
-from fastapi import APIRouter, Request, Form
+from fastapi import APIRouter, Request, Form, Depends
 from fastapi.responses import RedirectResponse
-from fastapi.templating import Jinja2Templates
-from pathlib import Path
-from app.models import SessionLocal, User, pwd_context
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session
+from app.templating import templates
+from app.models import get_db, User
+from app.passwords import hash_password, verify_password
 
 router = APIRouter()
-BASE_DIR = Path(__file__).resolve().parent.parent
-templates = Jinja2Templates(directory=str(BASE_DIR / "templates"))
+
+# login/register stay async so bcrypt can be awaited on its own pool;
+# their DB calls are pushed to the threadpool instead.
+def find_user(db, email: str):
+    user = db.query(User).filter(User.email == email).first()
+    # hand the connection back to the pool before waiting on bcrypt, or a
+    # login storm holds every connection and /live queues behind it
+    db.close()
+    return user
+
+def save_user(db, user: User):
+    db.add(user)
+    db.commit()
+    db.refresh(user)
+    return user
 
 
 @router.get("/login")
@@ -14,7 +29,12 @@ async def login_page(request: Request):
     return templates.TemplateResponse("login.html", {"request":request, "error":None})
 
 @router.post("/login")
-async def login(request: Request, email: str = Form(...), password: str = Form(...)):
+async def login(
+    request: Request,
+    email: str = Form(...),
+    password: str = Form(...),
+    db: Session = Depends(get_db),
+):
     email = email.strip().lower()
     password = password.strip()
     if len(password.encode("utf-8")) > 72:
@@ -23,11 +43,9 @@ async def login(request: Request, email: str = Form(...), password: str = Form(.
             {"request": request, "error": "Password too long (max 72 bytes)."},
         )
 
-    db = SessionLocal()
-    user = db.query(User).filter(User.email == email).first()
-    db.close()
+    user = await run_in_threadpool(find_user, db, email)
 
-    if user and pwd_context.verify(password, user.password_hash):
+    if user and await verify_password(password, user.password_hash):
         request.session["user_id"] = user.id
         request.session["user_email"] = user.email
         request.session["user_name"] = user.full_name
@@ -49,6 +67,7 @@ async def register(
     password: str = Form(...),
     business_name: str = Form(None),
     phone: str = Form(None),
+    db: Session = Depends(get_db),
 ):
     full_name = full_name.strip()
     email = email.strip().lower()
@@ -59,10 +78,8 @@ async def register(
             {"request": request, "error": "Password too long (max 72 bytes)."},
         )
 
-    db = SessionLocal()
-    existing = db.query(User).filter(User.email == email).first()
+    existing = await run_in_threadpool(find_user, db, email)
     if existing:
-        db.close()
         return templates.TemplateResponse(
             "register.html",
             {"request": request, "error": "Email is already registered."},
@@ -73,12 +90,9 @@ async def register(
         email=email,
         business_name=(business_name or "").strip() or None,
         phone=(phone or "").strip() or None,
-        password_hash=pwd_context.hash(password),
+        password_hash=await hash_password(password),
     )
-    db.add(user)
-    db.commit()
-    db.refresh(user)
-    db.close()
+    await run_in_threadpool(save_user, db, user)
 
     request.session["user_id"] = user.id
     request.session["user_email"] = user.email
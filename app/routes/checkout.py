@@ -0,0 +1,79 @@
+from fastapi import APIRouter, Request, Depends
+from fastapi.responses import RedirectResponse, JSONResponse, Response
+from sqlalchemy.orm import Session
+from app.templating import templates, cached_fragment
+from app.models import get_db, LiveSession
+from app.checkout import session_checkout, checkout_csv
+
+router = APIRouter()
+
+def require_login(request: Request):
+    return request.session.get("user_id")
+
+def recent_sessions(db, user_id: int, limit: int = 20):
+    return (
+        db.query(LiveSession.id, LiveSession.title, LiveSession.started_at, LiveSession.ended_at)
+        .filter(LiveSession.user_id == user_id)
+        .order_by(LiveSession.id.desc())
+        .limit(limit)
+        .all()
+    )
+
+#latest session
+@router.get("/checkout")
+def checkout_latest(request: Request, db: Session = Depends(get_db)):
+    user_id = require_login(request)
+    if not user_id:
+        return RedirectResponse("/login", status_code=302)
+
+    sessions = recent_sessions(db, user_id, limit=1)
+    if not sessions:
+        return RedirectResponse("/live", status_code=302)
+    return RedirectResponse(f"/checkout/{sessions[0].id}", status_code=302)
+
+#per-customer invoices of one session
+@router.get("/checkout/{session_id}")
+def checkout_page(request: Request, session_id: int, db: Session = Depends(get_db)):
+    user_id = require_login(request)
+    if not user_id:
+        return RedirectResponse("/login", status_code=302)
+
+    checkout = session_checkout(db, user_id, session_id)
+    if checkout is None:
+        return RedirectResponse("/checkout", status_code=302)
+
+    return templates.TemplateResponse(
+        "checkout.html",
+        {"request": request, "checkout": checkout, "sessions": recent_sessions(db, user_id)},
+    )
+
+@router.get("/checkout/{session_id}/invoices.json")
+def checkout_json(request: Request, session_id: int, db: Session = Depends(get_db)):
+    user_id = require_login(request)
+    if not user_id:
+        return JSONResponse({"error": "login required"}, status_code=401)
+
+    checkout = session_checkout(db, user_id, session_id)
+    if checkout is None:
+        return JSONResponse({"error": "session not found"}, status_code=404)
+    return checkout
+
+@router.get("/checkout/{session_id}/invoices.csv")
+def checkout_csv_export(request: Request, session_id: int, db: Session = Depends(get_db)):
+    user_id = require_login(request)
+    if not user_id:
+        return RedirectResponse("/login", status_code=302)
+
+    checkout = session_checkout(db, user_id, session_id)
+    if checkout is None:
+        return RedirectResponse("/checkout", status_code=302)
+
+    body = cached_fragment(
+        "checkout_csv", user_id, ("orders", "inventory"), session_id,
+        lambda: checkout_csv(session_checkout(db, user_id, session_id)),
+    )
+    return Response(
+        body,
+        media_type="text/csv",
+        headers={"Content-Disposition": f'attachment; filename="livesell_checkout_session_{session_id}.csv"'},
+    )
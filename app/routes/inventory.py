@@ -1,47 +1,78 @@
-from fastapi import APIRouter, Request, Form, UploadFile, File
-from fastapi.responses import RedirectResponse
-from fastapi.templating import Jinja2Templates
-from pathlib import Path
-from app.models import SessionLocal, Product
-import os
-import uuid
+from fastapi import APIRouter, Request, Form, UploadFile, File, Depends, BackgroundTasks
+from fastapi.responses import RedirectResponse, JSONResponse, Response
+from sqlalchemy.orm import Session
+from app.models import get_db, Product
+from app.rollups import track_product, invalidate
+from app.uploads import save_upload, make_thumbnail, release_image, UploadError
+from app.pagination import keyset_page
+from app.templating import templates, bump
+from app.ingest import normalize_code
+from app.sessions import user_context
+from typing import Optional
 
 router = APIRouter()
 
-BASE_DIR = Path(__file__).resolve().parent.parent  # points to /app
-templates = Jinja2Templates(directory=str(BASE_DIR / "templates"))
-
 def require_login(request: Request):
     return request.session.get("user_id")
 
 @router.get("/inventory")
-async def inventory_page(request: Request):
+def inventory_page(request: Request, before: Optional[int] = None, db: Session = Depends(get_db)):
     user_id = require_login(request)
     if not user_id:
         return RedirectResponse("/login", status_code=302)
 
-    db = SessionLocal()
-    products = (
-        db.query(Product)
-        .filter(Product.user_id == user_id)
-        .order_by(Product.id.desc())
-        .all()
+    products, next_cursor = keyset_page(
+        db.query(Product).filter(Product.user_id == user_id), Product.id, before
+    )
+
+    return templates.TemplateResponse(
+        "inventory.html",
+        {"request": request, "products": products, "before": before, "next_cursor": next_cursor},
     )
-    db.close()
 
-    return templates.TemplateResponse("inventory.html", {"request": request, "products": products})
+#next page of products as JSON
+@router.get("/inventory/products.json")
+def inventory_products_json(request: Request, before: Optional[int] = None, db: Session = Depends(get_db)):
+    user_id = require_login(request)
+    if not user_id:
+        return JSONResponse({"error": "login required"}, status_code=401)
+
+    # the inventory version changes on every product or stock write, so it
+    # doubles as an ETag and a repeat poll is answered without the database
+    etag = f'W/"{user_context(request).inventory_version}-{before or 0}"'
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+
+    products, next_cursor = keyset_page(
+        db.query(Product).filter(Product.user_id == user_id), Product.id, before
+    )
+    return JSONResponse({
+        "products": [
+            {
+                "id": p.id,
+                "name": p.name,
+                "price": p.price,
+                "stock": p.stock,
+                "code": p.code,
+                "image_path": p.thumb_path or p.image_path,
+            }
+            for p in products
+        ],
+        "next": next_cursor,
+    }, headers={"ETag": etag})
 
 #upgrade product image
 @router.post("/inventory/{product_id}/image")
-async def update_product_image(
+def update_product_image(
     request: Request,
     product_id : int,
+    background_tasks: BackgroundTasks,
     image: UploadFile = File(...),
+    db: Session = Depends(get_db),
 ):
     user_id = require_login(request)
     if not user_id:
         return RedirectResponse("/login", status_code=302)
-    db = SessionLocal()
     product = (
         db.query(Product)
         .filter(Product.id == product_id, Product.user_id == user_id)
@@ -49,43 +80,35 @@ async def update_product_image(
     )
 
     if not product:
-        db.close()
         return RedirectResponse("/inventory", status_code=302)
     #saveimage
-    upload_dir = BASE_DIR/"static"/"uploads"
-    upload_dir.mkdir(parents=True, exist_ok=True)
-
-    ext = os.path.splitext(image.filename)[1].lower()
-    filename = f"{uuid.uuid4().hex}{ext}"
-    save_path = upload_dir / filename
-
-    contents = await image.read()
-    with open(save_path, "wb") as f:
-        f.write(contents)
-    new_image_path = f"/static/uploads/{filename}"
-
-    #delete file if exist
-    if product.image_path:
-        old_rel = product.image_path.lstrip("/")
-        old_full = BASE_DIR / old_rel.replace("static/", "static/")
-        old_full = BASE_DIR / "static" / "uploads" / Path(product.image_path).name
-        if old_full.exists():
-            try:
-                old_full.unlink()
-            except Exception:
-                pass
+    try:
+        new_image_path = save_upload(image)
+    except UploadError:
+        return RedirectResponse("/inventory", status_code=302)
+
+    old_image_path = product.image_path
     product.image_path = new_image_path
+    product.thumb_path = None
     db.commit()
-    db.close()
+    bump(user_id, "inventory")
+    background_tasks.add_task(make_thumbnail, product_id, new_image_path)
+    #delete old file if nothing else uses it
+    if old_image_path and old_image_path != new_image_path:
+        background_tasks.add_task(release_image, old_image_path)
     return RedirectResponse("/inventory", status_code=302)
 #delete
 @router.post("/inventory/{product_id}/delete")
-async def delete_product(request: Request, product_id: int):
+def delete_product(
+    request: Request,
+    product_id: int,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db),
+):
     user_id = require_login(request)
     if not user_id:
         return RedirectResponse("/login",status_code=302)
     
-    db = SessionLocal()
     product = (
         db.query(Product)
         .filter(Product.id == product_id, Product.user_id == user_id)
@@ -93,25 +116,29 @@ async def delete_product(request: Request, product_id: int):
     )
 
     if product:
+        image_path = product.image_path
         db.delete(product)
+        invalidate(db, user_id)
         db.commit()
-    db.close()
+        bump(user_id, "inventory")
+        background_tasks.add_task(release_image, image_path)
     return RedirectResponse("/inventory", status_code=302)
 
 #update/edit
 @router.post("/inventory/{product_id}/edit")
-async def edit_product(
+def edit_product(
     request: Request,
     product_id :int,
     name : str = Form(...),
     price : float = Form(...),
     stock : int = Form(...),
+    code : str = Form(""),
+    db: Session = Depends(get_db),
 ):
     user_id = require_login(request)
     if not user_id:
         return RedirectResponse("/login", status_code=302)
     
-    db = SessionLocal()
     product = (
         db.query(Product)
         .filter(Product.id == product_id, Product.user_id == user_id)
@@ -119,20 +146,27 @@ async def edit_product(
     )
 
     if product:
+        # revenue is computed from the current price
+        if product.price != price:
+            invalidate(db, user_id)
         product.name = name.strip()
         product.price = price
         product.stock = stock
+        product.code = normalize_code(code) or None
         db.commit()
-    db.close()
+        bump(user_id, "inventory")
     return RedirectResponse("/inventory", status_code=302)
 
 @router.post("/inventory/add")
-async def add_product(
+def add_product(
     request: Request,
+    background_tasks: BackgroundTasks,
     name: str = Form(...),
     price: float = Form(...),
     stock: int = Form(...),
+    code: str = Form(""),
     image: UploadFile = File(None),
+    db: Session = Depends(get_db),
 ):
     user_id = require_login(request)
     if not user_id:
@@ -141,30 +175,26 @@ async def add_product(
     image_path = None
 
     if image is not None and image.filename:
-        upload_dir = BASE_DIR / "static" / "uploads"
-        upload_dir.mkdir(parents=True, exist_ok=True)
-
-        ext = os.path.splitext(image.filename)[1].lower()
-        filename = f"{uuid.uuid4().hex}{ext}"
-        save_path = upload_dir / filename
-
-        contents = await image.read()
-        with open(save_path, "wb") as f:
-            f.write(contents)
-
-        image_path = f"/static/uploads/{filename}"
-
-    db = SessionLocal()
-    db.add(
-        Product(
-            name=name.strip(),
-            price=price,
-            stock=stock,
-            image_path=image_path,
-            user_id=user_id,
-        )
+        try:
+            image_path = save_upload(image)
+        except UploadError:
+            return RedirectResponse("/inventory", status_code=302)
+
+    product = Product(
+        name=name.strip(),
+        price=price,
+        stock=stock,
+        code=normalize_code(code) or None,
+        image_path=image_path,
+        user_id=user_id,
     )
+    db.add(product)
+    db.flush()
+    product_id = product.id
+    track_product(db, user_id, product_id)
     db.commit()
-    db.close()
+    bump(user_id, "inventory")
+    if image_path:
+        background_tasks.add_task(make_thumbnail, product_id, image_path)
 
     return RedirectResponse("/inventory", status_code=302)
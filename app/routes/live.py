@@ -1,164 +1,272 @@
-from fastapi import APIRouter, Request, Form
-from fastapi.responses import RedirectResponse
-from fastapi.templating import Jinja2Templates
-from pathlib import Path
-from sqlalchemy.orm import joinedload
-from datetime import datetime
-from app.models import SessionLocal, Product, Order, LiveSession
+from fastapi import APIRouter, Request, Form, Depends
+from fastapi.responses import RedirectResponse, StreamingResponse, JSONResponse
+from sqlalchemy.orm import Session, joinedload
+from app.models import get_db, Product, Order
+from app.live_sessions import get_or_create_active_session, end_active_session
+from app.orders import place_order, set_order_status
+from app.writequeue import run_write
+from app.events import order_feed, format_sse, order_payload
+from app.customers import search_customers
+from app.bulk import MAX_BATCH, parse_order_lines, apply_orders, apply_status_changes
+from app.ingest import comment_ingestor
+from fastapi.concurrency import run_in_threadpool
+from app.pagination import keyset_page
+from app.templating import templates, bump, cached_fragment, render_fragment
+from typing import Optional
+import asyncio
 
 
 router = APIRouter()
-BASE_DIR = Path(__file__).resolve().parent.parent
-templates = Jinja2Templates(directory=str(BASE_DIR / "templates"))
 
 def require_login(request: Request):
     return request.session.get("user_id")
 
-#LiveSession
-def get_or_create_active_session(db, user_id: int):
-    session = (
-        db.query(LiveSession)
-        .filter(LiveSession.ended_at == None, LiveSession.user_id == user_id)
-        .order_by(LiveSession.id.desc())
-        .first()
-    )
-    if session:
-        return session
-
-    session = LiveSession(title="Live Session", user_id=user_id)
-    db.add(session)
-    db.commit()
-    db.refresh(session)
-    return session
-
+async def json_body(request: Request):
+    # the parsed body, or None when it isn't valid JSON (answered with a 400
+    # by the shape checks below instead of a 500)
+    try:
+        return await request.json()
+    except ValueError:
+        return None
 
+def session_orders(db, user_id: int, session_id: int, before: Optional[int]):
+    query = (
+        db.query(Order)
+        .options(joinedload(Order.product))
+        .filter(Order.session_id == session_id, Order.user_id == user_id)
+    )
+    return keyset_page(query, Order.id, before)
 
 #end
 @router.post("/live/end")
-async def end_live_session(request: Request):
+def end_live_session(request: Request, db: Session = Depends(get_db)):
     user_id = require_login(request)
     if not user_id:
         return RedirectResponse("/login", status_code=302)
 
-    db = SessionLocal()
-    active_session = (
-        db.query(LiveSession)
-        .filter(LiveSession.ended_at == None, LiveSession.user_id == user_id)
-        .order_by(LiveSession.id.desc())
-        .first()
-    )
-
-    if active_session:
-        active_session.ended_at = datetime.utcnow()
-        db.commit()
-
-    db.close()
+    end_active_session(db, user_id)
+    bump(user_id, "orders")
     return RedirectResponse("/live", status_code=302)
 
 #liveSellingPage
 @router.get("/live")
-async def live_page(request: Request):
+def live_page(request: Request, before: Optional[int] = None, db: Session = Depends(get_db)):
     user_id = require_login(request)
     if not user_id:
         return RedirectResponse("/login", status_code=302)
 
-    db = SessionLocal()
     active_session = get_or_create_active_session(db, user_id)
 
-    products = (
-        db.query(Product)
-        .filter(Product.user_id == user_id)
-        .order_by(Product.name.asc())
-        .all()
-    )
-    orders = (
-        db.query(Order)
-        .options(joinedload(Order.product))
-        .filter(Order.session_id == active_session.id, Order.user_id == user_id)
-        .order_by(Order.id.desc())
-        .all()
-    )
-    db.close()
+    #product <select> and newest orders are cached until inventory/orders change
+    def product_options():
+        products = (
+            db.query(Product)
+            .filter(Product.user_id == user_id)
+            .order_by(Product.name.asc())
+            .all()
+        )
+        return render_fragment("partials/product_options.html", products=products)
+
+    def order_rows():
+        orders, next_cursor = session_orders(db, user_id, active_session.id, before)
+        return render_fragment("partials/order_rows.html", orders=orders), next_cursor
+
+    options = cached_fragment("product_options", user_id, ("inventory",), None, product_options)
+    if before is None:
+        rows, next_cursor = cached_fragment("order_rows", user_id, ("orders", "inventory"), active_session.id, order_rows)
+    else:
+        rows, next_cursor = order_rows()
 
     return templates.TemplateResponse(
         "live.html",
-        {"request": request, "products": products, "orders": orders, "active_session": active_session}
+        {
+            "request": request,
+            "product_options": options,
+            "order_rows": rows,
+            "active_session": active_session,
+            "before": before,
+            "next_cursor": next_cursor,
+        }
     )
 
+#next page of orders for the live table
+@router.get("/live/orders.json")
+def live_orders_json(request: Request, before: Optional[int] = None, db: Session = Depends(get_db)):
+    user_id = require_login(request)
+    if not user_id:
+        return JSONResponse({"error": "login required"}, status_code=401)
+
+    active_session = get_or_create_active_session(db, user_id)
+    orders, next_cursor = session_orders(db, user_id, active_session.id, before)
+    return {
+        "orders": [order_payload(o, o.product.name if o.product else "") for o in orders],
+        "next": next_cursor,
+    }
+
+#customer name autocomplete for the order form
+@router.get("/live/customers/search")
+def customer_search(request: Request, q: str = "", db: Session = Depends(get_db)):
+    user_id = require_login(request)
+    if not user_id:
+        return JSONResponse({"error": "login required"}, status_code=401)
+
+    return {"customers": [{"id": cid, "name": name} for cid, name in search_customers(db, user_id, q)]}
+
 #Mark as paid
 @router.post("/live/order/{order_id}/status")
-async def update_status(
+def update_status(
     request: Request,
     order_id: int,
-    status: str = Form(...)
+    status: str = Form(...),
+    db: Session = Depends(get_db),
 ):
     user_id = require_login(request)
     if not user_id:
         return RedirectResponse("/login", status_code=302)
 
-    db = SessionLocal()
-    order = (
-        db.query(Order)
-        .filter(Order.id == order_id, Order.user_id == user_id)
-        .first()
-    )
+    if status in ("PENDING", "PAID", "CANCELLED"):
+        events = run_write(db, lambda s: set_order_status(s, user_id, order_id, status))
+        if events:
+            bump(user_id, "orders", "inventory")
 
-    if order and status in ("PENDING", "PAID", "CANCELLED"):
-
-        # If cancelling → return stock
-        if status == "CANCELLED" and order.status != "CANCELLED":
-            product = (
-                db.query(Product)
-                .filter(Product.id == order.product_id, Product.user_id == user_id)
-                .first()
-            )
-            if product:
-                product.stock += order.qty
-
-        order.status = status
-        db.commit()
+        order_feed.publish_many(user_id, events)
 
-    db.close()
     return RedirectResponse("/live", status_code=302)
 
 #Add Order
 @router.post("/live/order/add")
-async def add_order(
+def add_order(
     request: Request,
     customer_name: str = Form(...),
     product_id:int = Form(...),
     qty: int = Form(...),
+    db: Session = Depends(get_db),
 ):
     user_id = require_login(request)
     if not user_id:
         return RedirectResponse("/login", status_code=302)
     customer_name = customer_name.strip()
 
-    db = SessionLocal()
     active_session = get_or_create_active_session(db, user_id)
-    product = (
-        db.query(Product)
-        .filter(Product.id == product_id, Product.user_id == user_id)
-        .first()
-    )
 
-    #validations
-    if not product or qty <= 0 or product.stock < qty:
-        db.close()
-        return RedirectResponse("/live", status_code=302)
-    #create order
-    db.add(
-        Order(
-            customer_name=customer_name,
-            session_id=active_session.id,
-            product_id=product_id,
-            qty=qty,
-            status="PENDING",
-            user_id=user_id,
-        )
+    #validations + stock deduction in one conditional UPDATE
+    events = run_write(
+        db, lambda s: place_order(s, user_id, active_session.id, customer_name, product_id, qty)
     )
+    if events is None:
+        return RedirectResponse("/live", status_code=302)
+    bump(user_id, "orders", "inventory")
 
-    product.stock -= qty
-    db.commit()
-    db.close()
+    order_feed.publish_many(user_id, events)
     return RedirectResponse("/live", status_code=302)
+
+#Push feed for open live pages
+@router.get("/live/stream")
+async def live_stream(request: Request):
+    user_id = require_login(request)
+    if not user_id:
+        return RedirectResponse("/login", status_code=302)
+
+    async def events():
+        queue = order_feed.subscribe(user_id)
+        try:
+            yield ": connected\n\n"
+            while not await request.is_disconnected():
+                try:
+                    payload = await asyncio.wait_for(queue.get(), timeout=15)
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"
+                    continue
+                yield format_sse(payload)
+        finally:
+            order_feed.unsubscribe(user_id, queue)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+#Bulk order entry: JSON {"orders": [{customer_name, product_id, qty}]}
+#or a pasted block of "customer, product, qty" lines (form field "lines")
+@router.post("/live/orders/bulk")
+async def add_orders_bulk(request: Request, db: Session = Depends(get_db)):
+    user_id = require_login(request)
+    if not user_id:
+        return JSONResponse({"error": "login required"}, status_code=401)
+
+    if request.headers.get("content-type", "").startswith("application/json"):
+        body = await json_body(request)
+        items = body.get("orders") if isinstance(body, dict) else None
+        if not isinstance(items, list) or not all(isinstance(i, dict) for i in items):
+            return JSONResponse({"error": "expected {\"orders\": [...]}"}, status_code=400)
+        text = None
+    else:
+        form = await request.form()
+        items, text = None, str(form.get("lines") or "")
+
+    def run():
+        nonlocal items
+        if text is not None:
+            products = db.query(Product.id, Product.name).filter(Product.user_id == user_id).all()
+            items = parse_order_lines(text, products)
+        if len(items) > MAX_BATCH:
+            return None
+        active_session = get_or_create_active_session(db, user_id)
+        results, events = apply_orders(db, user_id, active_session.id, items)
+        db.commit()
+        if events:
+            bump(user_id, "orders", "inventory")
+        order_feed.publish_many(user_id, events)
+        return results
+
+    results = await run_in_threadpool(run)
+    if results is None:
+        return JSONResponse({"error": f"at most {MAX_BATCH} orders per batch"}, status_code=400)
+    return {"added": sum(r["ok"] for r in results), "failed": sum(not r["ok"] for r in results), "results": results}
+
+#Batch status update: JSON {"changes": [{order_id, status}]}
+@router.post("/live/orders/status/bulk")
+async def update_status_bulk(request: Request, db: Session = Depends(get_db)):
+    user_id = require_login(request)
+    if not user_id:
+        return JSONResponse({"error": "login required"}, status_code=401)
+
+    body = await json_body(request)
+    changes = body.get("changes") if isinstance(body, dict) else None
+    if not isinstance(changes, list) or not all(isinstance(c, dict) for c in changes):
+        return JSONResponse({"error": "expected {\"changes\": [...]}"}, status_code=400)
+    if len(changes) > MAX_BATCH:
+        return JSONResponse({"error": f"at most {MAX_BATCH} changes per batch"}, status_code=400)
+
+    def run():
+        results, events = apply_status_changes(db, user_id, changes)
+        db.commit()
+        if events:
+            bump(user_id, "orders", "inventory")
+        order_feed.publish_many(user_id, events)
+        return results
+
+    results = await run_in_threadpool(run)
+    return {"updated": sum(bool(r.get("changed")) for r in results), "failed": sum(not r["ok"] for r in results), "results": results}
+
+#Chat comments webhook: JSON {"comments": [{name, text}]} in chat order;
+#"mine <code> x<qty>" comments become orders in the background
+@router.post("/live/comments")
+async def ingest_comments(request: Request):
+    user_id = require_login(request)
+    if not user_id:
+        return JSONResponse({"error": "login required"}, status_code=401)
+
+    body = await json_body(request)
+    comments = body.get("comments") if isinstance(body, dict) else None
+    if not isinstance(comments, list) or not all(isinstance(c, dict) for c in comments):
+        return JSONResponse({"error": "expected {\"comments\": [...]}"}, status_code=400)
+    if not comment_ingestor.running:
+        return JSONResponse({"error": "comment ingestion is not running"}, status_code=503, headers={"Retry-After": "5"})
+
+    accepted = comment_ingestor.offer(user_id, comments)
+    if accepted < len(comments):
+        # queue full: the sender retries the rest
+        return JSONResponse({"accepted": accepted}, status_code=429, headers={"Retry-After": "1"})
+    return JSONResponse({"accepted": accepted}, status_code=202)
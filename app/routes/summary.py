@@ -1,100 +1,170 @@
-from fastapi import APIRouter, Request
-from fastapi.responses import RedirectResponse
-from fastapi.templating import Jinja2Templates
-from pathlib import Path
-from sqlalchemy import func
-from app.models import SessionLocal, Order, Product
+from fastapi import APIRouter, Request, Depends
+from fastapi.responses import RedirectResponse, JSONResponse
+from sqlalchemy.orm import Session
+from app.templating import templates
+from app.models import SessionLocal, get_db, Product
+from app.archive import all_orders
+from app.rollups import load_summary, best_seller, revenue_history, top_products, HISTORY_BUCKETS
 from fastapi.responses import StreamingResponse
 import csv
 import io
-from datetime import datetime
+from datetime import datetime, date, time, timedelta
 
 
 router = APIRouter()
-BASE_DIR = Path(__file__).resolve().parent.parent
-templates = Jinja2Templates(directory=str(BASE_DIR / "templates"))
 
 def require_login(request: Request):
     return request.session.get("user_id")
 #csv
+CSV_HEADER = ["order_id", "customer_name", "product", "qty", "unit_price", "status", "line_total", "created_at"]
+CSV_BATCH_SIZE = 1000
+
+
+def iter_orders_csv(user_id: int, session_id=None, date_from=None, date_to=None):
+    # Streams the export in batches: rows come off a server-side cursor
+    # (yield_per) and each batch is flushed as one CSV chunk, so memory stays
+    # flat no matter how many orders the seller has. It opens its own session
+    # because it keeps reading after the handler (and get_db) has returned.
+    # Archived sessions are included (all_orders).
+    db = SessionLocal()
+    try:
+        orders = all_orders(
+            user_id,
+            session_id=session_id,
+            created_from=datetime.combine(date_from, time.min) if date_from is not None else None,
+            created_before=datetime.combine(date_to + timedelta(days=1), time.min) if date_to is not None else None,
+        )
+        query = (
+            db.query(
+                orders.c.id,
+                orders.c.customer_name,
+                Product.name,
+                orders.c.qty,
+                Product.price,
+                orders.c.status,
+                orders.c.created_at,
+            )
+            .join(Product, Product.id == orders.c.product_id)
+            .order_by(orders.c.id.asc())
+            .yield_per(CSV_BATCH_SIZE)
+        )
+
+        output = io.StringIO()
+        writer = csv.writer(output)
+        writer.writerow(CSV_HEADER)
+
+        for n, (order_id, customer_name, product_name, qty, price, status, created_at) in enumerate(query, 1):
+            line_total = float(qty) * float(price)
+            writer.writerow([
+                order_id,
+                customer_name,
+                product_name,
+                qty,
+                f"{price:.2f}",
+                status,
+                f"{line_total:.2f}",
+                created_at.isoformat() if created_at else ""
+            ])
+            if n % CSV_BATCH_SIZE == 0:
+                yield output.getvalue()
+                output.seek(0)
+                output.truncate(0)
+
+        yield output.getvalue()
+    finally:
+        db.close()
+
+
 @router.get("/summary/export.csv")
-async def export_summary_csv(request: Request):
+async def export_summary_csv(
+    request: Request,
+    session_id: str = "",
+    date_from: str = "",
+    date_to: str = "",
+):
     user_id = require_login(request)
     if not user_id:
         return RedirectResponse("/login", status_code=302)
 
-    db = SessionLocal()
+    # blank form fields mean "no filter"
+    try:
+        session_id = int(session_id) if session_id.strip() else None
+        date_from = date.fromisoformat(date_from) if date_from.strip() else None
+        date_to = date.fromisoformat(date_to) if date_to.strip() else None
+    except ValueError:
+        return RedirectResponse("/summary", status_code=302)
 
-    # Export all orders with product + computed line total
-    rows = (
-        db.query(Order, Product)
-        .join(Product, Product.id == Order.product_id)
-        .filter(Order.user_id == user_id)
-        .order_by(Order.id.asc())
-        .all()
-    )
-
-    output = io.StringIO()
-    writer = csv.writer(output)
-
-    # Header
-    writer.writerow(["order_id", "customer_name", "product", "qty", "unit_price", "status", "line_total", "created_at"])
-
-    # Data
-    for order, product in rows:
-        line_total = float(order.qty) * float(product.price)
-        writer.writerow([
-            order.id,
-            order.customer_name,
-            product.name,
-            order.qty,
-            f"{product.price:.2f}",
-            order.status,
-            f"{line_total:.2f}",
-            order.created_at.isoformat() if order.created_at else ""
-        ])
-
-    db.close()
-
-    output.seek(0)
     filename = f"livesell_orders_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
 
     return StreamingResponse(
-        iter([output.getvalue()]),
+        iter_orders_csv(user_id, session_id, date_from, date_to),
         media_type="text/csv",
         headers={"Content-Disposition": f'attachment; filename="{filename}"'}
     )
 
 
 
+def parse_range(date_from: str, date_to: str):
+    # blank means open-ended; raises ValueError on a bad date
+    return (
+        date.fromisoformat(date_from) if date_from.strip() else None,
+        date.fromisoformat(date_to) if date_to.strip() else None,
+    )
+
+#revenue/units over time, from the per-day rollups
+@router.get("/summary/revenue.json")
+def summary_revenue(
+    request: Request,
+    date_from: str = "",
+    date_to: str = "",
+    bucket: str = "day",
+    db: Session = Depends(get_db),
+):
+    user_id = require_login(request)
+    if not user_id:
+        return JSONResponse({"error": "login required"}, status_code=401)
+    if bucket not in HISTORY_BUCKETS:
+        return JSONResponse({"error": f"bucket must be one of {', '.join(HISTORY_BUCKETS)}"}, status_code=400)
+    try:
+        start, end = parse_range(date_from, date_to)
+    except ValueError:
+        return JSONResponse({"error": "dates must be YYYY-MM-DD"}, status_code=400)
+
+    load_summary(db, user_id)  # rebuilds the buckets if they were dropped
+    return {"bucket": bucket, "series": revenue_history(db, user_id, start, end, bucket)}
+
+#best sellers in a date range
+@router.get("/summary/top-products.json")
+def summary_top_products(
+    request: Request,
+    date_from: str = "",
+    date_to: str = "",
+    limit: int = 10,
+    by: str = "units",
+    db: Session = Depends(get_db),
+):
+    user_id = require_login(request)
+    if not user_id:
+        return JSONResponse({"error": "login required"}, status_code=401)
+    if by not in ("units", "revenue"):
+        return JSONResponse({"error": "by must be units or revenue"}, status_code=400)
+    try:
+        start, end = parse_range(date_from, date_to)
+    except ValueError:
+        return JSONResponse({"error": "dates must be YYYY-MM-DD"}, status_code=400)
+
+    load_summary(db, user_id)
+    return {"by": by, "products": top_products(db, user_id, start, end, max(1, min(limit, 100)), by)}
+
+
 @router.get("/summary")
-async def summary_page(request: Request):
+def summary_page(request: Request, db: Session = Depends(get_db)):
     user_id = require_login(request)
     if not user_id:
         return RedirectResponse("/login", status_code=302)
 
-    db = SessionLocal()
-
-    total_orders = db.query(Order).filter(Order.user_id == user_id).count()
-    paid_orders = db.query(Order).filter(Order.user_id == user_id, Order.status == "PAID").count()
-    cancelled_orders = db.query(Order).filter(Order.user_id == user_id, Order.status == "CANCELLED").count()
-    pending_orders = db.query(Order).filter(Order.user_id == user_id, Order.status == "PENDING").count()
-
-    total_revenue = (
-        db.query(func.sum(Order.qty * Product.price))
-        .join(Product, Product.id == Order.product_id)
-        .filter(Order.user_id == user_id, Order.status == "PAID")
-        .scalar()
-    ) or 0
-
-    best_seller = (
-        db.query(Product.name, func.sum(Order.qty).label("total_qty"))
-        .join(Order, Order.product_id == Product.id)
-        .filter(Order.user_id == user_id, Order.status != "CANCELLED")
-        .group_by(Product.name)
-        .order_by(func.sum(Order.qty).desc())
-        .first()
-    )
+    rollup = load_summary(db, user_id)
+    best = best_seller(db, user_id)
 
     low_stock = (
         db.query(Product)
@@ -103,18 +173,16 @@ async def summary_page(request: Request):
         .all()
     )
 
-    db.close()
-
     return templates.TemplateResponse(
         "summary.html",
         {
             "request": request,
-            "total_orders": total_orders,
-            "paid_orders": paid_orders,
-            "pending_orders": pending_orders,
-            "cancelled_orders": cancelled_orders,
-            "total_revenue": total_revenue,
-            "best_seller": best_seller,
+            "total_orders": rollup.total_orders,
+            "paid_orders": rollup.paid_orders,
+            "pending_orders": rollup.pending_orders,
+            "cancelled_orders": rollup.cancelled_orders,
+            "total_revenue": rollup.paid_revenue,
+            "best_seller": best,
             "low_stock": low_stock,
         },
     )
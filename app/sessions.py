@@ -0,0 +1,225 @@
+import json
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from itsdangerous import BadSignature, Signer
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import MutableHeaders
+from starlette.requests import HTTPConnection
+from app.live_sessions import cached_active_session
+from app.templating import version
+
+#-----------Server-side sessions ----------#
+# The cookie only carries a signed random session id; the session data
+# (user id, email, name) lives in a store picked with SESSION_BACKEND:
+#   memory - LRU dict in this process (fine for a single worker)
+#   sqlite - table in the local state file, shared by every worker
+# request.session works as before. The store is written and a cookie sent
+# only when a handler changed the session (login, register, logout); a
+# login gets a fresh id so an id handed out before login is useless after.
+# Sessions last SESSION_MAX_AGE seconds from the last request: a session
+# older than SESSION_REFRESH is pushed out again (and its cookie re-sent),
+# so an active seller is never logged out mid-live and the store sees at
+# most one such write per SESSION_REFRESH. Stores that block (sqlite) are
+# called from the threadpool, never on the event loop.
+
+SESSION_BACKEND = os.getenv("SESSION_BACKEND", "memory")
+SESSION_MAX_AGE = int(os.getenv("SESSION_MAX_AGE", str(14 * 24 * 3600)))
+SESSION_REFRESH = int(os.getenv("SESSION_REFRESH", "3600"))
+SESSION_CACHE_SIZE = int(os.getenv("SESSION_CACHE_SIZE", "10000"))
+SESSION_COOKIE = "livesell_sid"
+
+
+class MemorySessionStore:
+    blocking = False
+
+    def __init__(self, max_entries: int = SESSION_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._data = OrderedDict()  # id -> (data, expires)
+        self._lock = threading.Lock()
+
+    def get(self, session_id: str):
+        # (data, expires) or None
+        with self._lock:
+            item = self._data.get(session_id)
+            if item is None:
+                return None
+            data, expires = item
+            if expires < time.time():
+                del self._data[session_id]
+                return None
+            self._data.move_to_end(session_id)
+            return dict(data), expires
+
+    def set(self, session_id: str, data: dict, ttl: float):
+        with self._lock:
+            self._data[session_id] = (dict(data), time.time() + ttl)
+            self._data.move_to_end(session_id)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def touch(self, session_id: str, ttl: float):
+        with self._lock:
+            item = self._data.get(session_id)
+            if item is not None:
+                self._data[session_id] = (item[0], time.time() + ttl)
+
+    def delete(self, session_id: str):
+        with self._lock:
+            self._data.pop(session_id, None)
+
+
+class SqliteSessionStore:
+    blocking = True
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._writes = 0
+
+    def _conn(self):
+        # the file and table are created on first use, not at import
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS sessions ("
+                " id TEXT PRIMARY KEY, data TEXT NOT NULL, expires REAL NOT NULL)"
+            )
+            self._local.conn = conn
+        return conn
+
+    def get(self, session_id: str):
+        row = self._conn().execute(
+            "SELECT data, expires FROM sessions WHERE id = ? AND expires >= ?", (session_id, time.time())
+        ).fetchone()
+        return (json.loads(row[0]), row[1]) if row else None
+
+    def set(self, session_id: str, data: dict, ttl: float):
+        conn = self._conn()
+        now = time.time()
+        conn.execute(
+            "INSERT OR REPLACE INTO sessions (id, data, expires) VALUES (?, ?, ?)",
+            (session_id, json.dumps(data), now + ttl),
+        )
+        self._writes += 1
+        if self._writes % 500 == 0:
+            conn.execute("DELETE FROM sessions WHERE expires < ?", (now,))
+
+    def touch(self, session_id: str, ttl: float):
+        self._conn().execute("UPDATE sessions SET expires = ? WHERE id = ?", (time.time() + ttl, session_id))
+
+    def delete(self, session_id: str):
+        self._conn().execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+
+
+def make_session_store(backend: str = SESSION_BACKEND):
+    if backend == "memory":
+        return MemorySessionStore()
+    if backend == "sqlite":
+        from app.cache import STATE_DB_PATH
+        return SqliteSessionStore(STATE_DB_PATH)
+    raise RuntimeError(f"Unknown SESSION_BACKEND {backend!r}, use 'memory' or 'sqlite'")
+
+
+class ServerSessionMiddleware:
+    def __init__(
+        self, app, secret_key: str, store=None, max_age: int = SESSION_MAX_AGE,
+        refresh: int = SESSION_REFRESH, https_only: bool = False,
+    ):
+        self.app = app
+        self.store = store if store is not None else make_session_store()
+        self.signer = Signer(secret_key, salt="livesell.session")
+        self.max_age = max_age
+        self.refresh = refresh
+        self.flags = "; path=/; httponly; samesite=lax" + ("; secure" if https_only else "")
+
+    def _session_id(self, scope):
+        value = HTTPConnection(scope).cookies.get(SESSION_COOKIE)
+        if not value:
+            return None
+        try:
+            return self.signer.unsign(value).decode()
+        except BadSignature:
+            return None
+
+    def _cookie(self, session_id: str) -> str:
+        value = self.signer.sign(session_id).decode()
+        return f"{SESSION_COOKIE}={value}; Max-Age={self.max_age}{self.flags}"
+
+    def _expired_cookie(self) -> str:
+        return f"{SESSION_COOKIE}=; expires=Thu, 01 Jan 1970 00:00:00 GMT{self.flags}"
+
+    async def _store(self, method: str, *args):
+        call = getattr(self.store, method)
+        if self.store.blocking:
+            return await run_in_threadpool(call, *args)
+        return call(*args)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] not in ("http", "websocket"):
+            return await self.app(scope, receive, send)
+
+        session_id = self._session_id(scope)
+        found = await self._store("get", session_id) if session_id else None
+        loaded, expires = found or (None, 0)
+        original = loaded or {}
+        scope["session"] = dict(original)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                session = scope["session"]
+                headers = MutableHeaders(scope=message)
+                if session == original:
+                    if session_id and loaded is None:
+                        # unknown or expired id: drop the cookie
+                        headers.append("Set-Cookie", self._expired_cookie())
+                    elif loaded and expires - time.time() < self.max_age - self.refresh:
+                        # rolling expiry, written at most once per refresh period
+                        await self._store("touch", session_id, self.max_age)
+                        headers.append("Set-Cookie", self._cookie(session_id))
+                elif not session:
+                    if session_id:
+                        await self._store("delete", session_id)
+                    headers.append("Set-Cookie", self._expired_cookie())
+                elif loaded is None or session.get("user_id") != original.get("user_id"):
+                    # new session or a login: new id
+                    if session_id:
+                        await self._store("delete", session_id)
+                    new_id = secrets.token_urlsafe(32)
+                    await self._store("set", new_id, session, self.max_age)
+                    headers.append("Set-Cookie", self._cookie(new_id))
+                else:
+                    await self._store("set", session_id, session, self.max_age)
+                    headers.append("Set-Cookie", self._cookie(session_id))
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
+
+#-----------User context ----------#
+# What handlers usually need about the logged-in seller, assembled from the
+# session and the shared cache only: no database query. The cache can be
+# SQLite-backed, so call it from plain def handlers, not on the event loop.
+
+UserContext = namedtuple("UserContext", "user_id email name active_session_id inventory_version")
+
+
+def user_context(request):
+    session = request.session
+    user_id = session.get("user_id")
+    if not user_id:
+        return None
+    active = cached_active_session(user_id)
+    return UserContext(
+        user_id,
+        session.get("user_email"),
+        session.get("user_name"),
+        active.id if active else None,
+        version(user_id, "inventory"),
+    )
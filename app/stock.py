@@ -0,0 +1,49 @@
+from sqlalchemy import update
+from app.models import Product, Order
+
+#-----------Stock reservation ----------#
+# Stock is only ever changed with a single conditional UPDATE, so the check
+# and the decrement happen inside the database and two concurrent orders can
+# never both take the last unit.
+
+def reserve_stock(db, user_id: int, product_id: int, qty: int):
+    # returns (name, stock left) of the product, or None if it can't be sold
+    if qty <= 0:
+        return None
+    return db.execute(
+        update(Product)
+        .where(
+            Product.id == product_id,
+            Product.user_id == user_id,
+            Product.stock >= qty,
+        )
+        .values(stock=Product.stock - qty)
+        .returning(Product.name, Product.stock)
+        .execution_options(synchronize_session=False)
+    ).first()
+
+
+def release_stock(db, user_id: int, product_id: int, qty: int):
+    # returns the new stock, or None if the product no longer exists
+    return db.execute(
+        update(Product)
+        .where(Product.id == product_id, Product.user_id == user_id)
+        .values(stock=Product.stock + qty)
+        .returning(Product.stock)
+        .execution_options(synchronize_session=False)
+    ).scalar()
+
+
+def change_status(db, user_id: int, order_id: int, old_status, new_status) -> bool:
+    # only the request that actually flips the status wins, so stock and
+    # rollups are adjusted once even for double clicks
+    if old_status == new_status:
+        return False
+    current = Order.status.is_(None) if old_status is None else Order.status == old_status
+    result = db.execute(
+        update(Order)
+        .where(Order.id == order_id, Order.user_id == user_id, current)
+        .values(status=new_status)
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount == 1
@@ -0,0 +1,94 @@
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from pathlib import Path
+from fastapi.templating import Jinja2Templates
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader
+from markupsafe import Markup
+from app.cache import cache
+from app.metrics import instrument_templates
+
+#-----------Templates ----------#
+# One Jinja environment for the whole app, so every template is compiled
+# once per process. Compiled bytecode is also kept on disk
+# (TEMPLATE_CACHE_DIR, "off" disables it) so a fresh worker doesn't have to
+# recompile everything on its first requests.
+
+BASE_DIR = Path(__file__).resolve().parent  # points to /app
+TEMPLATE_CACHE_DIR = os.getenv("TEMPLATE_CACHE_DIR", "./.template_cache")
+
+
+class _BytecodeCache(FileSystemBytecodeCache):
+    # creates the directory on the first compile rather than at import
+    def dump_bytecode(self, bucket):
+        Path(self.directory).mkdir(parents=True, exist_ok=True)
+        super().dump_bytecode(bucket)
+
+
+def _bytecode_cache():
+    if TEMPLATE_CACHE_DIR == "off":
+        return None
+    return _BytecodeCache(TEMPLATE_CACHE_DIR)
+
+
+templates = instrument_templates(Jinja2Templates(env=Environment(
+    loader=FileSystemLoader(str(BASE_DIR / "templates")),
+    autoescape=True,
+    bytecode_cache=_bytecode_cache(),
+)))
+
+
+#-----------Fragment cache ----------#
+# Hot pieces of a page (the live product <select>, the newest orders) are
+# cached rendered, keyed by a per-user version of the data they show.
+# Write paths call bump() after they commit; the versions live in app.cache
+# so a bump in one worker is seen by all of them, while the rendered HTML
+# stays in this process (small LRU).
+#   inventory - products: names, prices, stock
+#   orders    - orders of the user's live sessions
+
+FRAGMENT_CACHE_SIZE = int(os.getenv("FRAGMENT_CACHE_SIZE", "512"))
+
+_fragments = OrderedDict()
+_fragments_lock = threading.Lock()
+
+
+def _version_key(user_id: int, kind: str) -> str:
+    return f"tpl:version:{kind}:{user_id}"
+
+
+def bump(user_id: int, *kinds: str):
+    for kind in kinds:
+        cache.set(_version_key(user_id, kind), uuid.uuid4().hex)
+
+
+def version(user_id: int, kind: str) -> str:
+    # current version token of the user's `kind` data
+    value = cache.get(_version_key(user_id, kind))
+    if value is None:
+        value = uuid.uuid4().hex
+        cache.set(_version_key(user_id, kind), value)
+    return value
+
+
+def cached_fragment(name: str, user_id: int, kinds, key, render):
+    # render() builds the value on a miss (it may hit the DB); the value is
+    # reused until one of the user's `kinds` versions is bumped
+    versions = tuple(cache.get(_version_key(user_id, kind)) for kind in kinds)
+    cache_key = (name, user_id, key, versions)
+    with _fragments_lock:
+        if cache_key in _fragments:
+            _fragments.move_to_end(cache_key)
+            return _fragments[cache_key]
+
+    value = render()
+    with _fragments_lock:
+        _fragments[cache_key] = value
+        while len(_fragments) > FRAGMENT_CACHE_SIZE:
+            _fragments.popitem(last=False)
+    return value
+
+
+def render_fragment(name: str, **context) -> Markup:
+    return Markup(templates.get_template(name).render(**context))
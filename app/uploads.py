@@ -0,0 +1,239 @@
+import hashlib
+import os
+import sys
+import time
+import uuid
+from pathlib import Path
+from sqlalchemy import or_
+from starlette.responses import PlainTextResponse
+from starlette.staticfiles import StaticFiles
+from app.models import SessionLocal, Product
+from app.metrics import UPLOAD_BYTES
+
+try:
+    from PIL import Image
+except ImportError:  # thumbnails are skipped without Pillow
+    Image = None
+
+#-----------Image uploads ----------#
+# Uploads are copied to disk in chunks (handlers run in the threadpool), the
+# real type is sniffed from the first bytes instead of trusting the filename,
+# and a small WebP thumbnail is made in a background task for the pages.
+#
+# Files are content-addressed: the name is the SHA-256 of the bytes, so the
+# same photo is stored once, a URL never changes meaning and browsers may
+# cache it forever. Several products can share a file; it is removed once no
+# product references it (see release_image / collect_orphans).
+
+BASE_DIR = Path(__file__).resolve().parent  # points to /app
+UPLOAD_DIR = BASE_DIR / "static" / "uploads"
+THUMB_DIR = UPLOAD_DIR / "thumbs"
+UPLOAD_URL = "/static/uploads"
+
+CHUNK_SIZE = 1024 * 1024
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_MB", "10")) * 1024 * 1024
+THUMB_SIZE = (160, 160)
+# files touched more recently than this are never garbage collected, so an
+# upload that is about to be committed can't lose its file
+GC_GRACE_SECONDS = 300
+
+
+class UploadError(Exception):
+    pass
+
+
+def sniff_image_type(head: bytes):
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return ".png"
+    if head.startswith(b"\xff\xd8\xff"):
+        return ".jpg"
+    if head[:6] in (b"GIF87a", b"GIF89a"):
+        return ".gif"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return ".webp"
+    return None
+
+
+def save_upload(upload) -> str:
+    # returns the public path of the stored original
+    UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
+    source = upload.file
+    source.seek(0)
+    first = source.read(CHUNK_SIZE)
+    ext = sniff_image_type(first[:16])
+    if ext is None:
+        raise UploadError("Only PNG, JPEG, GIF and WebP images are allowed.")
+
+    digest = hashlib.sha256()
+    tmp_path = UPLOAD_DIR / f"{uuid.uuid4().hex}.part"
+    size = 0
+    try:
+        with open(tmp_path, "wb") as f:
+            chunk = first
+            while chunk:
+                size += len(chunk)
+                if size > MAX_UPLOAD_BYTES:
+                    raise UploadError(f"Image is larger than {MAX_UPLOAD_BYTES // (1024 * 1024)} MB.")
+                digest.update(chunk)
+                f.write(chunk)
+                chunk = source.read(CHUNK_SIZE)
+
+        filename = f"{digest.hexdigest()}{ext}"
+        save_path = UPLOAD_DIR / filename
+        if save_path.exists():
+            # already stored: keep the existing file and refresh its grace period
+            os.utime(save_path)
+        else:
+            os.replace(tmp_path, save_path)
+    finally:
+        if tmp_path.exists():
+            tmp_path.unlink()
+    UPLOAD_BYTES.observe(size)
+    return f"{UPLOAD_URL}/{filename}"
+
+
+def local_path(public_path: str) -> Path:
+    return UPLOAD_DIR / Path(public_path).name
+
+
+def thumb_path_for(image_path: str) -> str:
+    return f"{UPLOAD_URL}/thumbs/{Path(image_path).stem}.webp"
+
+
+def make_thumbnail(product_id: int, image_path: str):
+    # background task: resize, then point the product at the thumbnail if
+    # it still uses the same image
+    if Image is None:
+        return
+    THUMB_DIR.mkdir(parents=True, exist_ok=True)
+    thumb_path = thumb_path_for(image_path)
+    thumb_file = THUMB_DIR / Path(thumb_path).name
+    if not thumb_file.exists():
+        try:
+            with Image.open(local_path(image_path)) as im:
+                im.thumbnail(THUMB_SIZE)
+                if im.mode not in ("RGB", "RGBA"):
+                    im = im.convert("RGBA")
+                im.save(thumb_file, "WEBP", quality=80)
+        except (OSError, ValueError, Image.DecompressionBombError):
+            # unreadable, or small on disk but huge once decoded
+            return
+
+    db = SessionLocal()
+    try:
+        updated = db.query(Product).filter(
+            Product.id == product_id, Product.image_path == image_path
+        ).update({Product.thumb_path: thumb_path}, synchronize_session=False)
+        db.commit()
+        if updated:
+            # products.json is cached by the client against the inventory version
+            from app.templating import bump
+            user_id = db.query(Product.user_id).filter(Product.id == product_id).scalar()
+            bump(user_id, "inventory")
+    finally:
+        db.close()
+
+
+def _recently_touched(path: Path) -> bool:
+    try:
+        return time.time() - path.stat().st_mtime < GC_GRACE_SECONDS
+    except OSError:
+        return False
+
+
+def _delete(path: Path):
+    try:
+        path.unlink()
+    except OSError:
+        pass
+
+
+def image_refs(db, image_path: str) -> int:
+    return db.query(Product).filter(Product.image_path == image_path).count()
+
+
+def release_image(image_path: str):
+    # background task after a product stops using an image
+    if not image_path:
+        return
+    db = SessionLocal()
+    try:
+        if image_refs(db, image_path):
+            return
+    finally:
+        db.close()
+    original = local_path(image_path)
+    if _recently_touched(original):
+        return  # collect_orphans will get it if it stays unused
+    _delete(original)
+    _delete(THUMB_DIR / Path(thumb_path_for(image_path)).name)
+
+
+def collect_orphans() -> int:
+    # delete every upload (and thumbnail) no product points at any more
+    db = SessionLocal()
+    try:
+        used = set()
+        for image_path, thumb_path in db.query(Product.image_path, Product.thumb_path).filter(
+            or_(Product.image_path.isnot(None), Product.thumb_path.isnot(None))
+        ):
+            for path in (image_path, thumb_path):
+                if path:
+                    used.add(Path(path).name)
+            if image_path:
+                used.add(Path(thumb_path_for(image_path)).name)
+    finally:
+        db.close()
+
+    removed = 0
+    for directory in (UPLOAD_DIR, THUMB_DIR):
+        if not directory.is_dir():
+            continue
+        for path in directory.iterdir():
+            if path.is_file() and path.name not in used and not _recently_touched(path):
+                _delete(path)
+                removed += 1
+    return removed
+
+
+#-----------Request size limit ----------#
+class UploadLimitMiddleware:
+    # Answers 413 from the Content-Length header, before Starlette spools a
+    # too-large body to disk. Bodies sent without one (chunked) are still
+    # cut off by the size check in save_upload.
+    FORM_OVERHEAD = 64 * 1024  # multipart boundaries and the other fields
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            length = dict(scope["headers"]).get(b"content-length", b"0")
+            if length.isdigit() and int(length) > MAX_UPLOAD_BYTES + self.FORM_OVERHEAD:
+                response = PlainTextResponse(
+                    f"Request is larger than {MAX_UPLOAD_BYTES // (1024 * 1024)} MB.", status_code=413
+                )
+                return await response(scope, receive, send)
+        await self.app(scope, receive, send)
+
+
+#-----------Static files with cache headers ----------#
+class CachedStaticFiles(StaticFiles):
+    # Upload names are never reused (content hash, or uuid for older
+    # files), so they can be cached forever. Everything else (css) is
+    # revalidated with the ETag StaticFiles already sends.
+    def file_response(self, full_path, stat_result, scope, status_code=200):
+        response = super().file_response(full_path, stat_result, scope, status_code)
+        if Path(full_path).resolve().is_relative_to(UPLOAD_DIR.resolve()):
+            response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+        else:
+            response.headers["Cache-Control"] = "no-cache"
+        return response
+
+
+if __name__ == "__main__":
+    # python -m app.uploads gc
+    if sys.argv[1:] == ["gc"]:
+        print(f"removed {collect_orphans()} orphaned upload(s)")
+    else:
+        print("usage: python -m app.uploads gc")
@@ -0,0 +1,100 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from app.models import SessionLocal
+from app.metrics import WRITE_BATCH_SIZE
+
+#-----------Group commit ----------#
+# With WRITE_BATCH_MS set, order and status writes from every request go to
+# one writer thread instead of each committing on its own. The writer runs
+# whatever arrived within the window in a single transaction, so a burst of
+# orders costs one commit (one fsync) instead of one each. Every caller
+# still blocks until the commit holding its write is done, so a 303 back to
+# /live still means the order is on disk.
+#
+# If anything in a batch raises, the batch is rolled back and its writes are
+# retried one transaction each, so one bad write doesn't fail the others.
+
+WRITE_BATCH_MS = float(os.getenv("WRITE_BATCH_MS", "0"))  # 0 = commit per request
+WRITE_BATCH_MAX = int(os.getenv("WRITE_BATCH_MAX", "200"))
+
+
+class GroupCommitter:
+    def __init__(self, window_ms: float, max_batch: int = WRITE_BATCH_MAX, session_factory=SessionLocal):
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self.session_factory = session_factory
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def submit(self, op):
+        # op(db) -> result; blocks until op's transaction has committed
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="group-commit", daemon=True)
+                self._thread.start()
+        future = Future()
+        self._queue.put((op, future))
+        return future.result()
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            WRITE_BATCH_SIZE.observe(len(batch))
+            db = self.session_factory()
+            try:
+                try:
+                    results = [op(db) for op, _ in batch]
+                    db.commit()
+                except Exception:
+                    db.rollback()
+                    self._run_one_by_one(db, batch)
+                    continue
+                for (_, future), result in zip(batch, results):
+                    future.set_result(result)
+            finally:
+                db.close()
+
+    def _run_one_by_one(self, db, batch):
+        for op, future in batch:
+            try:
+                result = op(db)
+                db.commit()
+            except Exception as exc:
+                db.rollback()
+                future.set_exception(exc)
+            else:
+                future.set_result(result)
+
+
+write_queue = GroupCommitter(WRITE_BATCH_MS) if WRITE_BATCH_MS > 0 else None
+
+
+def run_write(db, op):
+    # run op(db) and commit it: inline on the request's session, or batched
+    # with other requests' writes when group commit is on
+    if write_queue is None:
+        try:
+            result = op(db)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        return result
+    return write_queue.submit(op)
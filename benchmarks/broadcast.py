@@ -0,0 +1,82 @@
+import argparse
+import asyncio
+import json
+import tempfile
+import threading
+import time
+from pathlib import Path
+from benchmarks.common import configure_env, latency_line
+
+#-----------Live feed fan-out ----------#
+# Hundreds of open live pages of one seller, each a subscriber queue read by
+# its own task the way /live/stream reads it, while a worker thread publishes
+# orders like add_order does. Measures publish -> page latency for every
+# delivery, for the in-process feed and the cross-worker sqlite feed.
+#
+#   python -m benchmarks.broadcast --subscribers 100 300 1000 --events 200
+
+
+async def fan_out(feed, subscribers: int, events: int, rate: float):
+    user_id = 1
+    queues = [feed.subscribe(user_id) for _ in range(subscribers)]
+    latencies = []
+    resyncs = 0
+
+    async def page(queue):
+        nonlocal resyncs
+        seen = 0
+        while seen < events:
+            payload = await queue.get()
+            event = json.loads(payload)
+            if event["type"] == "resync":
+                resyncs += 1
+                return
+            latencies.append(time.perf_counter() - event["sent"])
+            seen += 1
+
+    def publisher():
+        for n in range(events):
+            feed.publish(user_id, {"type": "order", "order": {"id": n}, "sent": time.perf_counter()})
+            time.sleep(1 / rate)
+
+    readers = [asyncio.create_task(page(q)) for q in queues]
+    await asyncio.sleep(0.2)  # let the sqlite poller start
+    start = time.perf_counter()
+    thread = threading.Thread(target=publisher)
+    thread.start()
+    await asyncio.wait_for(asyncio.gather(*readers), timeout=120)
+    elapsed = time.perf_counter() - start
+    thread.join()
+    for queue in queues:
+        feed.unsubscribe(user_id, queue)
+    return latencies, resyncs, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Live feed delivery latency with many open pages.")
+    parser.add_argument("--subscribers", type=int, nargs="+", default=[100, 300, 1000])
+    parser.add_argument("--events", type=int, default=200)
+    parser.add_argument("--rate", type=float, default=50, help="orders published per second")
+    parser.add_argument("--backends", nargs="+", default=["memory", "sqlite"])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        configure_env(Path(tmp) / "bench.db")
+        from app.events import OrderFeed, SharedOrderFeed
+
+        print(f"{args.events} orders at {args.rate:g}/s to every page")
+        for backend in args.backends:
+            for subscribers in args.subscribers:
+                if backend == "memory":
+                    feed = OrderFeed()
+                else:
+                    feed = SharedOrderFeed(str(Path(tmp) / f"feed-{subscribers}.db"))
+                latencies, resyncs, elapsed = asyncio.run(fan_out(feed, subscribers, args.events, args.rate))
+                deliveries = len(latencies) / elapsed
+                dropped = f"  {resyncs} resync(s)" if resyncs else ""
+                print(f"  {backend:6} {subscribers:5} pages  {deliveries:9,.0f} deliveries/s  "
+                      f"{latency_line(latencies)}{dropped}")
+
+
+if __name__ == "__main__":
+    main()
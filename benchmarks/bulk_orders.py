@@ -0,0 +1,59 @@
+import argparse
+import tempfile
+import time
+from pathlib import Path
+from benchmarks.common import configure_env, register, add_product
+
+#-----------Bulk vs one-by-one orders ----------#
+# The same N orders entered once through POST /live/order/add per order and
+# once as a single POST /live/orders/bulk, against a scratch database.
+#
+#   python -m benchmarks.bulk_orders [--orders 1000]
+
+
+def run(orders: int):
+    from fastapi.testclient import TestClient
+    from app.main import app
+    from app.models import init_db, SessionLocal, Order
+
+    init_db()
+    client = TestClient(app)
+    results = {}
+
+    user_id = register(client, "one-by-one@bench.local")
+    product_id = add_product(user_id)
+    start = time.perf_counter()
+    for n in range(orders):
+        client.post("/live/order/add", data={"customer_name": f"Buyer {n % 200}", "product_id": product_id, "qty": 1},
+                    follow_redirects=False)
+    results["one-by-one"] = (user_id, time.perf_counter() - start)
+
+    client = TestClient(app)
+    user_id = register(client, "bulk@bench.local")
+    product_id = add_product(user_id)
+    start = time.perf_counter()
+    response = client.post("/live/orders/bulk", json={"orders": [
+        {"customer_name": f"Buyer {n % 200}", "product_id": product_id, "qty": 1} for n in range(orders)
+    ]})
+    results["bulk"] = (user_id, time.perf_counter() - start)
+    assert response.json()["added"] == orders
+
+    with SessionLocal() as db:
+        for label, (user_id, seconds) in results.items():
+            stored = db.query(Order).filter(Order.user_id == user_id).count()
+            print(f"  {label:<11} {orders} orders in {seconds:7.3f}s  {orders / seconds:9,.0f} orders/s  ({stored} stored)")
+    one, bulk = results["one-by-one"][1], results["bulk"][1]
+    print(f"  bulk is {one / bulk:.0f}x faster")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare bulk order entry with one request per order.")
+    parser.add_argument("--orders", type=int, default=1000)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        configure_env(Path(tmp) / "bench.db")
+        run(args.orders)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+import json
+import math
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+#-----------Shared benchmark helpers ----------#
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def configure_env(db_path: Path):
+    # must run before anything from app is imported
+    os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+    os.environ.setdefault("SECRET_KEY", "bench")
+    os.environ.setdefault("BCRYPT_ROUNDS", "4")
+    os.environ.setdefault("CACHE_BACKEND", "memory")
+    os.environ.setdefault("FEED_BACKEND", "memory")
+    os.environ.setdefault("STATE_DB_PATH", str(db_path.with_name("state.db")))
+    os.environ.setdefault("TEMPLATE_CACHE_DIR", "off")
+    # lock waits already show up in p99; keep the per-query log out of the report
+    os.environ.setdefault("SLOW_QUERY_MS", "0")
+    os.environ.setdefault("INIT_LOCK_PATH", str(db_path.with_suffix(".lock")))
+    sys.path.insert(0, str(ROOT))
+
+
+def percentile(samples, p: float):
+    # nearest rank; samples must be sorted
+    return samples[max(0, math.ceil(len(samples) * p / 100) - 1)]
+
+
+def latency_line(samples) -> str:
+    samples = sorted(samples)
+    return (
+        f"p50 {statistics.median(samples) * 1000:8.2f} ms"
+        f"  p99 {percentile(samples, 99) * 1000:8.2f} ms"
+        f"  max {samples[-1] * 1000:8.2f} ms"
+    )
+
+
+def register(client, email: str, password: str = "bench-password"):
+    # registers (and logs in) a seller on a TestClient; returns the user id
+    from app.models import SessionLocal, User
+    response = client.post(
+        "/register", data={"full_name": "Bench Seller", "email": email, "password": password}, follow_redirects=False
+    )
+    if response.status_code != 302:
+        raise SystemExit(f"register failed: {response.status_code}")
+    with SessionLocal() as db:
+        return db.query(User.id).filter(User.email == email).scalar()
+
+
+def add_product(user_id: int, stock: int = 10**7, price: float = 100, name: str = "Item", code: str = None) -> int:
+    from app.models import SessionLocal, Product
+    with SessionLocal() as db:
+        product = Product(user_id=user_id, name=name, price=price, stock=stock, code=code)
+        db.add(product)
+        db.commit()
+        return product.id
+
+
+#-----------Runs on other revisions ----------#
+# For before/after numbers: the benchmark's child half runs inside a
+# temporary worktree of a git ref, with only that tree's app on the path,
+# and prints its result as JSON on the last line of stdout.
+
+def short_rev(ref: str) -> str:
+    return subprocess.run(
+        ["git", "rev-parse", "--short", ref], cwd=ROOT, capture_output=True, text=True, check=True
+    ).stdout.strip()
+
+
+def run_in_worktree(ref: str, script: str, child_args) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        tree = Path(tmp) / "tree"
+        subprocess.run(["git", "worktree", "add", "--detach", "-q", str(tree), ref], cwd=ROOT, check=True)
+        try:
+            # the tree's tracked sample database has users of its own; seed a
+            # fresh file (revisions before DATABASE_URL always open this path)
+            (tree / "livesell.db").unlink(missing_ok=True)
+            env = dict(
+                os.environ,
+                PYTHONPATH=str(tree),
+                DATABASE_URL=f"sqlite:///{tree / 'livesell.db'}",
+                STATE_DB_PATH=str(Path(tmp) / "state.db"),
+                INIT_LOCK_PATH=str(Path(tmp) / "init.lock"),
+                SECRET_KEY="bench",
+                BCRYPT_ROUNDS="4",
+                TEMPLATE_CACHE_DIR="off",
+                SLOW_QUERY_MS="0",
+            )
+            out = subprocess.run(
+                [sys.executable, script, "--child", *map(str, child_args)],
+                cwd=tree, env=env, check=True, capture_output=True, text=True,
+            ).stdout
+            return json.loads(out.strip().splitlines()[-1])
+        finally:
+            subprocess.run(["git", "worktree", "remove", "--force", str(tree)], cwd=ROOT, check=True)
@@ -0,0 +1,60 @@
+import argparse
+import random
+import tempfile
+import time
+from pathlib import Path
+from benchmarks.common import configure_env, latency_line
+
+#-----------Customer autocomplete ----------#
+# Lookup latency of the live order form's customer autocomplete against one
+# seller with `count` customers, for prefix, substring and typo queries.
+#
+#   python -m benchmarks.customer_search [--customers 100000]
+
+FIRST = ["maria", "ana", "jose", "juan", "mark", "angel", "kristine", "joy", "rose", "john",
+         "michael", "grace", "lovely", "paolo", "carla", "jessa", "ramon", "liza", "ella", "ben"]
+LAST = ["santos", "reyes", "cruz", "bautista", "garcia", "mendoza", "torres", "tuyco", "riano",
+        "villanueva", "ramos", "aquino", "castillo", "flores", "dela cruz", "navarro", "lim", "tan"]
+QUERIES = {
+    "prefix 2": "ma", "prefix 5": "maria", "full name": "maria cruz 42",
+    "substring": "cruz 99", "typo": "mraia santso",
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Customer autocomplete latency.")
+    parser.add_argument("--customers", type=int, default=100_000)
+    parser.add_argument("--rounds", type=int, default=200, help="lookups per query")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        configure_env(Path(tmp) / "bench.db")
+        from sqlalchemy import insert
+        from app.models import engine, init_db, SessionLocal, User, Customer
+        from app.customers import normalize_name, search_customers
+
+        init_db()
+        rng = random.Random(7)
+        names = {}
+        while len(names) < args.customers:
+            name = f"{rng.choice(FIRST).title()} {rng.choice(LAST).title()} {rng.randrange(10_000)}"
+            names.setdefault(normalize_name(name), name)
+        with engine.begin() as conn:
+            conn.execute(insert(User), [{"full_name": "Bench", "email": "bench@bench.local", "password_hash": "x"}])
+            conn.execute(insert(Customer), [
+                {"user_id": 1, "name": name, "normalized_name": key} for key, name in names.items()
+            ])
+
+        print(f"{args.customers} customers, {args.rounds} lookups each")
+        with SessionLocal() as db:
+            for label, query in QUERIES.items():
+                timings = []
+                for _ in range(args.rounds):
+                    start = time.perf_counter()
+                    hits = search_customers(db, 1, query)
+                    timings.append(time.perf_counter() - start)
+                print(f"  {label:<10} {query!r:<16} {latency_line(timings)}  ({len(hits)} hits)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import time
+
+#-----------Event loop under slow requests ----------#
+# Latency of POST /live/order/add while full CSV exports and /summary visits
+# over a big order table run at the same time, compared with the same
+# orders on an idle app. A handler that does its database work on the event
+# loop stalls every other request for as long as it runs; one that runs in
+# the threadpool only competes for the CPU. Runs on any git revision, each
+# ref in a temporary worktree with that revision's own app:
+#
+#   python -m benchmarks.event_loop --refs <first commit of the series> HEAD
+#
+# The child half runs inside the worktree with only that tree on the path,
+# so this file imports nothing from the repo at the top
+# (benchmarks.common.run_in_worktree).
+
+PASSWORD = "bench-password"
+
+
+def percentile(samples, p: float):
+    samples = sorted(samples)
+    return samples[max(0, -(-len(samples) * p // 100) - 1)]
+
+
+async def measure(app, args, product_ids, slow_paths) -> tuple:
+    import httpx
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=600) as client:
+        response = await client.post("/login", data={"email": "bench@bench.local", "password": PASSWORD})
+        assert response.status_code in (302, 303), response.status_code
+        rng = random.Random(7)
+        running = True
+        slow = []
+
+        async def hog(path):
+            while running:
+                start = time.perf_counter()
+                response = await client.get(path)
+                assert response.status_code == 200, (path, response.status_code)
+                slow.append(time.perf_counter() - start)
+                # a handler with nothing to await never hands the loop back,
+                # a real server would still take the next connection here
+                await asyncio.sleep(0)
+
+        hogs = [asyncio.create_task(hog(path)) for path in slow_paths]
+        # orders are due on a fixed schedule and timed from when they were
+        # due, so time spent waiting for a blocked loop counts as latency
+        latencies = []
+        first = time.perf_counter()
+        for n in range(int(args.seconds * 1000 / args.interval)):
+            due = first + n * args.interval / 1000
+            await asyncio.sleep(max(0, due - time.perf_counter()))
+            response = await client.post("/live/order/add", data={
+                "customer_name": f"Buyer {rng.randrange(500)}", "product_id": rng.choice(product_ids), "qty": "1",
+            })
+            latencies.append(time.perf_counter() - due)
+            assert response.status_code in (302, 303), response.status_code
+        running = False
+        await asyncio.gather(*hogs)
+    return latencies, slow
+
+
+def child(args):
+    from sqlalchemy import insert, select
+    from app.models import engine, init_db, pwd_context, User, Product, LiveSession, Order
+
+    init_db()
+    with engine.begin() as conn:
+        conn.execute(insert(User), [
+            {"full_name": "Bench", "email": "bench@bench.local", "password_hash": pwd_context.hash(PASSWORD)}
+        ])
+        user_id = conn.scalar(select(User.id).where(User.email == "bench@bench.local"))
+        conn.execute(insert(Product), [
+            {"user_id": user_id, "name": f"Item {n}", "price": 100.0, "stock": 10**7} for n in range(1, 201)
+        ])
+        product_ids = conn.scalars(select(Product.id).where(Product.user_id == user_id)).all()
+        conn.execute(insert(LiveSession), [{"user_id": user_id, "title": "Bench"}])
+        session_id = conn.scalar(select(LiveSession.id).where(LiveSession.user_id == user_id))
+    rng = random.Random(7)
+    statuses = ["PAID"] * 7 + ["PENDING"] * 2 + ["CANCELLED"]
+    for start in range(0, args.orders, 20_000):
+        with engine.begin() as conn:
+            conn.execute(insert(Order), [
+                {"user_id": user_id, "session_id": session_id, "product_id": rng.choice(product_ids),
+                 "customer_name": f"Buyer {rng.randrange(50_000)}", "qty": rng.randint(1, 3),
+                 "status": rng.choice(statuses)}
+                for _ in range(start, min(args.orders, start + 20_000))
+            ])
+
+    from app.main import app
+    result = {}
+    for name, slow_paths in (("idle", []), ("loaded", args.slow)):
+        latencies, slow = asyncio.run(measure(app, args, product_ids, slow_paths))
+        result[name] = {
+            "n": len(latencies),
+            "p50_ms": statistics.median(latencies) * 1000,
+            "p99_ms": percentile(latencies, 99) * 1000,
+            "max_ms": max(latencies) * 1000,
+            "slow": len(slow),
+        }
+    print(json.dumps(result))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Order latency while slow requests run, per git revision.")
+    parser.add_argument("--refs", nargs="+", default=["HEAD"])
+    parser.add_argument("--orders", type=int, default=200_000, help="orders already in the table")
+    parser.add_argument("--seconds", type=float, default=15, help="per phase")
+    parser.add_argument("--interval", type=float, default=50, help="ms between new orders")
+    parser.add_argument("--slow", nargs="+", default=["/summary/export.csv", "/summary"],
+                        help="paths requested back to back during the loaded phase")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args)
+        return
+    from benchmarks.common import run_in_worktree, short_rev
+
+    print(f"POST /live/order/add every {args.interval:g} ms for {args.seconds:g}s, {args.orders:,} orders in the table;"
+          f" loaded = {' and '.join(args.slow)} requested back to back")
+    for ref in args.refs:
+        r = run_in_worktree(ref, __file__, [
+            "--orders", args.orders, "--seconds", args.seconds, "--interval", args.interval, "--slow", *args.slow,
+        ])
+        for phase in ("idle", "loaded"):
+            p = r[phase]
+            slow = f"  ({p['slow']} slow requests done)" if phase == "loaded" else ""
+            print(f"  {ref:<10} {short_rev(ref)} {phase:<6} n={p['n']:<4} p50 {p['p50_ms']:8.1f} ms"
+                  f"  p99 {p['p99_ms']:8.1f} ms  max {p['max_ms']:8.1f} ms{slow}")
+
+
+if __name__ == "__main__":
+    main()
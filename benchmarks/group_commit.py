@@ -0,0 +1,81 @@
+import argparse
+import os
+import statistics
+import tempfile
+import threading
+import time
+from pathlib import Path
+from benchmarks.common import configure_env, percentile
+
+#-----------Group commit ----------#
+# Committed orders/s and acknowledgement latency from concurrent writers,
+# committing one order per transaction and through GroupCommitter with a
+# few batch windows, on the app's own engine and SQLite pragmas.
+#
+#   python -m benchmarks.group_commit [--seconds 3] [--writers 16]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Order throughput with and without group commit.")
+    parser.add_argument("--seconds", type=float, default=3, help="per window")
+    parser.add_argument("--writers", type=int, default=16)
+    parser.add_argument("--windows", type=float, nargs="+", default=[0, 1, 2, 5, 10], help="ms; 0 = off")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ.setdefault("DB_POOL_SIZE", str(args.writers + 1))
+        configure_env(Path(tmp) / "bench.db")
+        from app.models import init_db, SessionLocal, User, Product, LiveSession
+        from app.orders import place_order
+        from app.writequeue import GroupCommitter
+
+        init_db()
+        with SessionLocal() as db:
+            user = User(full_name="Bench", email="bench@bench.local", password_hash="x")
+            db.add(user)
+            db.flush()
+            product = Product(name="Item", price=100, stock=10**9, user_id=user.id)
+            session = LiveSession(title="Bench", user_id=user.id)
+            db.add_all([product, session])
+            db.commit()
+            user_id, session_id, product_id = user.id, session.id, product.id
+
+        print(f"{args.writers} concurrent writers, {args.seconds:g}s per window")
+        for window in args.windows:
+            committer = GroupCommitter(window) if window else None
+            latencies = []
+            stop = time.monotonic() + args.seconds
+
+            def writer(n):
+                db = SessionLocal()
+                op = lambda s: place_order(s, user_id, session_id, f"Buyer {n}", product_id, 1)
+                try:
+                    while time.monotonic() < stop:
+                        start = time.perf_counter()
+                        if committer is None:
+                            op(db)
+                            db.commit()
+                        else:
+                            committer.submit(op)
+                        latencies.append(time.perf_counter() - start)
+                finally:
+                    db.close()
+
+            threads = [threading.Thread(target=writer, args=(n,)) for n in range(args.writers)]
+            started = time.monotonic()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            elapsed = time.monotonic() - started
+            latencies.sort()
+            label = f"{window:g} ms" if window else "off"
+            print(
+                f"  window {label:<6} {len(latencies) / elapsed:7,.0f} orders/s"
+                f"  ack p50 {statistics.median(latencies) * 1000:6.2f} ms"
+                f"  p99 {percentile(latencies, 99) * 1000:6.2f} ms"
+            )
+
+
+if __name__ == "__main__":
+    main()
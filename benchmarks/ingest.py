@@ -0,0 +1,60 @@
+import argparse
+import asyncio
+import json
+import random
+import tempfile
+from pathlib import Path
+from benchmarks.common import configure_env
+
+#-----------Chat comment ingestion ----------#
+# Replays a synthetic chat log (40% "mine <code> x<qty>" claims, the rest
+# chatter) through the comment ingestor at a few batch sizes, on a scratch
+# database.
+#
+#   python -m benchmarks.ingest [--comments 20000] [--products 50]
+
+CHATTER = ["hello po", "how much?", "pa-mine po", "ang ganda!", "size?", "next item pls", "ship to cebu?"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Comment ingestion throughput.")
+    parser.add_argument("--comments", type=int, default=20_000)
+    parser.add_argument("--products", type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        configure_env(Path(tmp) / "bench.db")
+        from app.models import init_db, SessionLocal, User, Product
+        from app.ingest import INGEST_BATCH, replay, print_replay
+
+        init_db()
+        with SessionLocal() as db:
+            user = User(full_name="Bench", email="bench@bench.local", password_hash="x")
+            db.add(user)
+            db.flush()
+            db.add_all([
+                Product(name=f"Item {n}", code=f"A{n}", price=100 + n, stock=args.comments, user_id=user.id)
+                for n in range(1, args.products + 1)
+            ])
+            db.commit()
+            user_id = user.id
+
+        rng = random.Random(7)
+        log = Path(tmp) / "comments.jsonl"
+        with log.open("w", encoding="utf-8") as f:
+            for _ in range(args.comments):
+                name = f"Buyer {rng.randrange(args.comments // 10 or 1)}"
+                if rng.random() < 0.4:
+                    text = f"mine A{rng.randint(1, args.products)} x{rng.randint(1, 3)}"
+                else:
+                    text = rng.choice(CHATTER)
+                f.write(json.dumps({"name": name, "text": text}) + "\n")
+
+        print(f"{args.comments} comments, {args.products} products")
+        for batch in (1, 50, INGEST_BATCH):
+            print(f"batch {batch}:")
+            print_replay(*asyncio.run(replay(str(log), user_id, batch)))
+
+
+if __name__ == "__main__":
+    main()
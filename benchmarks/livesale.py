@@ -0,0 +1,490 @@
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from pathlib import Path
+from benchmarks.common import ROOT, configure_env, percentile
+
+#-----------Live-sale benchmark ----------#
+# Seeds a SQLite database with sellers, products, customers, past sessions
+# and (by default) a million orders, then drives the real app in-process
+# through httpx's ASGI transport with scripted live-sale scenarios. Prints
+# throughput and p50/p99 per route and saves the numbers as JSON under
+# benchmarks/results/ so two runs (two commits, two settings) can be put
+# side by side with --compare.
+#
+# The seeded database is cached in the temp dir under a name made of the
+# seed parameters (or at --db, checked against the parameters stored next
+# to it) and every run works on a fresh copy of it, so runs start from the
+# same data.
+#
+#   python -m benchmarks.livesale                    # seed (once) + run
+#   python -m benchmarks.livesale --orders 200000 --scale 0.2
+#   python -m benchmarks.livesale --compare latest
+#   SQLITE_PROFILE=default python -m benchmarks.livesale --scenarios mixed_read_write
+#   python -m benchmarks.livesale --scenarios mixed_read_write --compare latest
+
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+BENCH_PASSWORD = "bench-password"
+
+FIRST_NAMES = ["Maria", "Ana", "Jose", "Juan", "Mark", "Angel", "Kristine", "Joy", "Rose", "John",
+               "Michael", "Grace", "Lovely", "Paolo", "Carla", "Jessa", "Ramon", "Liza", "Ella", "Ben"]
+LAST_NAMES = ["Santos", "Reyes", "Cruz", "Bautista", "Garcia", "Mendoza", "Torres", "Tuyco", "Riano",
+              "Villanueva", "Ramos", "Aquino", "Castillo", "Flores", "Dela Cruz", "Navarro", "Lim", "Tan"]
+
+
+#-----------Seeding ----------#
+
+SEED_PARAMS = ("orders", "sellers", "products", "days", "orders_per_session", "seed")
+
+
+def seed_params(args) -> dict:
+    return {name: getattr(args, name) for name in SEED_PARAMS}
+
+
+def default_db(args) -> Path:
+    name = "-".join(str(value) for value in seed_params(args).values())
+    return Path(tempfile.gettempdir()) / f"livesell_bench_{name}.db"
+
+
+def params_file(db: Path) -> Path:
+    return db.with_name(db.name + ".json")
+
+
+def seed(args):
+    from sqlalchemy import insert
+    from app.models import (
+        engine, init_db, SessionLocal, pwd_context, User, Product, LiveSession, Customer, Order,
+    )
+    from app.customers import normalize_name
+    from app.rollups import load_summary
+
+    rng = random.Random(args.seed)
+    init_db()
+    started = time.perf_counter()
+    password_hash = pwd_context.hash(BENCH_PASSWORD)
+    now = datetime.utcnow().replace(microsecond=0)
+    first_day = now - timedelta(days=args.days)
+
+    with engine.begin() as conn:
+        conn.execute(insert(User), [
+            {"full_name": f"Seller {n}", "email": f"seller{n}@bench.local", "password_hash": password_hash}
+            for n in range(1, args.sellers + 1)
+        ])
+    db = SessionLocal()
+    sellers = [u.id for u in db.query(User.id).order_by(User.id)]
+    db.close()
+
+    # seller 1 (the one the scenarios log in as) gets half of all orders
+    shares = [0.5] + [0.5 / (len(sellers) - 1)] * (len(sellers) - 1) if len(sellers) > 1 else [1.0]
+    for seller_id, share in zip(sellers, shares):
+        orders = int(args.orders * share)
+        sessions = max(1, orders // args.orders_per_session)
+        customers = max(10, orders // 20)
+
+        with engine.begin() as conn:
+            conn.execute(insert(Product), [
+                {"user_id": seller_id, "name": f"Item {n}", "code": f"P{n}",
+                 "price": float(rng.randrange(50, 2000)), "stock": 10**7}
+                for n in range(1, args.products + 1)
+            ])
+            names = {}
+            while len(names) < customers:
+                name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)} {rng.randrange(100_000)}"
+                names.setdefault(normalize_name(name), name)
+            conn.execute(insert(Customer), [
+                {"user_id": seller_id, "name": name, "normalized_name": key} for key, name in names.items()
+            ])
+            # sessions spread over the last `days` days; the newest stays live
+            starts = sorted(first_day + timedelta(seconds=rng.randrange(args.days * 86400)) for _ in range(sessions))
+            conn.execute(insert(LiveSession), [
+                {"user_id": seller_id, "title": f"Live {n}", "started_at": start,
+                 "ended_at": None if n == sessions else start + timedelta(hours=2)}
+                for n, start in enumerate(starts, 1)
+            ])
+
+        db = SessionLocal()
+        product_ids = [p.id for p in db.query(Product.id).filter(Product.user_id == seller_id)]
+        customer_rows = db.query(Customer.id, Customer.name).filter(Customer.user_id == seller_id).all()
+        session_rows = db.query(LiveSession.id, LiveSession.started_at).filter(LiveSession.user_id == seller_id).all()
+        db.close()
+
+        statuses = ["PAID"] * 7 + ["PENDING"] * 2 + ["CANCELLED"]
+        batch = []
+        for n in range(orders):
+            session_id, session_start = session_rows[n * len(session_rows) // orders]
+            customer_id, customer_name = rng.choice(customer_rows)
+            batch.append({
+                "user_id": seller_id, "session_id": session_id, "product_id": rng.choice(product_ids),
+                "customer_id": customer_id, "customer_name": customer_name, "qty": rng.randint(1, 3),
+                "status": rng.choice(statuses),
+                "created_at": session_start + timedelta(seconds=rng.randrange(7200)),
+            })
+            if len(batch) == 20_000:
+                with engine.begin() as conn:
+                    conn.execute(insert(Order), batch)
+                batch = []
+        if batch:
+            with engine.begin() as conn:
+                conn.execute(insert(Order), batch)
+
+        db = SessionLocal()
+        load_summary(db, seller_id)
+        db.close()
+        print(f"  seller {seller_id}: {orders} orders, {sessions} sessions, {customers} customers", flush=True)
+
+    with engine.begin() as conn:
+        conn.exec_driver_sql("ANALYZE")
+    engine.dispose()
+    params_file(Path(args.db)).write_text(json.dumps(seed_params(args)))
+    print(f"seeded in {time.perf_counter() - started:.1f}s")
+
+
+#-----------Scenarios ----------#
+
+class Recorder:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    async def call(self, client, route: str, method: str, url: str, **kwargs):
+        start = time.perf_counter()
+        response = await client.request(method, url, **kwargs)
+        self.latencies[route].append(time.perf_counter() - start)
+        if response.status_code >= 400:
+            self.errors[route] += 1
+        return response
+
+    def report(self, seconds: float) -> dict:
+        routes = {}
+        for route, samples in self.latencies.items():
+            samples = sorted(samples)
+            routes[route] = {
+                "n": len(samples),
+                "errors": self.errors[route],
+                "rps": len(samples) / seconds if seconds else 0,
+                "p50_ms": statistics.median(samples) * 1000,
+                "p99_ms": percentile(samples, 99) * 1000,
+                "max_ms": samples[-1] * 1000,
+            }
+        return routes
+
+
+async def gather_limited(concurrency: int, coros):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def limited(coro):
+        async with semaphore:
+            return await coro
+
+    return await asyncio.gather(*(limited(c) for c in coros))
+
+
+def scaled(n: int, args) -> int:
+    return max(1, int(n * args.scale))
+
+
+async def order_burst(client, rec, ctx, args):
+    # buyers claiming items as fast as the seller can type them
+    rng = ctx["rng"]
+    await gather_limited(args.concurrency, [
+        rec.call(client, "POST /live/order/add", "POST", "/live/order/add", data={
+            "customer_name": rng.choice(ctx["customers"]) if rng.random() < 0.7 else f"New Buyer {rng.randrange(10**6)}",
+            "product_id": str(rng.choice(ctx["products"])),
+            "qty": str(rng.randint(1, 3)),
+        })
+        for _ in range(scaled(500, args))
+    ])
+
+
+async def bulk_paste(client, rec, ctx, args):
+    rng = ctx["rng"]
+    await gather_limited(4, [
+        rec.call(client, "POST /live/orders/bulk", "POST", "/live/orders/bulk", json={"orders": [
+            {"customer_name": rng.choice(ctx["customers"]), "product_id": rng.choice(ctx["products"]), "qty": 1}
+            for _ in range(50)
+        ]})
+        for _ in range(scaled(20, args))
+    ])
+
+
+async def comment_stream(client, rec, ctx, args):
+    # chat webhook; timed until the ingestion queue has drained
+    from app.ingest import comment_ingestor
+    rng = ctx["rng"]
+    chatter = ["hello po", "how much?", "ang ganda!", "size?", "next item pls"]
+    for _ in range(scaled(50, args)):
+        comments = [
+            {"name": rng.choice(ctx["customers"]),
+             "text": f"mine P{rng.randint(1, args.products)} x{rng.randint(1, 2)}" if rng.random() < 0.4 else rng.choice(chatter)}
+            for _ in range(100)
+        ]
+        while comments:
+            response = await rec.call(client, "POST /live/comments", "POST", "/live/comments", json={"comments": comments})
+            comments = comments[response.json().get("accepted", len(comments)):]
+            if comments:
+                await asyncio.sleep(0.05)
+    await comment_ingestor.queue.join()
+
+
+async def mark_paid_wave(client, rec, ctx, args):
+    # the seller ticking off payments for the live's pending orders
+    from app.models import SessionLocal, Order
+    db = SessionLocal()
+    pending = [
+        order_id for (order_id,) in db.query(Order.id)
+        .filter(Order.user_id == ctx["user_id"], Order.session_id == ctx["session_id"], Order.status == "PENDING")
+        .order_by(Order.id)
+        .limit(scaled(500, args))
+    ]
+    db.close()
+    rng = ctx["rng"]
+    await gather_limited(args.concurrency, [
+        rec.call(client, "POST /live/order/{id}/status", "POST", f"/live/order/{order_id}/status",
+                 data={"status": "PAID" if rng.random() < 0.9 else "CANCELLED"})
+        for order_id in pending
+    ])
+
+
+async def live_refresh(client, rec, ctx, args):
+    calls = []
+    for _ in range(scaled(100, args)):
+        calls.append(rec.call(client, "GET /live", "GET", "/live"))
+        calls.append(rec.call(client, "GET /live/orders.json", "GET", "/live/orders.json"))
+        calls.append(rec.call(client, "GET /live/customers/search", "GET", "/live/customers/search",
+                              params={"q": ctx["rng"].choice(ctx["customers"])[:4]}))
+    await gather_limited(args.concurrency, calls)
+
+
+async def summary_refresh(client, rec, ctx, args):
+    calls = []
+    for _ in range(scaled(50, args)):
+        calls.append(rec.call(client, "GET /summary", "GET", "/summary"))
+        calls.append(rec.call(client, "GET /summary/revenue.json", "GET", "/summary/revenue.json", params={"bucket": "week"}))
+        calls.append(rec.call(client, "GET /summary/top-products.json", "GET", "/summary/top-products.json", params={"by": "revenue"}))
+        calls.append(rec.call(client, "GET /checkout/{id}", "GET", f"/checkout/{ctx['session_id']}"))
+    await gather_limited(5, calls)
+
+
+async def summary_rebuild(client, rec, ctx, args):
+    # a price edit drops the rollups; the next /summary rebuilds them
+    product_id = ctx["products"][0]
+    for n in range(3):
+        await client.post(f"/inventory/{product_id}/edit", data={"name": "Item 1", "price": str(100 + n), "stock": "10000000", "code": "P1"})
+        await rec.call(client, "GET /summary (rebuild)", "GET", "/summary")
+
+
+async def csv_exports(client, rec, ctx, args):
+    await rec.call(client, "GET /summary/export.csv (all)", "GET", "/summary/export.csv")
+    for session_id in ctx["past_sessions"][:scaled(10, args)]:
+        await rec.call(client, "GET /summary/export.csv (session)", "GET", "/summary/export.csv", params={"session_id": session_id})
+        await rec.call(client, "GET /checkout/{id}/invoices.csv", "GET", f"/checkout/{session_id}/invoices.csv")
+
+
+async def mixed_read_write(client, rec, ctx, args):
+    # orders and mark-paid writes while pages and summaries are being read:
+    # the case SQLITE_PROFILE (rollback journal vs WAL) is about
+    await asyncio.gather(
+        order_burst(client, rec, ctx, args),
+        mark_paid_wave(client, rec, ctx, args),
+        live_refresh(client, rec, ctx, args),
+        summary_refresh(client, rec, ctx, args),
+    )
+
+
+SCENARIOS = {
+    "order_burst": order_burst,
+    "bulk_paste": bulk_paste,
+    "comment_stream": comment_stream,
+    "mark_paid_wave": mark_paid_wave,
+    "live_refresh": live_refresh,
+    "summary_refresh": summary_refresh,
+    "summary_rebuild": summary_rebuild,
+    "csv_exports": csv_exports,
+    "mixed_read_write": mixed_read_write,
+}
+
+
+async def drive(args) -> dict:
+    import httpx
+    from app.main import app
+    from app.models import SessionLocal, User, Product, Customer, LiveSession
+    from app.ingest import comment_ingestor
+    from app.models import init_db
+    from app.archive import archive_ended
+
+    # the ASGI transport skips lifespan; migrate the copy like startup would
+    init_db()
+    if args.archive is not None:
+        start = time.perf_counter()
+        sessions, moved = archive_ended(args.archive)
+        print(f"archived {moved} orders of {sessions} sessions in {time.perf_counter() - start:.1f}s")
+
+    db = SessionLocal()
+    user_id = db.query(User.id).filter(User.email == "seller1@bench.local").scalar()
+    sessions = [s.id for s in db.query(LiveSession.id).filter(LiveSession.user_id == user_id).order_by(LiveSession.id.desc())]
+    ctx = {
+        "rng": random.Random(args.seed),
+        "user_id": user_id,
+        "session_id": sessions[0],
+        "past_sessions": sessions[1:],
+        "products": [p.id for p in db.query(Product.id).filter(Product.user_id == user_id)],
+        "customers": [c.name for c in db.query(Customer.name).filter(Customer.user_id == user_id).limit(5000)],
+    }
+    db.close()
+
+    comment_ingestor.start()
+    results = {}
+    # a handler that fails (lock or pool timeout under load) is counted as
+    # an error like any 500; re-raised, it would abort the whole run
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=600) as client:
+        response = await client.post("/login", data={"email": "seller1@bench.local", "password": BENCH_PASSWORD})
+        if response.headers.get("location") != "/":
+            raise SystemExit("login failed")
+        for name in args.scenarios:
+            rec = Recorder()
+            start = time.perf_counter()
+            await SCENARIOS[name](client, rec, ctx, args)
+            seconds = time.perf_counter() - start
+            results[name] = {"seconds": seconds, "routes": rec.report(seconds)}
+            print_scenario(name, results[name])
+    await comment_ingestor.stop()
+    return results
+
+
+#-----------Reporting ----------#
+
+def print_scenario(name: str, result: dict):
+    print(f"\n{name} ({result['seconds']:.2f}s)")
+    for route, r in result["routes"].items():
+        errors = f"  {r['errors']} errors" if r["errors"] else ""
+        print(f"  {route:<36} n={r['n']:<5} {r['rps']:8.1f} req/s  p50 {r['p50_ms']:8.2f} ms  p99 {r['p99_ms']:8.2f} ms{errors}")
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def save_results(args, seeded: dict, results: dict) -> Path:
+    RESULTS_DIR.mkdir(exist_ok=True)
+    revision = git_revision()
+    path = RESULTS_DIR / f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{revision}.json"
+    meta = {
+        "revision": revision,
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        # what the database was seeded with, read back from it
+        **seeded,
+        "scale": args.scale,
+        "concurrency": args.concurrency,
+        "archive_days": args.archive,
+        "env": {k: os.environ[k] for k in ("SQLITE_PROFILE", "WRITE_BATCH_MS", "CACHE_BACKEND") if k in os.environ},
+    }
+    path.write_text(json.dumps({"meta": meta, "scenarios": results}, indent=2))
+    return path
+
+
+def load_results(name: str) -> dict:
+    if name == "latest":
+        runs = sorted(RESULTS_DIR.glob("*.json"))
+        if not runs:
+            raise SystemExit("no saved runs in benchmarks/results")
+        name = str(runs[-1])
+    return json.loads(Path(name).read_text())
+
+
+def print_comparison(base: dict, results: dict):
+    print(f"\nvs {base['meta']['revision']} ({base['meta']['created']}), p50 / p99 change:")
+    for name, result in results.items():
+        for route, r in result["routes"].items():
+            old = base["scenarios"].get(name, {}).get("routes", {}).get(route)
+            if not old:
+                continue
+            p50 = (r["p50_ms"] - old["p50_ms"]) / old["p50_ms"] * 100 if old["p50_ms"] else 0
+            p99 = (r["p99_ms"] - old["p99_ms"]) / old["p99_ms"] * 100 if old["p99_ms"] else 0
+            print(f"  {name:<16} {route:<36} {p50:+7.1f}% / {p99:+7.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Seed a database and benchmark live-sale scenarios.")
+    parser.add_argument("--db", help="seeded database to (re)use; seeded when missing"
+                        " (default: one per seed parameters in the temp dir)")
+    parser.add_argument("--reseed", action="store_true", help="seed again even if --db exists")
+    parser.add_argument("--orders", type=int, default=1_000_000)
+    parser.add_argument("--sellers", type=int, default=5)
+    parser.add_argument("--products", type=int, default=200)
+    parser.add_argument("--days", type=int, default=180)
+    parser.add_argument("--orders-per-session", type=int, default=2000)
+    parser.add_argument("--scale", type=float, default=1.0, help="multiplies the requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--archive", type=int, metavar="DAYS",
+                        help="archive sessions ended more than DAYS ago before the run")
+    parser.add_argument("--scenarios", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument("--compare", help="saved run to compare with (a path or 'latest')")
+    parser.add_argument("--no-save", action="store_true")
+    parser.add_argument("--seed-only", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    args.db = args.db or str(default_db(args))
+
+    if args.seed_only:
+        configure_env(Path(args.db))
+        seed(args)
+        return
+
+    base = load_results(args.compare) if args.compare else None
+    seeded = Path(args.db)
+    if args.reseed or not seeded.exists():
+        seeded.unlink(missing_ok=True)
+        params_file(seeded).unlink(missing_ok=True)
+        print(f"seeding {seeded} with {args.orders} orders...", flush=True)
+        # in a child process, so this one imports the app against the copy
+        subprocess.run(
+            [sys.executable, "-m", "benchmarks.livesale", *sys.argv[1:], "--db", str(seeded), "--seed-only"],
+            cwd=ROOT, check=True,
+        )
+    stored = params_file(seeded)
+    seeded_with = json.loads(stored.read_text()) if stored.exists() else None
+    if seeded_with != seed_params(args):
+        raise SystemExit(
+            f"{seeded} was seeded with {seeded_with or 'unknown parameters'}, not {seed_params(args)};"
+            " pass --reseed or another --db"
+        )
+
+    with tempfile.TemporaryDirectory() as tmp:
+        work = Path(tmp) / "bench.db"
+        shutil.copyfile(seeded, work)
+        if os.getenv("SQLITE_PROFILE") == "default":
+            # WAL is stored in the file; the default profile gets a rollback journal
+            conn = sqlite3.connect(work)
+            conn.execute("PRAGMA journal_mode=DELETE")
+            conn.close()
+        configure_env(work)
+        results = asyncio.run(drive(args))
+
+    if not args.no_save:
+        print(f"\nsaved {save_results(args, seeded_with, results)}")
+    if base:
+        print_comparison(base, results)
+
+
+if __name__ == "__main__":
+    main()
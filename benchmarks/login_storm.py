@@ -0,0 +1,104 @@
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from pathlib import Path
+from benchmarks.common import configure_env, latency_line
+
+#-----------Login storm ----------#
+# A seller's open /live pages keep refreshing while hundreds of buyers log in
+# at once (real bcrypt rounds). Prints /live latency with no logins, during
+# the storm with bcrypt on its pool (app.passwords), and during the storm
+# with bcrypt called on the event loop, the way login worked before.
+#
+#   python -m benchmarks.login_storm [--logins 200] [--rounds 12]
+
+PASSWORD = "bench-password"
+
+
+async def viewer(client, stop: float, latencies: list):
+    while time.monotonic() < stop:
+        start = time.perf_counter()
+        response = await client.get("/live")
+        latencies.append(time.perf_counter() - start)
+        assert response.status_code == 200, response.status_code
+
+
+async def storm(client, emails: list, concurrency: int, logins: list):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def login(email):
+        async with semaphore:
+            start = time.perf_counter()
+            response = await client.post("/login", data={"email": email, "password": PASSWORD})
+            logins.append(time.perf_counter() - start)
+            assert response.status_code == 302, response.status_code
+
+    await asyncio.gather(*(login(e) for e in emails))
+
+
+async def phase(app, emails: list, args) -> tuple:
+    import httpx
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as seller, \
+            httpx.AsyncClient(transport=transport, base_url="http://bench") as buyers:
+        await seller.post("/login", data={"email": "seller@bench.local", "password": PASSWORD})
+        live, logins = [], []
+        start = time.perf_counter()
+        if emails:
+            stop = float("inf")
+            viewers = [asyncio.create_task(viewer(seller, stop, live)) for _ in range(args.viewers)]
+            await storm(buyers, emails, args.concurrency, logins)
+            # stop the viewers with the storm
+            for task in viewers:
+                task.cancel()
+            await asyncio.gather(*viewers, return_exceptions=True)
+        else:
+            stop = time.monotonic() + args.seconds
+            await asyncio.gather(*(viewer(seller, stop, live) for _ in range(args.viewers)))
+        return live, logins, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="/live latency during a burst of logins.")
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=100, help="logins in flight at once")
+    parser.add_argument("--viewers", type=int, default=4, help="open /live pages refreshing in a loop")
+    parser.add_argument("--seconds", type=float, default=5, help="length of the no-login baseline")
+    parser.add_argument("--rounds", type=int, default=12, help="BCRYPT_ROUNDS (the app default is 12)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["BCRYPT_ROUNDS"] = str(args.rounds)
+        configure_env(Path(tmp) / "bench.db")
+        from sqlalchemy import insert
+        from app.main import app
+        from app.models import engine, init_db, pwd_context, User
+        from app.routes import auth
+        from app import passwords
+
+        init_db()
+        # one hash for every account; each login still verifies it in full
+        password_hash = pwd_context.hash(PASSWORD)
+        emails = [f"buyer{n}@bench.local" for n in range(args.logins)]
+        with engine.begin() as conn:
+            conn.execute(insert(User), [
+                {"full_name": "Bench", "email": email, "password_hash": password_hash}
+                for email in ["seller@bench.local"] + emails
+            ])
+
+        async def inline_verify(password, password_hash):
+            return passwords._verify(password, password_hash)
+
+        print(f"{args.viewers} /live pages, {args.logins} logins ({args.concurrency} at once), bcrypt rounds {args.rounds}")
+        live, _, _ = asyncio.run(phase(app, [], args))
+        print(f"  no logins              /live {latency_line(live)}")
+        for name, verify in (("bcrypt pool", passwords.verify_password), ("bcrypt on event loop", inline_verify)):
+            auth.verify_password = verify
+            live, logins, elapsed = asyncio.run(phase(app, emails, args))
+            print(f"  {name:<22} /live {latency_line(live)}   {len(logins) / elapsed:5.1f} logins/s")
+
+
+if __name__ == "__main__":
+    main()
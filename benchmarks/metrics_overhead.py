@@ -0,0 +1,153 @@
+import argparse
+import asyncio
+import statistics
+import tempfile
+import time
+from pathlib import Path
+from benchmarks.common import configure_env, register, add_product
+
+#-----------Metrics overhead ----------#
+# What app.metrics adds to a request: the middleware around a do-nothing
+# ASGI app, the cursor listeners per SQL statement and the timed Jinja
+# template per render, each measured with and without instrumentation.
+# The per-request cost is then put next to real /live, /inventory and
+# /summary requests, using the statements and renders each one does.
+#
+#   python -m benchmarks.metrics_overhead [--n 20000]
+
+
+def per_call(fn, n: int) -> float:
+    # best of 5 runs, in microseconds per call
+    runs = []
+    for _ in range(5):
+        start = time.perf_counter()
+        fn(n)
+        runs.append((time.perf_counter() - start) / n * 1e6)
+    return min(runs)
+
+
+def middleware_cost(n: int) -> tuple:
+    from app.metrics import MetricsMiddleware
+
+    async def plain(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"ok"})
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def send(message):
+        pass
+
+    def run(app):
+        async def loop(count):
+            for _ in range(count):
+                scope = {"type": "http", "method": "GET", "path": "/bench", "headers": []}
+                await app(scope, receive, send)
+        return lambda count: asyncio.run(loop(count))
+
+    return per_call(run(plain), n), per_call(run(MetricsMiddleware(plain)), n)
+
+
+def query_cost(tmp: Path, n: int) -> tuple:
+    from sqlalchemy import create_engine, text
+    from app.metrics import instrument_engine
+
+    def run(engine):
+        def go(count):
+            with engine.connect() as conn:
+                for _ in range(count):
+                    conn.execute(text("SELECT 1"))
+        return go
+
+    plain = create_engine(f"sqlite:///{tmp / 'plain.db'}")
+    timed = create_engine(f"sqlite:///{tmp / 'timed.db'}")
+    instrument_engine(timed)
+    return per_call(run(plain), n), per_call(run(timed), n)
+
+
+def template_cost(n: int) -> tuple:
+    from jinja2 import Environment
+    from app.metrics import instrument_templates
+
+    class Templates:
+        env = Environment()
+
+    source = "{% for row in rows %}<tr><td>{{ row }}</td></tr>{% endfor %}"
+    plain = Environment().from_string(source)
+    timed = instrument_templates(Templates()).env.from_string(source)
+    rows = list(range(50))
+
+    def run(template):
+        def go(count):
+            for _ in range(count):
+                template.render(rows=rows)
+        return go
+
+    return per_call(run(plain), n), per_call(run(timed), n)
+
+
+def page_costs(paths, repeat: int) -> list:
+    # median time of each page and the statements / renders it does per request
+    from fastapi.testclient import TestClient
+    from app.main import app
+    from app.models import init_db
+    from app.metrics import REQUEST_QUERIES, TEMPLATE_SECONDS
+
+    def counts(path):
+        series = REQUEST_QUERIES._values.get((path,))
+        renders = sum(sum(s[:-1]) for s in TEMPLATE_SECONDS._values.values())
+        return (series[-1] if series else 0), renders
+
+    init_db()
+    client = TestClient(app)
+    user_id = register(client, "metrics@bench.local")
+    add_product(user_id)
+    costs = []
+    for path in paths:
+        client.get(path)
+        queries_before, renders_before = counts(path)
+        samples = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            client.get(path)
+            samples.append(time.perf_counter() - start)
+        queries, renders = counts(path)
+        costs.append((
+            path,
+            statistics.median(samples) * 1e6,
+            (queries - queries_before) / repeat,
+            (renders - renders_before) / repeat,
+        ))
+    return costs
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-request cost of the metrics instrumentation.")
+    parser.add_argument("--n", type=int, default=20_000, help="calls per measurement")
+    parser.add_argument("--repeat", type=int, default=200, help="requests per page")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        configure_env(Path(tmp) / "bench.db")
+        rows = [
+            ("middleware, per request", *middleware_cost(args.n)),
+            ("SQL listeners, per statement", *query_cost(Path(tmp), args.n)),
+            ("timed template, per render", *template_cost(args.n)),
+        ]
+        pages = page_costs(["/live", "/inventory", "/summary"], args.repeat)
+
+    print(f"{'':30} {'plain':>9} {'metrics':>9} {'added':>8}  (us)")
+    added = {}
+    for name, plain, timed in rows:
+        added[name] = timed - plain
+        print(f"{name:30} {plain:9.2f} {timed:9.2f} {timed - plain:8.2f}")
+    middleware, query, template = added.values()
+    print()
+    for path, page_us, queries, renders in pages:
+        total = middleware + queries * query + renders * template
+        print(f"GET {path:<11} median {page_us:7,.0f} us, {queries:4.1f} statements, {renders:3.1f} renders:"
+              f"  metrics add ~{total:5.1f} us ({total / page_us * 100:.2f}%)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+import argparse
+import statistics
+import tempfile
+import time
+from pathlib import Path
+from benchmarks.common import configure_env, register
+
+#-----------Page render time vs table size ----------#
+# One seller's live session and inventory are grown step by step (10x each
+# time) and the paginated pages are timed at every size, on the newest page
+# and on a page from the middle of the table (?before=<middle id>). With
+# keyset pagination the times should not grow with the row count. /live
+# also lists every product in its order form <select>, so pass --products
+# to keep that fixed when looking at the order pages.
+#
+#   python -m benchmarks.page_depth [--sizes 1000 10000 100000 1000000] [--products 200]
+
+
+def timed(client, url: str, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        response = client.get(url)
+        samples.append(time.perf_counter() - start)
+        assert response.status_code == 200, (url, response.status_code)
+    return statistics.median(samples) * 1000
+
+
+def grow(user_id: int, session_id: int, orders: int, products: int):
+    # top the tables up to the given sizes
+    from sqlalchemy import func, insert
+    from app.models import engine, Order, Product
+
+    with engine.begin() as conn:
+        have = conn.scalar(func.count(Product.id).select().where(Product.user_id == user_id))
+        if products > have:
+            conn.execute(insert(Product), [
+                {"user_id": user_id, "name": f"Item {n}", "price": 100.0, "stock": 10**6}
+                for n in range(have, products)
+            ])
+        product_id = conn.scalar(func.min(Product.id).select().where(Product.user_id == user_id))
+        have = conn.scalar(func.count(Order.id).select().where(Order.session_id == session_id))
+        for start in range(have, orders, 20_000):
+            conn.execute(insert(Order), [
+                {"user_id": user_id, "session_id": session_id, "product_id": product_id,
+                 "customer_name": f"Buyer {n % 5000}", "qty": 1, "status": "PENDING"}
+                for n in range(start, min(orders, start + 20_000))
+            ])
+        conn.exec_driver_sql("ANALYZE")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Paginated page render time as the tables grow.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10_000, 100_000, 1_000_000],
+                        help="orders in the live session; products are a tenth of that")
+    parser.add_argument("--products", type=int, help="fixed product count instead of a tenth of the orders")
+    parser.add_argument("--repeat", type=int, default=30)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        configure_env(Path(tmp) / "bench.db")
+        from fastapi.testclient import TestClient
+        from sqlalchemy import func
+        from app.main import app
+        from app.models import init_db, SessionLocal, Order, Product
+        from app.live_sessions import cached_active_session
+        from app.templating import bump
+
+        init_db()
+        client = TestClient(app)
+        user_id = register(client, "pages@bench.local")
+        client.get("/live")  # opens the live session
+        session_id = cached_active_session(user_id).id
+
+        print(f"median of {args.repeat} requests, ms")
+        print(f"  {'orders':>9} {'products':>9}  {'/live':>7} {'/live deep':>10} {'orders.json deep':>16}"
+              f" {'/inventory':>10} {'/inventory deep':>15} {'products.json deep':>18}")
+        for size in args.sizes:
+            products = args.products or size // 10
+            grow(user_id, session_id, size, products)
+            bump(user_id, "orders", "inventory")
+            with SessionLocal() as db:
+                order_ids = db.query(func.min(Order.id), func.max(Order.id)).filter(Order.session_id == session_id).one()
+                product_ids = db.query(func.min(Product.id), func.max(Product.id)).filter(Product.user_id == user_id).one()
+            mid_order = sum(order_ids) // 2
+            mid_product = sum(product_ids) // 2
+            row = [
+                timed(client, "/live", args.repeat),
+                timed(client, f"/live?before={mid_order}", args.repeat),
+                timed(client, f"/live/orders.json?before={mid_order}", args.repeat),
+                timed(client, "/inventory", args.repeat),
+                timed(client, f"/inventory?before={mid_product}", args.repeat),
+                timed(client, f"/inventory/products.json?before={mid_product}", args.repeat),
+            ]
+            print(f"  {size:9,} {products:9,}  {row[0]:7.2f} {row[1]:10.2f} {row[2]:16.2f}"
+                  f" {row[3]:10.2f} {row[4]:15.2f} {row[5]:18.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+import argparse
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+from benchmarks.common import configure_env
+
+#-----------Stock contention ----------#
+# N concurrent clients ordering the same product until it sells out, once
+# with the old read / check / write-back in Python and once with
+# reserve_stock's single conditional UPDATE. Reports sellable orders/s
+# (orders up to the stock there was), oversold units and the final stock.
+#
+#   python -m benchmarks.stock_contention [--clients 50] [--stock 300]
+
+
+def naive_order(db, user_id, session_id, product_id, customer_name):
+    # what /live/order/add did before the reservation layer
+    from app.models import Order, Product
+    product = db.query(Product).filter(Product.id == product_id, Product.user_id == user_id).first()
+    if product is None or product.stock < 1:
+        return None
+    product.stock -= 1
+    db.add(Order(customer_name=customer_name, session_id=session_id, product_id=product_id,
+                 qty=1, status="PENDING", user_id=user_id))
+    return True
+
+
+def run_clients(mode: str, clients: int, stock: int):
+    from app.models import SessionLocal, User, Product, LiveSession, Order
+    from app.orders import place_order
+
+    with SessionLocal() as db:
+        user = User(full_name="Bench", email=f"{mode}@bench.local", password_hash="x")
+        db.add(user)
+        db.flush()
+        product = Product(user_id=user.id, name="Hot item", price=100, stock=stock)
+        session = LiveSession(user_id=user.id)
+        db.add_all([product, session])
+        db.commit()
+        ids = (user.id, session.id, product.id)
+
+    placed, errors = [0], [0]
+    lock = threading.Lock()
+    barrier = threading.Barrier(clients)
+
+    def client(n):
+        with SessionLocal() as db:
+            barrier.wait()
+            while True:
+                try:
+                    if mode == "naive":
+                        ok = naive_order(db, ids[0], ids[1], ids[2], f"Buyer {n}")
+                    else:
+                        ok = place_order(db, ids[0], ids[1], f"Buyer {n}", ids[2], 1)
+                    db.commit()
+                except Exception:
+                    # "database is locked" on the read -> write upgrade
+                    db.rollback()
+                    with lock:
+                        errors[0] += 1
+                    continue
+                if not ok:
+                    return
+                with lock:
+                    placed[0] += 1
+
+    threads = [threading.Thread(target=client, args=(n,)) for n in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    seconds = time.perf_counter() - start
+
+    with SessionLocal() as db:
+        left = db.query(Product.stock).filter(Product.id == ids[2]).scalar()
+        orders = db.query(Order).filter(Order.product_id == ids[2]).count()
+    # only `stock` of the orders can actually be shipped
+    print(f"  {mode:<8} {orders:6} orders in {seconds:6.2f}s  {min(orders, stock) / seconds:8,.1f} sellable orders/s"
+          f"  oversold {max(0, orders - stock):6}  stock left {left:4}  failed attempts {errors[0]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent orders on one product: naive vs conditional UPDATE.")
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--stock", type=int, default=300)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        configure_env(Path(tmp) / "bench.db")
+        # one connection per client, so the pool isn't what serialises them
+        os.environ.setdefault("DB_POOL_SIZE", str(args.clients))
+        from app.models import init_db
+        init_db()
+        print(f"{args.clients} clients, {args.stock} units")
+        for mode in ("naive", "reserve"):
+            run_clients(mode, args.clients, args.stock)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+import argparse
+import json
+import random
+import statistics
+import time
+from datetime import datetime, timedelta
+
+#-----------/summary across revisions ----------#
+# Times GET /summary for one seller with a million orders, on any git
+# revision: each ref is checked out into a temporary worktree, seeded with
+# the columns every revision has, and served by that revision's own app.
+# Prints the first visit (which builds the rollups where they exist) and
+# p50/p99 of the visits after it.
+#
+#   python -m benchmarks.summary --refs <commit before the rollups> HEAD
+#
+# The child half runs inside the worktree with only that tree on the path,
+# so this file imports nothing from the repo at the top
+# (benchmarks.common.run_in_worktree).
+
+PASSWORD = "bench-password"
+
+
+def child(args):
+    from sqlalchemy import func, insert, select
+    from fastapi.testclient import TestClient
+    from app.models import engine, init_db, pwd_context, User, Product, LiveSession, Order
+
+    rng = random.Random(7)
+    init_db()
+    started = time.perf_counter()
+    with engine.begin() as conn:
+        conn.execute(insert(User), [
+            {"full_name": "Bench", "email": "bench@bench.local", "password_hash": pwd_context.hash(PASSWORD)}
+        ])
+        user_id = conn.scalar(select(User.id).where(User.email == "bench@bench.local"))
+        conn.execute(insert(Product), [
+            {"user_id": user_id, "name": f"Item {n}", "price": float(rng.randrange(50, 2000)), "stock": 10**7}
+            for n in range(1, args.products + 1)
+        ])
+        sessions = max(1, args.orders // 2000)
+        first_day = datetime.utcnow() - timedelta(days=180)
+        conn.execute(insert(LiveSession), [
+            {"user_id": user_id, "title": f"Live {n}", "started_at": first_day + timedelta(days=n * 180 / sessions)}
+            for n in range(sessions)
+        ])
+        # ids as inserted, not assumed to start at 1
+        product_ids = conn.scalars(select(Product.id).where(Product.user_id == user_id)).all()
+        session_ids = conn.scalars(
+            select(LiveSession.id).where(LiveSession.user_id == user_id).order_by(LiveSession.id)
+        ).all()
+    statuses = ["PAID"] * 7 + ["PENDING"] * 2 + ["CANCELLED"]
+    for start in range(0, args.orders, 20_000):
+        with engine.begin() as conn:
+            conn.execute(insert(Order), [
+                {"user_id": user_id, "session_id": session_ids[n * sessions // args.orders],
+                 "product_id": rng.choice(product_ids), "customer_name": f"Buyer {rng.randrange(50_000)}",
+                 "qty": rng.randint(1, 3), "status": rng.choice(statuses),
+                 "created_at": first_day + timedelta(seconds=n * 180 * 86400 // args.orders)}
+                for n in range(start, min(args.orders, start + 20_000))
+            ])
+    with engine.connect() as conn:
+        owned = conn.scalar(select(func.count(Order.id)).where(Order.user_id == user_id))
+    if owned != args.orders:
+        raise SystemExit(f"bench seller owns {owned} orders, expected {args.orders}")
+    seeded = time.perf_counter() - started
+
+    from app.main import app
+    client = TestClient(app)
+    response = client.post("/login", data={"email": "bench@bench.local", "password": PASSWORD}, follow_redirects=False)
+    assert response.status_code in (302, 303), response.status_code
+
+    def visit():
+        start = time.perf_counter()
+        response = client.get("/summary")
+        assert response.status_code == 200, response.status_code
+        return time.perf_counter() - start
+
+    first = visit()
+    # the page must be counting the seeded orders, not an empty seller's
+    assert f"Total Orders:</b> {args.orders}<" in client.get("/summary").text
+    samples = sorted(visit() for _ in range(args.repeat))
+    print(json.dumps({
+        "seeded_s": seeded,
+        "first_ms": first * 1000,
+        "p50_ms": statistics.median(samples) * 1000,
+        "p99_ms": samples[max(0, -(-len(samples) * 99 // 100) - 1)] * 1000,
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="GET /summary latency with a million orders, per git revision.")
+    parser.add_argument("--refs", nargs="+", default=["HEAD"])
+    parser.add_argument("--orders", type=int, default=1_000_000)
+    parser.add_argument("--products", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args)
+        return
+    from benchmarks.common import run_in_worktree, short_rev
+
+    print(f"GET /summary, one seller with {args.orders:,} orders, {args.repeat} visits after the first")
+    for ref in args.refs:
+        r = run_in_worktree(ref, __file__, [
+            "--orders", args.orders, "--products", args.products, "--repeat", args.repeat,
+        ])
+        print(f"  {ref:<12} {short_rev(ref)}  first {r['first_ms']:9.1f} ms  p50 {r['p50_ms']:9.2f} ms"
+              f"  p99 {r['p99_ms']:9.2f} ms  (seeded in {r['seeded_s']:.0f}s)")
+
+if __name__ == "__main__":
+    main()
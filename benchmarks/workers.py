@@ -0,0 +1,153 @@
+import argparse
+import asyncio
+import multiprocessing
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from benchmarks.common import ROOT, percentile
+
+#-----------Worker scaling ----------#
+# Starts the real server (run.py, so the multi-worker defaults apply) with
+# 1..N uvicorn workers on a scratch database and drives it over HTTP from
+# separate client processes with a live-sale mix: 60% GET /live, 30% new
+# orders, 10% GET /summary. Prints req/s and p50/p99 per worker count and
+# the speedup over one worker. Client processes share the box with the
+# server, so leave cores for them (--client-procs).
+#
+#   python -m benchmarks.workers --workers 1 2 4 8 --seconds 15
+
+PASSWORD = "bench-password"
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_until_up(url: str, timeout: float = 60):
+    import httpx
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(url + "/login", timeout=1).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        time.sleep(0.2)
+    raise SystemExit("server did not come up")
+
+
+async def seller_session(url: str, n: int, concurrency: int, seconds: float):
+    import httpx
+    rng = random.Random(n)
+    latencies, errors = [], 0
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, timeout=60, limits=limits) as client:
+        email = f"seller{n}-{os.getpid()}@bench.local"
+        await client.post("/register", data={"full_name": "Bench", "email": email, "password": PASSWORD})
+        await client.post("/inventory/add", data={"name": "Item", "price": "100", "stock": str(10**7)})
+        product_id = (await client.get("/inventory/products.json")).json()["products"][0]["id"]
+        stop = time.monotonic() + seconds
+
+        async def user():
+            nonlocal errors
+            while time.monotonic() < stop:
+                roll = rng.random()
+                start = time.perf_counter()
+                if roll < 0.6:
+                    response = await client.get("/live")
+                elif roll < 0.9:
+                    response = await client.post("/live/order/add", data={
+                        "customer_name": f"Buyer {rng.randrange(500)}", "product_id": product_id, "qty": "1",
+                    })
+                else:
+                    response = await client.get("/summary")
+                latencies.append(time.perf_counter() - start)
+                if response.status_code >= 400:
+                    errors += 1
+
+        await asyncio.gather(*(user() for _ in range(concurrency)))
+    return latencies, errors
+
+
+def client_process(url, n, concurrency, seconds, results):
+    results.put(asyncio.run(seller_session(url, n, concurrency, seconds)))
+
+
+def measure(workers: int, args) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        port = free_port()
+        env = dict(
+            os.environ,
+            PORT=str(port),
+            WORKERS=str(workers),
+            DATABASE_URL=f"sqlite:///{Path(tmp) / 'bench.db'}",
+            STATE_DB_PATH=str(Path(tmp) / "state.db"),
+            INIT_LOCK_PATH=str(Path(tmp) / "init.lock"),
+            SECRET_KEY="bench",
+            BCRYPT_ROUNDS="4",
+            SLOW_QUERY_MS="0",
+        )
+        server = subprocess.Popen(
+            [sys.executable, "run.py"], cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        try:
+            url = f"http://127.0.0.1:{port}"
+            wait_until_up(url)
+            results = multiprocessing.Queue()
+            per_proc = max(1, args.clients // args.client_procs)
+            procs = [
+                multiprocessing.Process(target=client_process, args=(url, n, per_proc, args.seconds, results))
+                for n in range(args.client_procs)
+            ]
+            start = time.perf_counter()
+            for proc in procs:
+                proc.start()
+            latencies, errors = [], 0
+            for _ in procs:
+                samples, failed = results.get()
+                latencies += samples
+                errors += failed
+            for proc in procs:
+                proc.join()
+            elapsed = time.perf_counter() - start
+        finally:
+            server.terminate()
+            server.wait(timeout=30)
+    latencies.sort()
+    return {
+        "rps": len(latencies) / elapsed,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "errors": errors,
+    }
+
+
+def main():
+    cores = os.cpu_count() or 1
+    parser = argparse.ArgumentParser(description="Throughput of the real server with 1..N workers.")
+    parser.add_argument("--workers", type=int, nargs="+",
+                        default=sorted({1, *(n for n in (2, 4, 8, 16) if n <= cores)}))
+    parser.add_argument("--seconds", type=float, default=15)
+    parser.add_argument("--clients", type=int, default=64, help="concurrent users in total")
+    parser.add_argument("--client-procs", type=int, default=max(1, cores // 4))
+    args = parser.parse_args()
+
+    print(f"{cores} cores, {args.clients} users from {args.client_procs} client process(es), {args.seconds:g}s each")
+    base = None
+    for workers in args.workers:
+        r = measure(workers, args)
+        base = base or r["rps"]
+        errors = f"  {r['errors']} errors" if r["errors"] else ""
+        print(f"  {workers:>2} worker(s) {r['rps']:8.1f} req/s  x{r['rps'] / base:4.2f}"
+              f"  p50 {r['p50_ms']:8.2f} ms  p99 {r['p99_ms']:8.2f} ms{errors}")
+
+
+if __name__ == "__main__":
+    main()
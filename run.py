@@ -3,4 +3,11 @@ import uvicorn
 
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 8000))
-    uvicorn.run("app.main:app", host="0.0.0.0", port=port)
+    workers = int(os.environ.get("WORKERS", 1))
+    if workers > 1:
+        # workers share the active-session cache, the live feed and logins
+        # through a local SQLite state file instead of per-process memory
+        os.environ.setdefault("CACHE_BACKEND", "sqlite")
+        os.environ.setdefault("FEED_BACKEND", "sqlite")
+        os.environ.setdefault("SESSION_BACKEND", "sqlite")
+    uvicorn.run("app.main:app", host="0.0.0.0", port=port, workers=workers)
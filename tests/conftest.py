@@ -0,0 +1,90 @@
+import itertools
+import os
+import tempfile
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pytest
+
+#-----------Test environment ----------#
+# The app reads its settings at import time, so they are pinned here before
+# anything from app is imported: a scratch SQLite database and state file,
+# cheap bcrypt, and SQL_DEBUG=strict so an N+1 or a query budget overrun in
+# any route fails the test that hit it.
+
+TMP = Path(tempfile.mkdtemp(prefix="livesell-tests-"))
+os.environ.update({
+    "DATABASE_URL": f"sqlite:///{TMP / 'test.db'}",
+    "STATE_DB_PATH": str(TMP / "state.db"),
+    "INIT_LOCK_PATH": str(TMP / "init.lock"),
+    "TEMPLATE_CACHE_DIR": "off",
+    "SECRET_KEY": "test",
+    "BCRYPT_ROUNDS": "4",
+    "SQL_DEBUG": "strict",
+    "SLOW_QUERY_MS": "0",
+    "CACHE_BACKEND": "memory",
+    "FEED_BACKEND": "memory",
+    "SESSION_BACKEND": "memory",
+    "WRITE_BATCH_MS": "0",
+})
+
+from fastapi.testclient import TestClient  # noqa: E402
+from app.main import app as asgi_app  # noqa: E402
+from app.models import SessionLocal, User, Product, LiveSession, init_db_once  # noqa: E402
+from app import archive  # noqa: E402
+
+_emails = itertools.count(1)
+
+
+@pytest.fixture(scope="session")
+def app():
+    init_db_once()
+    return asgi_app
+
+
+@pytest.fixture
+def client(app):
+    # no `with`: the lifespan (schema, comment ingestor) is handled above
+    return TestClient(app)
+
+
+@pytest.fixture
+def db(app):
+    session = SessionLocal()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def seller(client, db):
+    # a fresh seller logged in on `client`; returns the user id
+    email = f"seller{next(_emails)}@test.local"
+    response = client.post(
+        "/register", data={"full_name": "Test Seller", "email": email, "password": "pw"}, follow_redirects=False
+    )
+    assert response.status_code == 302
+    return db.query(User.id).filter(User.email == email).scalar()
+
+
+@pytest.fixture
+def make_product(db):
+    def make(user_id: int, stock: int = 10, price: float = 100, name: str = "Item", code: str = None):
+        product = Product(user_id=user_id, name=name, price=price, stock=stock, code=code)
+        db.add(product)
+        db.commit()
+        return product.id
+    return make
+
+
+@pytest.fixture
+def busy_seller(client, db, seller, make_product):
+    # a seller with products, a past (archived) session and a live one
+    products = [make_product(seller, stock=100, name=f"Item {n}", code=f"A{n}") for n in range(3)]
+    lines = [{"customer_name": f"Buyer {n}", "product_id": products[n % 3], "qty": 1} for n in range(12)]
+    client.post("/live/orders/bulk", json={"orders": lines})
+    client.post("/live/end", follow_redirects=False)
+    db.query(LiveSession).filter(LiveSession.user_id == seller).update({"ended_at": datetime.utcnow() - timedelta(days=60)})
+    db.commit()
+    archive.archive_ended(30, user_id=seller)
+    client.post("/live/orders/bulk", json={"orders": lines})
+    return seller, products
@@ -0,0 +1,52 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import select
+
+from app import archive
+from app.models import LiveSession, Order, ArchivedOrder
+
+
+def place(client, product_id, name="Buyer"):
+    response = client.post(
+        "/live/order/add", data={"customer_name": name, "product_id": product_id, "qty": 1}, follow_redirects=False
+    )
+    assert response.status_code == 302
+
+
+def end_and_age(client, db, user_id):
+    client.post("/live/end", follow_redirects=False)
+    db.query(LiveSession).filter(LiveSession.user_id == user_id).update(
+        {"ended_at": datetime.utcnow() - timedelta(days=60)}
+    )
+    db.commit()
+
+
+def test_new_orders_never_reuse_archived_ids(client, db, seller, make_product):
+    product_id = make_product(seller)
+    for n in range(3):
+        place(client, product_id, f"Buyer {n}")
+    end_and_age(client, db, seller)
+    archived_ids = [i for (i,) in db.query(ArchivedOrder.id)] + [i for (i,) in db.query(Order.id)]
+
+    assert archive.archive_ended(30, user_id=seller) == (1, 3)
+    place(client, product_id, "After archive")
+
+    new_id = db.query(Order.id).filter(Order.user_id == seller).scalar()
+    assert new_id > max(archived_ids)
+    ids = db.execute(select(archive.all_orders(seller).c.id)).scalars().all()
+    assert len(ids) == len(set(ids)) == 4
+
+
+def test_restore_after_new_orders(client, db, seller, make_product):
+    product_id = make_product(seller)
+    for n in range(3):
+        place(client, product_id, f"Buyer {n}")
+    end_and_age(client, db, seller)
+    archive.archive_ended(30, user_id=seller)
+    place(client, product_id, "After archive")
+
+    session_id = db.query(ArchivedOrder.session_id).filter(ArchivedOrder.user_id == seller).first()[0]
+    assert archive.restore_session(db, session_id) == 3
+    db.commit()
+    assert db.query(Order).filter(Order.user_id == seller).count() == 4
+    assert db.query(ArchivedOrder).filter(ArchivedOrder.user_id == seller).count() == 0
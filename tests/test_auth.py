@@ -0,0 +1,22 @@
+from fastapi.testclient import TestClient
+
+from app import passwords
+from app.models import engine
+from app.routes import auth
+
+
+def test_login_waits_for_bcrypt_without_holding_a_connection(app, monkeypatch):
+    client = TestClient(app)
+    client.post("/register", data={"full_name": "Storm", "email": "storm@test.local", "password": "pw"})
+    client.cookies.clear()
+    idle = engine.pool.checkedout()
+    held = []
+
+    async def verify(password, password_hash):
+        held.append(engine.pool.checkedout() - idle)
+        return await passwords.verify_password(password, password_hash)
+
+    monkeypatch.setattr(auth, "verify_password", verify)
+    response = client.post("/login", data={"email": "storm@test.local", "password": "pw"}, follow_redirects=False)
+    assert response.status_code == 302
+    assert held == [0]
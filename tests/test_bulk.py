@@ -0,0 +1,65 @@
+from app.models import Order, Product
+
+
+def post_orders(client, orders):
+    return client.post("/live/orders/bulk", json={"orders": orders})
+
+
+def test_malformed_json_is_a_400(client, seller):
+    for url in ("/live/orders/bulk", "/live/orders/status/bulk"):
+        response = client.post(url, content=b"{not json", headers={"Content-Type": "application/json"})
+        assert response.status_code == 400
+
+
+def test_bad_field_types_fail_their_line_only(client, db, seller, make_product):
+    product_id = make_product(seller, stock=5)
+    response = post_orders(client, [
+        {"customer_name": "Ana", "product_id": [product_id], "qty": 1},
+        {"customer_name": 5, "product_id": product_id, "qty": 1},
+        {"customer_name": "Ben", "product_id": product_id, "qty": {"n": 1}},
+        {"customer_name": "Cy", "product_id": str(product_id), "qty": "2"},
+    ])
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert [r["ok"] for r in results] == [False, False, False, True]
+    assert results[0]["error"] == "product_id must be a number"
+    assert results[1]["error"] == "customer_name must be text"
+    assert results[2]["error"] == "qty must be a number"
+    assert db.query(Product.stock).filter(Product.id == product_id).scalar() == 3
+
+
+def test_status_batch_checks_order_ids(client, db, seller, make_product):
+    product_id = make_product(seller, stock=5)
+    order_id = post_orders(client, [{"customer_name": "Ana", "product_id": product_id, "qty": 1}]).json()["results"][0]["order_id"]
+    response = client.post("/live/orders/status/bulk", json={"changes": [
+        {"order_id": [order_id], "status": "PAID"},
+        {"order_id": str(order_id), "status": "PAID"},
+        {"order_id": order_id + 1000, "status": ["PAID"]},
+    ]})
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert [r.get("error") for r in results] == ["order_id must be a number", None, "unknown order"]
+    assert db.query(Order.status).filter(Order.id == order_id).scalar() == "PAID"
+
+
+def test_uncancelling_takes_stock_again(client, db, seller, make_product):
+    product_id = make_product(seller, stock=3)
+    first, second = [r["order_id"] for r in post_orders(client, [
+        {"customer_name": "Ana", "product_id": product_id, "qty": 2},
+        {"customer_name": "Ben", "product_id": product_id, "qty": 1},
+    ]).json()["results"]]
+    client.post("/live/orders/status/bulk", json={"changes": [
+        {"order_id": first, "status": "CANCELLED"}, {"order_id": second, "status": "CANCELLED"},
+    ]})
+    # the cancelled units were sold to someone else meanwhile
+    post_orders(client, [{"customer_name": "Cy", "product_id": product_id, "qty": 2}])
+
+    response = client.post("/live/orders/status/bulk", json={"changes": [
+        {"order_id": first, "status": "PAID"}, {"order_id": second, "status": "PENDING"},
+    ]})
+    results = response.json()["results"]
+    assert [r.get("error") for r in results] == ["out of stock", None]
+    db.expire_all()
+    assert db.query(Order.status).filter(Order.id == first).scalar() == "CANCELLED"
+    assert db.query(Order.status).filter(Order.id == second).scalar() == "PENDING"
+    assert db.query(Product.stock).filter(Product.id == product_id).scalar() == 0
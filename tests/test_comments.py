@@ -0,0 +1,28 @@
+from fastapi.testclient import TestClient
+
+from app.models import Order, User
+
+
+def test_malformed_json_is_a_400(client, seller):
+    response = client.post("/live/comments", content=b"[{", headers={"Content-Type": "application/json"})
+    assert response.status_code == 400
+
+
+def test_503_when_the_ingestor_is_not_running(client, seller):
+    # the shared client skips the lifespan, so nothing consumes the queue
+    response = client.post("/live/comments", json={"comments": [{"name": "Ana", "text": "mine A1"}]})
+    assert response.status_code == 503
+    assert "Retry-After" in response.headers
+
+
+def test_comments_become_orders(app, db, make_product):
+    with TestClient(app) as client:  # runs the lifespan: ingestor started
+        client.post("/register", data={"full_name": "Chat Seller", "email": "chat@test.local", "password": "pw"})
+        user_id = db.query(User.id).filter(User.email == "chat@test.local").scalar()
+        make_product(user_id, stock=5, code="A1")
+        response = client.post("/live/comments", json={"comments": [
+            {"name": "Ana", "text": "mine A1 x2"}, {"name": "Ben", "text": "hello po"},
+        ]})
+        assert response.status_code == 202
+    # leaving the block drains the queue
+    assert [(o.customer_name, o.qty) for o in db.query(Order).filter(Order.user_id == user_id)] == [("Ana", 2)]
@@ -0,0 +1,50 @@
+import tracemalloc
+from datetime import datetime
+
+from sqlalchemy import insert
+
+from app.models import engine, LiveSession, Order
+from app.routes.summary import iter_orders_csv
+
+ROWS = 100_000
+
+
+def seed_orders(db, user_id, product_id, count):
+    session = LiveSession(user_id=user_id)
+    db.add(session)
+    db.commit()
+    now = datetime.utcnow()
+    with engine.begin() as conn:
+        conn.execute(insert(Order), [
+            {"user_id": user_id, "session_id": session.id, "product_id": product_id, "customer_name": f"Buyer {n}",
+             "qty": 1, "status": "PAID", "created_at": now}
+            for n in range(count)
+        ])
+    return session.id
+
+
+def export_peak(user_id, **filters):
+    # (rows, bytes, peak traced memory) of a full export
+    tracemalloc.start()
+    rows = size = 0
+    try:
+        for chunk in iter_orders_csv(user_id, **filters):
+            rows += chunk.count("\n")
+            size += len(chunk)
+        return rows, size, tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def test_export_memory_stays_flat(db, seller, make_product):
+    product_id = make_product(seller)
+    small_session = seed_orders(db, seller, product_id, ROWS // 10)
+    seed_orders(db, seller, product_id, ROWS - ROWS // 10)
+
+    small_rows, _, small_peak = export_peak(seller, session_id=small_session)
+    rows, size, peak = export_peak(seller)
+
+    assert small_rows == ROWS // 10 + 1 and rows == ROWS + 1  # + header
+    # ten times the rows, about the same peak, and far below the file size
+    assert peak < small_peak * 1.5
+    assert peak < size / 4
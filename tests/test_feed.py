@@ -0,0 +1,19 @@
+import json
+
+from app.events import SharedOrderFeed
+
+
+def test_shared_feed_writes_a_batch_in_order(tmp_path):
+    feed = SharedOrderFeed(str(tmp_path / "state.db"))
+    feed.publish_many(1, [{"type": "order", "n": n} for n in range(3)])
+    feed.publish(2, {"type": "resync"})
+    feed.publish_many(1, [])
+
+    rows = feed._conn().execute("SELECT user_id, payload FROM feed_events ORDER BY id").fetchall()
+    assert [(user_id, json.loads(payload)) for user_id, payload in rows] == [
+        (1, {"type": "order", "n": 0}),
+        (1, {"type": "order", "n": 1}),
+        (1, {"type": "order", "n": 2}),
+        (2, {"type": "resync"}),
+    ]
+    assert not feed._conn().in_transaction
@@ -0,0 +1,60 @@
+import pytest
+
+from app import live_sessions
+from app.cache import SqliteCache
+from app.models import SessionLocal, LiveSession
+
+
+@pytest.fixture
+def workers(tmp_path, monkeypatch):
+    # two workers sharing one cache file; `switch` makes one of them current
+    path = str(tmp_path / "state.db")
+    caches = {"a": SqliteCache(path), "b": SqliteCache(path)}
+
+    def switch(name):
+        monkeypatch.setattr(live_sessions, "cache", caches[name])
+        return caches[name]
+
+    switch("a")
+    return caches, switch
+
+
+def test_end_in_one_worker_invalidates_the_other(db, seller, workers):
+    caches, switch = workers
+    first = live_sessions.get_or_create_active_session(db, seller)
+    switch("b")
+    assert live_sessions.get_or_create_active_session(db, seller) == first
+
+    live_sessions.end_active_session(db, seller)
+    switch("a")
+    assert live_sessions.cached_active_session(seller) is None
+    second = live_sessions.get_or_create_active_session(db, seller)
+    assert second.id != first.id
+    switch("b")
+    assert live_sessions.get_or_create_active_session(db, seller) == second
+
+
+def test_lookup_racing_an_end_does_not_cache_the_ended_session(db, seller, workers, monkeypatch):
+    caches, switch = workers
+    first = live_sessions.get_or_create_active_session(db, seller)
+    caches["a"].delete(live_sessions._cache_key(seller))
+
+    # worker b ends the session after worker a has read it from the database
+    # but before a writes it to the cache
+    cache_set = caches["a"].set
+
+    def set_after_end(key, value, ttl=None):
+        if key == live_sessions._cache_key(seller):
+            with monkeypatch.context() as m:
+                m.setattr(live_sessions, "cache", caches["b"])
+                with SessionLocal() as other:
+                    live_sessions.end_active_session(other, seller)
+        cache_set(key, value, ttl)
+
+    monkeypatch.setattr(caches["a"], "set", set_after_end)
+    assert live_sessions.get_or_create_active_session(db, seller) == first  # what a read
+    monkeypatch.setattr(caches["a"], "set", cache_set)
+
+    current = live_sessions.get_or_create_active_session(db, seller)
+    assert current.id != first.id
+    assert db.get(LiveSession, current.id).ended_at is None
@@ -0,0 +1,59 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app import querylog
+from app.metrics import MetricsMiddleware
+from app.models import SessionLocal, LiveSession, Order
+from app.querylog import QueryBudgetExceeded
+
+#-----------Query budgets ----------#
+# The suite runs with SQL_DEBUG=strict (see conftest), so a route that goes
+# over its budget or lazy-loads a relationship in a loop raises here. The
+# budgets are for a cold cache: the first /summary rebuilds the rollups.
+
+HOT_PAGES = [
+    ("/live", 4),
+    ("/live/orders.json", 3),
+    ("/live/customers/search?q=buy", 2),
+    ("/inventory", 2),
+    ("/inventory/products.json", 2),
+    ("/summary", 16),
+    ("/summary/revenue.json?bucket=week", 16),
+    ("/summary/top-products.json", 16),
+    ("/summary/export.csv", 2),
+    ("/checkout/{session_id}", 6),
+]
+
+
+@pytest.mark.parametrize("url, budget", HOT_PAGES)
+def test_hot_pages_stay_within_budget(client, db, busy_seller, monkeypatch, url, budget):
+    # more rows than the N+1 threshold on every list the page shows
+    user_id, products = busy_seller
+    for batch in range(2):
+        client.post("/live/orders/bulk", json={"orders": [
+            {"customer_name": f"Late Buyer {batch}-{n}", "product_id": products[n % 3], "qty": 1} for n in range(10)
+        ]})
+    session_id = db.query(LiveSession.id).filter(LiveSession.user_id == user_id).first()[0]
+    monkeypatch.setattr(querylog, "QUERY_BUDGET", budget)
+    assert client.get(url.format(session_id=session_id)).status_code == 200
+
+
+def test_over_budget_fails(client, busy_seller, monkeypatch):
+    monkeypatch.setattr(querylog, "QUERY_BUDGET", 1)
+    with pytest.raises(QueryBudgetExceeded, match="budget 1"):
+        client.get("/summary")
+
+
+def test_lazy_loads_in_a_loop_fail(busy_seller):
+    n_plus_one = FastAPI()
+    n_plus_one.add_middleware(MetricsMiddleware)
+
+    @n_plus_one.get("/names")
+    def names():
+        with SessionLocal() as db:
+            orders = db.query(Order).filter(Order.user_id == busy_seller[0]).limit(10).all()
+            return [o.product.name for o in orders]
+
+    with pytest.raises(QueryBudgetExceeded, match="N\\+1: Order.product"):
+        TestClient(n_plus_one).get("/names")
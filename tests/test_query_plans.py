@@ -0,0 +1,103 @@
+from contextlib import contextmanager
+from datetime import datetime
+
+import pytest
+from sqlalchemy import event
+
+from app.models import engine, Base, LiveSession
+
+#-----------Query plan regression ----------#
+# Each hot route is called with every statement it runs captured, and each
+# one is put through EXPLAIN QUERY PLAN. A plain "SCAN <table>" of one of
+# our tables (a full table scan, no index) fails the test.
+
+TABLES = set(Base.metadata.tables)
+EXPLAINED = ("SELECT", "UPDATE", "DELETE", "INSERT", "WITH")
+
+
+@contextmanager
+def captured_sql():
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters[0] if executemany and parameters else parameters))
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+
+
+def full_scans(statements):
+    scans = []
+    with engine.connect() as conn:
+        for statement, parameters in statements:
+            if not statement.lstrip().upper().startswith(EXPLAINED):
+                continue
+            for row in conn.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters or ()):
+                detail = row[-1]
+                words = detail.split()
+                if words[0] == "SCAN" and words[1] in TABLES and " USING " not in detail:
+                    scans.append(f"{detail}\n    in: {' '.join(statement.split())[:300]}")
+    return scans
+
+
+def assert_indexed(statements):
+    assert statements, "nothing was captured"
+    scans = full_scans(statements)
+    assert not scans, "full table scan(s):\n" + "\n".join(scans)
+
+
+@pytest.mark.parametrize("url", [
+    "/live",
+    "/live/orders.json",
+    "/live/customers/search?q=buy",
+    "/inventory",
+    "/inventory/products.json",
+    "/summary",
+    "/summary/revenue.json?bucket=week",
+    "/summary/top-products.json",
+    "/summary/export.csv",
+    "/checkout",
+])
+def test_read_routes_use_indexes(client, busy_seller, url):
+    with captured_sql() as statements:
+        response = client.get(url)
+    assert response.status_code == 200
+    assert_indexed(statements)
+
+
+def test_active_session_lookup_uses_index(client, busy_seller):
+    from app.live_sessions import cache, _cache_key
+    cache.delete(_cache_key(busy_seller[0]))
+    with captured_sql() as statements:
+        client.post("/live/order/add", data={"customer_name": "Ana", "product_id": busy_seller[1][0], "qty": 1})
+        client.post("/live/end", follow_redirects=False)
+    assert_indexed(statements)
+
+
+def test_summary_rebuild_uses_indexes(client, busy_seller):
+    user_id, products = busy_seller
+    client.post(f"/inventory/{products[0]}/edit", data={"name": "Item 0", "price": "150", "stock": "100"})
+    with captured_sql() as statements:
+        assert client.get("/summary").status_code == 200
+    assert any("GROUP BY" in statement for statement, _ in statements), "rollups were not rebuilt"
+    assert_indexed(statements)
+
+
+def test_export_filters_use_indexes(client, busy_seller, db):
+    session_id = db.query(LiveSession.id).filter(LiveSession.user_id == busy_seller[0]).first()[0]
+    today = datetime.utcnow().date().isoformat()
+    for params in ({"session_id": session_id}, {"date_from": today, "date_to": today}):
+        with captured_sql() as statements:
+            assert client.get("/summary/export.csv", params=params).status_code == 200
+        assert_indexed(statements)
+
+
+def test_status_changes_use_indexes(client, busy_seller):
+    orders = client.get("/live/orders.json").json()["orders"]
+    with captured_sql() as statements:
+        client.post(f"/live/order/{orders[0]['id']}/status", data={"status": "PAID"})
+        client.post("/live/orders/status/bulk", json={"changes": [{"order_id": o["id"], "status": "CANCELLED"} for o in orders[1:4]]})
+    assert_indexed(statements)
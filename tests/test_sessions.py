@@ -0,0 +1,68 @@
+import asyncio
+
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from app import sessions
+from app.sessions import MemorySessionStore, ServerSessionMiddleware, SqliteSessionStore
+
+
+def session_app(store, **options):
+    app = FastAPI()
+
+    @app.post("/login")
+    def login(request: Request):
+        request.session["user_id"] = 1
+        return {}
+
+    @app.get("/me")
+    def me(request: Request):
+        return {"user_id": request.session.get("user_id")}
+
+    app.add_middleware(ServerSessionMiddleware, secret_key="test", store=store, **options)
+    return TestClient(app)
+
+
+def test_expiry_rolls_forward_while_the_session_is_used(monkeypatch):
+    now = [1_000_000.0]
+    monkeypatch.setattr(sessions.time, "time", lambda: now[0])
+    client = session_app(MemorySessionStore(), max_age=100, refresh=10)
+    client.post("/login")
+
+    now[0] += 5  # inside the refresh period: nothing written, no cookie
+    response = client.get("/me")
+    assert response.json() == {"user_id": 1} and "set-cookie" not in response.headers
+
+    for _ in range(3):  # 240 s after login, never idle for 100 s
+        now[0] += 80
+        response = client.get("/me")
+        assert response.json() == {"user_id": 1}
+        assert "Max-Age=100" in response.headers["set-cookie"]
+
+    now[0] += 101  # idle past max_age
+    assert client.get("/me").json() == {"user_id": None}
+
+
+def test_sqlite_store_is_not_called_on_the_event_loop(tmp_path):
+    on_loop = []
+
+    class RecordingStore(SqliteSessionStore):
+        def get(self, session_id):
+            on_loop.append(running_loop())
+            return super().get(session_id)
+
+        def set(self, session_id, data, ttl):
+            on_loop.append(running_loop())
+            super().set(session_id, data, ttl)
+
+    def running_loop():
+        try:
+            asyncio.get_running_loop()
+            return True
+        except RuntimeError:
+            return False
+
+    client = session_app(RecordingStore(str(tmp_path / "state.db")))
+    client.post("/login")
+    assert client.get("/me").json() == {"user_id": 1}
+    assert on_loop == [False, False]
@@ -0,0 +1,28 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def test_importing_the_app_touches_nothing(tmp_path):
+    # every worker (and every tool) imports app.main; only the lifespan may
+    # create files or tables
+    state = tmp_path / "state"
+    env = dict(
+        os.environ,
+        DATABASE_URL=f"sqlite:///{state / 'app.db'}",
+        STATE_DB_PATH=str(state / "state.db"),
+        TEMPLATE_CACHE_DIR=str(state / "templates"),
+        INIT_LOCK_PATH=str(state / "init.lock"),
+        CACHE_BACKEND="sqlite",
+        FEED_BACKEND="sqlite",
+        SESSION_BACKEND="sqlite",
+    )
+    state.mkdir()
+    subprocess.run(
+        [sys.executable, "-c", "import app.main; app.main.app.build_middleware_stack()"],
+        cwd=ROOT, env=env, check=True,
+    )
+    assert list(state.iterdir()) == []
@@ -0,0 +1,65 @@
+import threading
+
+from app.models import SessionLocal, LiveSession, Order, Product
+from app.orders import place_order, set_order_status
+from app.writequeue import run_write
+
+CLIENTS = 50
+
+
+def test_concurrent_orders_never_oversell(db, seller, make_product):
+    stock = 60
+    product_id = make_product(seller, stock=stock)
+    session = LiveSession(user_id=seller)
+    db.add(session)
+    db.commit()
+    placed, refused, errors = [], [], []
+    start = threading.Barrier(CLIENTS)
+
+    def client(n):
+        with SessionLocal() as s:
+            start.wait()
+            for _ in range(3):
+                try:
+                    events = run_write(s, lambda w: place_order(w, seller, session.id, f"Buyer {n}", product_id, 1))
+                except Exception as exc:  # surfaced below
+                    errors.append(exc)
+                    continue
+                (placed if events else refused).append(n)
+
+    threads = [threading.Thread(target=client, args=(n,)) for n in range(CLIENTS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not errors
+    db.expire_all()
+    left = db.query(Product.stock).filter(Product.id == product_id).scalar()
+    ordered = db.query(Order).filter(Order.product_id == product_id).count()
+    assert left == 0
+    assert len(placed) == ordered == stock
+    assert len(refused) == CLIENTS * 3 - stock
+
+
+def test_uncancelling_needs_the_stock_back(db, seller, make_product):
+    product_id = make_product(seller, stock=2)
+    session = LiveSession(user_id=seller)
+    db.add(session)
+    db.commit()
+    first = run_write(db, lambda s: place_order(s, seller, session.id, "Ana", product_id, 2))[0]["order"]["id"]
+    run_write(db, lambda s: set_order_status(s, seller, first, "CANCELLED"))
+    run_write(db, lambda s: place_order(s, seller, session.id, "Ben", product_id, 1))
+
+    # one unit left, the cancelled order needs two
+    assert run_write(db, lambda s: set_order_status(s, seller, first, "PAID")) == []
+    db.expire_all()
+    assert db.query(Order.status).filter(Order.id == first).scalar() == "CANCELLED"
+    assert db.query(Product.stock).filter(Product.id == product_id).scalar() == 1
+
+    db.query(Product).filter(Product.id == product_id).update({"stock": 3})
+    db.commit()
+    events = run_write(db, lambda s: set_order_status(s, seller, first, "PAID"))
+    assert {"type": "stock", "product_id": product_id, "stock": 1} in events
+    db.expire_all()
+    assert db.query(Order.status).filter(Order.id == first).scalar() == "PAID"
@@ -0,0 +1,27 @@
+from PIL import Image
+
+from app import uploads
+
+
+def test_decompression_bomb_gets_no_thumbnail(tmp_path, monkeypatch):
+    monkeypatch.setattr(uploads, "UPLOAD_DIR", tmp_path)
+    monkeypatch.setattr(uploads, "THUMB_DIR", tmp_path / "thumbs")
+    # Pillow refuses images over twice this many pixels
+    monkeypatch.setattr(Image, "MAX_IMAGE_PIXELS", 1000)
+    Image.new("RGB", (100, 100)).save(tmp_path / "bomb.png")
+
+    uploads.make_thumbnail(1, f"{uploads.UPLOAD_URL}/bomb.png")
+    assert not any((tmp_path / "thumbs").iterdir())
+
+
+def test_oversized_upload_is_refused_from_content_length(client, seller, make_product, monkeypatch):
+    product_id = make_product(seller)
+    monkeypatch.setattr(uploads, "MAX_UPLOAD_BYTES", 1000)
+    monkeypatch.setattr(uploads.UploadLimitMiddleware, "FORM_OVERHEAD", 0)
+    files = {"image": ("big.png", b"\x89PNG\r\n\x1a\n" + b"x" * 5000, "image/png")}
+    response = client.post(f"/inventory/{product_id}/image", files=files, follow_redirects=False)
+    assert response.status_code == 413
+
+    files = {"image": ("small.png", b"not an image", "image/png")}
+    response = client.post(f"/inventory/{product_id}/image", files=files, follow_redirects=False)
+    assert response.status_code == 302